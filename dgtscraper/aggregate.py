@@ -0,0 +1,226 @@
+"""Agregaciones (group by) en streaming sobre ficheros de matriculaciones, sin crear un objeto por matriculación.
+Requiere numpy (dependencia opcional, no incluida en requirements.txt).
+
+Las matriculaciones se leen en bloques columnares (ver parser.columns); cada bloque se agrupa y acumula de forma
+vectorizada, y los resultados parciales se combinan por grupo. La memoria usada depende del número de grupos
+y del tamaño de bloque, no del tamaño del fichero.
+
+Agrupaciones: cualquier campo de Matriculacion, o 'year' / 'month' (de fechaMatriculacion).
+Métricas: 'count' (matriculaciones) o '{función}:{campo}', con función count (valores no vacíos), sum, min, max o mean,
+sobre campos numéricos o booleanos. Los valores vacíos o inválidos no cuentan en las métricas.
+"""
+
+import csv
+import datetime
+from typing import Dict, IO, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+
+from .models.matriculaciones import Matriculacion
+from .parser.columns import ColumnBlock, parse_matriculaciones_columns, DEFAULT_BATCH_SIZE
+from . import const
+
+METRIC_FUNCTIONS = ("count", "sum", "min", "max", "mean")
+DATE_GROUPS = {
+    "year": "datetime64[Y]",
+    "month": "datetime64[M]",
+}
+DATE_GROUP_FIELD = "fechaMatriculacion"
+
+_MISSING_INT = np.iinfo(np.int64).min
+
+
+class Metric(NamedTuple):
+    function: str
+    field: Optional[str]
+    """None en 'count' (número de matriculaciones del grupo)."""
+
+    @property
+    def name(self) -> str:
+        return f"{self.function}_{self.field}" if self.field else self.function
+
+    @classmethod
+    def parse(cls, spec: str) -> "Metric":
+        function, _, field = spec.partition(":")
+        if function not in METRIC_FUNCTIONS:
+            raise ValueError(f"Unknown metric function {function}")
+        if not field:
+            if function != "count":
+                raise ValueError(f"Metric {function} needs a field ({function}:field)")
+            return cls(function, None)
+
+        model_field = Matriculacion.__fields__.get(field)
+        if model_field is None or model_field.type_ not in (int, float, bool):
+            raise ValueError(f"Metric field {field} is not a numeric field")
+        return cls(function, field)
+
+
+class _FieldStats:
+    """Acumuladores de un campo numérico en un grupo."""
+    __slots__ = ("count", "sum", "min", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+
+class Aggregator:
+    def __init__(self, group_by: Iterable[str], metrics: Iterable[Union[str, Metric]]):
+        self.group_by = list(group_by)
+        self.metrics = [metric if isinstance(metric, Metric) else Metric.parse(metric) for metric in metrics]
+        for name in self.group_by:
+            if name not in DATE_GROUPS and name not in Matriculacion.__fields__:
+                raise ValueError(f"Unknown group by field {name}")
+
+        self.metric_fields = sorted({metric.field for metric in self.metrics if metric.field})
+        self.groups: Dict[Tuple, Tuple[int, Dict[str, _FieldStats]]] = dict()
+        self.rows = 0
+
+    @property
+    def fields(self) -> List[str]:
+        """Columnas necesarias para la agregación (el resto no se decodifican)."""
+        fields = set(self.metric_fields)
+        for name in self.group_by:
+            fields.add(DATE_GROUP_FIELD if name in DATE_GROUPS else name)
+        return sorted(fields)
+
+    def update(self, block: ColumnBlock):
+        rows = len(block)
+        if not rows:
+            return
+        self.rows += rows
+
+        group_keys, inverse = _group_block(block, self.group_by, rows)
+        groups_count = len(group_keys)
+        counts = np.bincount(inverse, minlength=groups_count)
+
+        block_stats = dict()
+        for field in self.metric_fields:
+            values = _numeric_values(block[field])
+            valid = ~np.isnan(values)
+            valid_inverse, valid_values = inverse[valid], values[valid]
+            minimums = np.full(groups_count, np.inf)
+            maximums = np.full(groups_count, -np.inf)
+            np.minimum.at(minimums, valid_inverse, valid_values)
+            np.maximum.at(maximums, valid_inverse, valid_values)
+            block_stats[field] = (
+                np.bincount(valid_inverse, minlength=groups_count),
+                np.bincount(valid_inverse, weights=valid_values, minlength=groups_count),
+                minimums,
+                maximums,
+            )
+
+        for i, key in enumerate(group_keys):
+            try:
+                count, stats = self.groups[key]
+            except KeyError:
+                count, stats = 0, {field: _FieldStats() for field in self.metric_fields}
+            self.groups[key] = (count + int(counts[i]), stats)
+
+            for field, (field_counts, sums, minimums, maximums) in block_stats.items():
+                field_stats = stats[field]
+                field_stats.count += int(field_counts[i])
+                field_stats.sum += float(sums[i])
+                field_stats.min = min(field_stats.min, float(minimums[i]))
+                field_stats.max = max(field_stats.max, float(maximums[i]))
+
+    def update_file(self, file: Union[IO[str], IO[bytes], Iterable[Union[str, bytes]]], batch_size: int = DEFAULT_BATCH_SIZE):
+        for block in parse_matriculaciones_columns(file, batch_size=batch_size, fields=self.fields):
+            self.update(block)
+
+    @property
+    def columns(self) -> List[str]:
+        return self.group_by + [metric.name for metric in self.metrics]
+
+    def results(self) -> List[list]:
+        """Filas (valores de agrupación y de las métricas), ordenadas por los valores de agrupación.
+        Las métricas sin valores (p.ej. la media de un campo siempre vacío) son None.
+        """
+        rows = list()
+        for key in sorted(self.groups, key=lambda k: tuple((value is None, value) for value in k)):
+            count, stats = self.groups[key]
+            rows.append(list(key) + [self._metric_value(metric, count, stats) for metric in self.metrics])
+        return rows
+
+    def write_csv(self, file: IO[str]):
+        writer = csv.writer(file)
+        writer.writerow(self.columns)
+        for row in self.results():
+            writer.writerow(["" if value is None else value for value in row])
+
+    @staticmethod
+    def _metric_value(metric: Metric, count: int, stats: Dict[str, _FieldStats]):
+        if metric.field is None:
+            return count
+
+        field_stats = stats[metric.field]
+        if metric.function == "count":
+            return field_stats.count
+        if not field_stats.count:
+            return None
+        if metric.function == "mean":
+            return field_stats.sum / field_stats.count
+
+        value = {"sum": field_stats.sum, "min": field_stats.min, "max": field_stats.max}[metric.function]
+        if Matriculacion.__fields__[metric.field].type_ is not float:
+            value = int(value)
+        return value
+
+
+def _group_block(block: ColumnBlock, group_by: List[str], rows: int) -> Tuple[List[Tuple], np.ndarray]:
+    """Claves de los grupos presentes en el bloque, y el índice de grupo de cada fila."""
+    if not group_by:
+        return [()], np.zeros(rows, dtype=np.int64)
+
+    combined = np.zeros(rows, dtype=np.int64)
+    uniques_by_column = list()
+    for name in group_by:
+        uniques, codes = np.unique(_group_values(block, name), return_inverse=True)
+        combined = combined * len(uniques) + codes.reshape(-1)
+        uniques_by_column.append(uniques)
+
+    group_codes, inverse = np.unique(combined, return_inverse=True)
+    keys = list()
+    for code in group_codes.tolist():
+        key = list()
+        for uniques in reversed(uniques_by_column):
+            code, column_code = divmod(code, len(uniques))
+            key.append(_to_python(uniques[column_code]))
+        keys.append(tuple(reversed(key)))
+    return keys, inverse.reshape(-1)
+
+
+def _group_values(block: ColumnBlock, name: str) -> np.ndarray:
+    if name in DATE_GROUPS:
+        return block[DATE_GROUP_FIELD].astype(DATE_GROUPS[name])
+
+    values = block[name]
+    if isinstance(values, np.ma.MaskedArray):
+        return values.filled(_MISSING_INT)
+    if values.dtype.kind == "f":
+        return np.where(np.isnan(values), -np.inf, values)
+    return values
+
+
+def _numeric_values(values: np.ndarray) -> np.ndarray:
+    """Valores de una columna numérica como float64, con NaN en los vacíos o inválidos."""
+    if isinstance(values, np.ma.MaskedArray):
+        return values.astype(np.float64).filled(np.nan)
+    return values.astype(np.float64)
+
+
+def _to_python(value):
+    if isinstance(value, np.datetime64):
+        if np.isnat(value):
+            return None
+        unit = np.datetime_data(value.dtype)[0]
+        return str(value) if unit in ("Y", "M") else value.astype(datetime.date)
+    if isinstance(value, bytes):
+        return value.decode(const.FILE_ENCODING)
+    if isinstance(value, np.floating) and np.isinf(value):
+        return None
+    if isinstance(value, np.integer) and value == _MISSING_INT:
+        return None
+    return value.item() if isinstance(value, np.generic) else value
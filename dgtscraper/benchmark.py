@@ -0,0 +1,145 @@
+"""Benchmarks de descompresión, parseo y serialización sobre datos sintéticos (ver synthetic.py), sin conexión."""
+
+import io
+import json
+import time
+import platform
+import tempfile
+import datetime
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+
+from .downloader import DGTDownloader
+from .parser import parse_matriculaciones_line, parse_matriculaciones_file, parse_matriculaciones_file_parallel
+from .serializer import matriculacion_to_canonical_json
+from .synthetic import generate_matriculaciones_bytes, zip_matriculaciones
+from . import const
+
+
+PROJECTION_FIELDS = ("fechaMatriculacion", "provincia", "codPropulsion", "co2")
+
+
+class BenchmarkResult(NamedTuple):
+    seconds: float
+    lines: int
+    bytes: int
+
+    @property
+    def lines_per_second(self) -> float:
+        return self.lines / self.seconds if self.seconds else 0.0
+
+    @property
+    def mb_per_second(self) -> float:
+        return self.bytes / self.seconds / 1024 ** 2 if self.seconds else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "seconds": self.seconds,
+            "lines": self.lines,
+            "bytes": self.bytes,
+            "lines_per_second": self.lines_per_second,
+            "mb_per_second": self.mb_per_second,
+        }
+
+
+class _ChunkedResponse:
+    """Stand-in for a streamed requests.Response, serving the zip from memory."""
+
+    def __init__(self, content: bytes):
+        self.content = content
+
+    def iter_content(self, chunk_size: int):
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i:i + chunk_size]
+
+
+def measure(function: Callable[[], None], lines: int, size: int, repeat: int = 3) -> BenchmarkResult:
+    """Best (lowest) time of `repeat` runs."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return BenchmarkResult(seconds=best, lines=lines, bytes=size)
+
+
+def _consume(iterable: Iterable):
+    for _ in iterable:
+        pass
+
+
+def run_benchmarks(
+        lines: int = 100_000,
+        seed: int = 0,
+        repeat: int = 3,
+        workers: int = 4,
+        only: Optional[List[str]] = None,
+) -> dict:
+    data = generate_matriculaciones_bytes(lines, seed=seed)
+    size = len(data)
+    zip_data = zip_matriculaciones(data)
+    text_lines = data.decode(const.FILE_ENCODING).splitlines(keepends=True)
+    strict_results = [parse_matriculaciones_line(line) for line in text_lines]
+    matriculaciones = [m for m in strict_results if m]
+    downloader = DGTDownloader()
+
+    with tempfile.NamedTemporaryFile(suffix=".txt") as tmp_file:
+        tmp_file.write(data)
+        tmp_file.flush()
+        path = tmp_file.name
+
+        def parse_file(strict: bool):
+            with open(path, "r", encoding=const.FILE_ENCODING) as f:
+                _consume(parse_matriculaciones_file(f, strict=strict))
+
+        benchmarks: Dict[str, Callable[[], None]] = {
+            "unzip_stream_lines": lambda: _consume(downloader._unzip_stream_response(_ChunkedResponse(zip_data))),
+            "unzip_stream_batches": lambda: _consume(downloader._unzip_stream_response_batches(_ChunkedResponse(zip_data))),
+            "parse_line_strict": lambda: _consume(parse_matriculaciones_line(line) for line in text_lines),
+            "parse_line_fast": lambda: _consume(parse_matriculaciones_line(line, strict=False) for line in text_lines),
+            "parse_line_record": lambda: _consume(
+                parse_matriculaciones_line(line, strict=False, as_record=True) for line in text_lines),
+            "parse_line_fields": lambda: _consume(
+                parse_matriculaciones_line(line, strict=False, fields=PROJECTION_FIELDS) for line in text_lines),
+            "json_legacy": lambda: _consume(json.dumps(json.loads(m.json()), sort_keys=True) for m in matriculaciones),
+            "json_canonical": lambda: _consume(matriculacion_to_canonical_json(m) for m in matriculaciones),
+            "parse_file_strict": lambda: parse_file(strict=True),
+            "parse_file_fast": lambda: parse_file(strict=False),
+            "parse_file_parallel": lambda: _consume(parse_matriculaciones_file_parallel(path, workers=workers)),
+        }
+
+        try:
+            from .parser.columns import parse_matriculaciones_columns
+        except ImportError:
+            pass
+        else:
+            benchmarks["parse_file_columns"] = lambda: _consume(parse_matriculaciones_columns(io.BytesIO(data)))
+
+        results = dict()
+        for name, function in benchmarks.items():
+            if only and name not in only:
+                continue
+            results[name] = measure(function, lines=len(text_lines), size=size, repeat=repeat).to_dict()
+
+    return {
+        "meta": {
+            "lines": lines,
+            "bytes": size,
+            "seed": seed,
+            "repeat": repeat,
+            "workers": workers,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        },
+        "results": results,
+    }
+
+
+def compare_results(previous: dict, current: dict) -> Dict[str, float]:
+    """Speedup (lines/s actual entre lines/s anterior) de cada benchmark presente en ambos resultados."""
+    speedups = dict()
+    for name, result in current["results"].items():
+        previous_result = previous["results"].get(name)
+        if previous_result and previous_result["lines_per_second"]:
+            speedups[name] = result["lines_per_second"] / previous_result["lines_per_second"]
+    return speedups
@@ -1,2 +1,5 @@
+DGT_BASE_URL = "https://sedeapl.dgt.gob.es/WEB_IEST_CONSULTA"
 FILE_ENCODING = "iso-8859-1"
 DEFAULT_DOWNLOAD_CHUNK_SIZE = 65536
+DEFAULT_NAVIGATION_TTL = 600  # seconds to reuse a reached JSF navigation state (viewstate) across downloads
+DEFAULT_CACHE_MAX_SIZE = 2 * 1024 ** 3
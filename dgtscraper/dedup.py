@@ -0,0 +1,239 @@
+"""Índice compacto de identidades de matriculación ('bastidor|fechaTramite') ya vistas, para descartar duplicados
+entre meses antes de llegar al destino, sin depender de los upserts de MongoDB.
+
+Cada clave se guarda como un hash de 64 bits en una tabla de direccionamiento abierto (array de enteros sin signo,
+sondeo lineal, ocupación máxima del 75%). Al superarla, la tabla se redimensiona al doble de las claves (37,5% de
+ocupación), así que ocupa entre ~11 y ~21 bytes por clave (~16 de media): p.ej. entre ~215 y ~430 MB para 20 millones
+de claves. Dimensionando expected_keys al número final de claves, la tabla no crece y se queda en ~11-14 bytes
+por clave. Opcionalmente, un filtro de Bloom delante de la tabla descarta sin sondear las claves
+que seguro no se han visto (útil cuando la mayoría de claves son nuevas); o, con exact=False, sustituye a la tabla
+(~1,2 bytes por clave con un 1% de falsos positivos).
+
+Las matriculaciones sin bastidor (puede estar vacío) no tienen una identidad fiable: no se añaden al índice
+y nunca se descartan.
+
+Falsos positivos (una clave nueva que se da por vista, y cuya matriculación se descarta):
+- Con la tabla, solo si dos claves distintas tienen el mismo hash de 64 bits: para n claves, la probabilidad de alguna
+  colisión es ~n²/2^65 (~7·10⁻⁵ con 50 millones de claves).
+- Con exact=False, la tasa del filtro de Bloom (bloom_fp_rate) mientras no se superen expected_keys claves;
+  por encima, la tasa aumenta rápidamente.
+No hay falsos negativos: una clave ya añadida siempre se reconoce.
+"""
+
+import math
+import array
+import struct
+import hashlib
+import pathlib
+import threading
+from typing import List, Optional, Union
+
+from .models.matriculaciones import Matriculacion
+from .serializer import get_matriculacion_id
+from .sinks.base import Sink
+
+DEDUP_INDEX_MAGIC = b"DGTDDP01"
+DEFAULT_EXPECTED_KEYS = 1 << 20
+MAX_LOAD_FACTOR = 0.75
+_HEADER = struct.Struct("<8sQQQQ")
+
+
+def hash_key(key: str) -> int:
+    """Hash de 64 bits de una clave (nunca 0, que marca las posiciones vacías de la tabla)."""
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little") or 1
+
+
+class BloomFilter:
+    """Filtro de Bloom sobre hashes de 64 bits: las posiciones de cada clave se derivan de las dos mitades del hash."""
+
+    def __init__(self, bits: int, hashes: int):
+        self.bits = max(bits, 8)
+        self.hashes = max(hashes, 1)
+        self._array = bytearray((self.bits + 7) // 8)
+
+    @classmethod
+    def for_capacity(cls, keys: int, fp_rate: float) -> "BloomFilter":
+        """Filtro dimensionado para `keys` claves con una tasa de falsos positivos fp_rate."""
+        bits = math.ceil(-max(keys, 1) * math.log(fp_rate) / math.log(2) ** 2)
+        return cls(bits, round(bits / max(keys, 1) * math.log(2)))
+
+    def add(self, key_hash: int):
+        bits, size = self._array, self.bits
+        position, step = key_hash & 0xffffffff, (key_hash >> 32) | 1
+        for _ in range(self.hashes):
+            position %= size
+            bits[position >> 3] |= 1 << (position & 7)
+            position += step
+
+    def __contains__(self, key_hash: int) -> bool:
+        bits, size = self._array, self.bits
+        position, step = key_hash & 0xffffffff, (key_hash >> 32) | 1
+        for _ in range(self.hashes):
+            position %= size
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+            position += step
+        return True
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._array)
+
+
+class DedupIndex:
+    """Conjunto de claves vistas. No es thread-safe (ver DedupSink)."""
+
+    def __init__(
+            self,
+            expected_keys: int = DEFAULT_EXPECTED_KEYS,
+            bloom_fp_rate: Optional[float] = None,
+            exact: bool = True,
+    ):
+        if not exact and bloom_fp_rate is None:
+            raise ValueError("A non-exact index needs a Bloom filter (bloom_fp_rate)")
+
+        self._count = 0
+        self._table: Optional[array.array] = None
+        if exact:
+            self._table = array.array("Q", bytes(8 * self._table_size(expected_keys)))
+        self.bloom = BloomFilter.for_capacity(expected_keys, bloom_fp_rate) if bloom_fp_rate is not None else None
+
+    @staticmethod
+    def _table_size(keys: int) -> int:
+        return max(int(keys / MAX_LOAD_FACTOR) + 1, 16)
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def exact(self) -> bool:
+        return self._table is not None
+
+    @property
+    def nbytes(self) -> int:
+        table_bytes = len(self._table) * self._table.itemsize if self._table is not None else 0
+        return table_bytes + (self.bloom.nbytes if self.bloom is not None else 0)
+
+    def __contains__(self, key: str) -> bool:
+        key_hash = hash_key(key)
+        if self.bloom is not None and key_hash not in self.bloom:
+            return False
+        if self._table is None:
+            return True
+
+        table, size = self._table, len(self._table)
+        i = key_hash % size
+        while True:
+            value = table[i]
+            if value == key_hash:
+                return True
+            if value == 0:
+                return False
+            i = i + 1 if i + 1 < size else 0
+
+    def add(self, key: str) -> bool:
+        """Añade la clave al índice. Devuelve True si no se había visto (o si se considera no vista)."""
+        key_hash = hash_key(key)
+        if self.bloom is not None:
+            if key_hash in self.bloom:
+                if self._table is None:
+                    return False
+            else:
+                self.bloom.add(key_hash)
+                if self._table is None:
+                    self._count += 1
+                    return True
+
+        table, size = self._table, len(self._table)
+        i = key_hash % size
+        while True:
+            value = table[i]
+            if value == key_hash:
+                return False
+            if value == 0:
+                break
+            i = i + 1 if i + 1 < size else 0
+
+        table[i] = key_hash
+        self._count += 1
+        if self._count > size * MAX_LOAD_FACTOR:
+            self._grow()
+        return True
+
+    def _grow(self):
+        old_table = self._table
+        table = self._table = array.array("Q", bytes(8 * self._table_size(self._count * 2)))
+        size = len(table)
+        for key_hash in old_table:
+            if key_hash:
+                i = key_hash % size
+                while table[i]:
+                    i = i + 1 if i + 1 < size else 0
+                table[i] = key_hash
+
+    def save(self, path: Union[pathlib.Path, str]):
+        path = pathlib.Path(path)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(_HEADER.pack(
+                DEDUP_INDEX_MAGIC,
+                len(self._table) if self._table is not None else 0,
+                self._count,
+                self.bloom.bits if self.bloom is not None else 0,
+                self.bloom.hashes if self.bloom is not None else 0,
+            ))
+            if self._table is not None:
+                self._table.tofile(f)
+            if self.bloom is not None:
+                f.write(self.bloom._array)
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Union[pathlib.Path, str]) -> "DedupIndex":
+        with open(path, "rb") as f:
+            magic, table_size, count, bloom_bits, bloom_hashes = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != DEDUP_INDEX_MAGIC:
+                raise ValueError(f"Invalid dedup index file: {path}")
+
+            index = cls.__new__(cls)
+            index._count = count
+            index._table = None
+            index.bloom = None
+            if table_size:
+                index._table = array.array("Q")
+                index._table.fromfile(f, table_size)
+            if bloom_bits:
+                index.bloom = BloomFilter(bloom_bits, bloom_hashes)
+                if f.readinto(index.bloom._array) != len(index.bloom._array):
+                    raise ValueError(f"Truncated dedup index file: {path}")
+        return index
+
+
+class DedupSink(Sink):
+    """Envuelve otro destino, descartando las matriculaciones cuya identidad ya está en el índice."""
+
+    def __init__(self, sink: Sink, index: DedupIndex):
+        self.sink = sink
+        self.index = index
+        self.written = 0
+        self.duplicated = 0
+        self._lock = threading.Lock()
+
+    def filter_new(self, matriculaciones: List[Matriculacion]) -> List[Matriculacion]:
+        """Matriculaciones no vistas antes (añadiéndolas al índice). Las que no tienen bastidor siempre se dejan pasar."""
+        with self._lock:
+            new = [m for m in matriculaciones if not m.bastidor or self.index.add(get_matriculacion_id(m))]
+            self.written += len(new)
+            self.duplicated += len(matriculaciones) - len(new)
+        return new
+
+    def write(self, source: str, matriculaciones: List[Matriculacion]):
+        new = self.filter_new(matriculaciones)
+        if new:
+            self.sink.write(source, new)
+
+    def delete(self, source: str, ids: List[str]):
+        self.sink.delete(source, ids)
+
+    def close(self):
+        self.sink.close()
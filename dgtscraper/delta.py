@@ -0,0 +1,172 @@
+"""Modo incremental (delta) para los datos diarios provisionales.
+
+Un DeltaIndex guarda, por cada matriculación de una descarga anterior, un hash de 8 bytes de su contenido, con la misma
+identidad que el _id de MongoDB ('bastidor|fechaTramite', ver serializer.get_matriculacion_id). Al comparar una nueva
+descarga con el índice anterior solo se emiten las matriculaciones nuevas, las cambiadas y los ids eliminados,
+de forma que los destinos solo escriben el delta y no el día completo.
+
+Si un mismo id aparece varias veces en una descarga, se conserva la última aparición (MongoSink también deja
+la última escrita en sus upserts).
+Las matriculaciones sin bastidor de un mismo día comparten id, por lo que solo se conserva una de ellas.
+
+Si alguna línea de la descarga no se puede parsear, no se puede saber qué id tenía; para no eliminar del destino
+una matriculación que solo ha fallado al parsear, en ese caso no se emite ninguna eliminación, y los ids no vistos
+conservan su hash anterior (se volverán a comparar en la siguiente descarga).
+"""
+
+import os
+import enum
+import struct
+import hashlib
+import pathlib
+from typing import Dict, Generator, Iterable, List, NamedTuple, Optional, Union
+
+from .models.matriculaciones import Matriculacion
+from .models.common import ParseError
+from .serializer import get_matriculacion_id, matriculacion_to_canonical_json
+from .sinks.base import Sink
+
+DELTA_INDEX_MAGIC = b"DGTDLT01"
+_HEADER = struct.Struct("<8sQ")
+_ENTRY = struct.Struct("<QH")
+
+
+class DeltaChange(enum.Enum):
+    NEW = "new"
+    CHANGED = "changed"
+    REMOVED = "removed"
+
+
+class DeltaRecord(NamedTuple):
+    change: DeltaChange
+    id: str
+    matriculacion: Optional[Matriculacion]
+    """None en las matriculaciones eliminadas."""
+
+
+def get_content_hash(matriculacion: Matriculacion) -> int:
+    digest = hashlib.blake2b(matriculacion_to_canonical_json(matriculacion), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+class DeltaIndex:
+    """Hashes de contenido de una descarga, por id de matriculación."""
+
+    def __init__(self, hashes: Optional[Dict[str, int]] = None):
+        self.hashes: Dict[str, int] = hashes if hashes is not None else dict()
+        self.parse_errors = 0
+        """Errores de parseo encontrados en la descarga (en los snapshots de diff)."""
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def __contains__(self, id_: str):
+        return id_ in self.hashes
+
+    @classmethod
+    def load(cls, path: Union[pathlib.Path, str]) -> "DeltaIndex":
+        """Carga un índice guardado; si no existe, devuelve un índice vacío (todas las matriculaciones serán nuevas)."""
+        try:
+            data = pathlib.Path(path).read_bytes()
+        except FileNotFoundError:
+            return cls()
+
+        try:
+            magic, count = _HEADER.unpack_from(data)
+            if magic != DELTA_INDEX_MAGIC:
+                raise ValueError(f"Invalid delta index file: {path}")
+
+            hashes = dict()
+            offset = _HEADER.size
+            for _ in range(count):
+                content_hash, id_length = _ENTRY.unpack_from(data, offset)
+                offset += _ENTRY.size
+                if offset + id_length > len(data):
+                    raise ValueError(f"Invalid delta index file: {path}")
+                hashes[data[offset:offset + id_length].decode("utf-8")] = content_hash
+                offset += id_length
+        except (struct.error, UnicodeDecodeError):
+            raise ValueError(f"Invalid delta index file: {path}")
+        return cls(hashes)
+
+    def save(self, path: Union[pathlib.Path, str]):
+        """Guarda el índice (sustituyendo de forma atómica el fichero anterior)."""
+        chunks = [_HEADER.pack(DELTA_INDEX_MAGIC, len(self.hashes))]
+        for id_, content_hash in sorted(self.hashes.items()):
+            encoded_id = id_.encode("utf-8")
+            chunks.append(_ENTRY.pack(content_hash, len(encoded_id)))
+            chunks.append(encoded_id)
+
+        path = pathlib.Path(path)
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_bytes(b"".join(chunks))
+        os.replace(tmp_path, path)
+
+    def diff(
+            self,
+            matriculaciones: Iterable[Optional[Matriculacion]],
+            snapshot: "DeltaIndex",
+    ) -> Generator[DeltaRecord, None, None]:
+        """Compara una nueva descarga con este índice, y emite las matriculaciones nuevas y cambiadas
+        y después los ids eliminados. El índice de la nueva descarga se guarda en snapshot,
+        que debe guardarse (en lugar de este índice) solo cuando el delta se haya escrito correctamente.
+        Los None se ignoran; los ParseError se cuentan en snapshot.parse_errors y, si hay alguno, no se emiten
+        eliminaciones: los ids anteriores que no aparecen pasan a snapshot con su hash anterior.
+
+        Los cambios se emiten al terminar de leer la descarga (para conservar solo la última aparición de cada id),
+        pero en memoria solo se mantienen los hashes y las matriculaciones que forman parte del delta.
+        """
+        changed: Dict[str, Optional[Matriculacion]] = dict()
+        for matriculacion in matriculaciones:
+            if not isinstance(matriculacion, Matriculacion):
+                if isinstance(matriculacion, ParseError):
+                    snapshot.parse_errors += 1
+                continue
+
+            id_ = get_matriculacion_id(matriculacion)
+            content_hash = get_content_hash(matriculacion)
+            snapshot.hashes[id_] = content_hash
+            changed[id_] = matriculacion if self.hashes.get(id_) != content_hash else None
+
+        for id_, matriculacion in changed.items():
+            if matriculacion is not None:
+                change = DeltaChange.NEW if id_ not in self.hashes else DeltaChange.CHANGED
+                yield DeltaRecord(change, id_, matriculacion)
+
+        missing = sorted(self.hashes.keys() - snapshot.hashes.keys())
+        if snapshot.parse_errors:
+            for id_ in missing:
+                snapshot.hashes[id_] = self.hashes[id_]
+            return
+        for id_ in missing:
+            yield DeltaRecord(DeltaChange.REMOVED, id_, None)
+
+
+def write_delta(
+        sink: Sink,
+        source: str,
+        delta: Iterable[DeltaRecord],
+        batch_size: int = 5000,
+) -> Dict[DeltaChange, int]:
+    """Escribe en el destino las matriculaciones nuevas y cambiadas (en bloques de batch_size),
+    y elimina los ids que ya no están. Devuelve el número de registros de cada tipo.
+    """
+    counts = {change: 0 for change in DeltaChange}
+    buffer: List[Matriculacion] = list()
+    removed: List[str] = list()
+    for record in delta:
+        counts[record.change] += 1
+        if record.change is DeltaChange.REMOVED:
+            removed.append(record.id)
+            continue
+
+        buffer.append(record.matriculacion)
+        if len(buffer) >= batch_size:
+            sink.write(source, buffer)
+            buffer = list()
+
+    if buffer:
+        sink.write(source, buffer)
+    if removed:
+        sink.delete(source, removed)
+    return counts
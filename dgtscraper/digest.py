@@ -0,0 +1,134 @@
+"""Huella por bloques de un fichero de matriculaciones (árbol de Merkle).
+
+A diferencia del MD5 secuencial (ver serializer.fingerprint), cada bloque de chunk_size líneas se resume por separado,
+por lo que los bloques se pueden calcular en paralelo, y comparar dos manifiestos indica qué rangos de líneas cambiaron.
+Los bloques son posicionales: si se insertan o eliminan líneas, todos los bloques posteriores se consideran cambiados.
+"""
+
+import os
+import hashlib
+import pathlib
+import concurrent.futures
+from typing import Dict, List, Optional, Tuple, Union
+
+import pydantic
+
+from .models.matriculaciones import Matriculacion
+from .parser.mmap_file import MatriculacionesFile
+from .serializer import matriculacion_to_canonical_json
+
+DEFAULT_DIGEST_CHUNK_SIZE = 10000
+DIGEST_HASH_NAME = "sha256"
+
+
+class ChunkDigest(pydantic.BaseModel):
+    start: int
+    """Primera línea del bloque (índice de matriculación en el fichero, sin cabecera, empezando en 0)."""
+    end: int
+    """Línea final del bloque (no incluida)."""
+    count: int
+    """Número de matriculaciones parseadas en el bloque (las líneas con errores no forman parte de la huella)."""
+    digest: str
+
+
+class DigestManifest(pydantic.BaseModel):
+    hash_name: str = DIGEST_HASH_NAME
+    chunk_size: int
+    lines: int
+    count: int
+    root: str
+    chunks: List[ChunkDigest]
+
+
+def digest_chunk(matriculaciones: List[Matriculacion], start: int, end: int) -> ChunkDigest:
+    hasher = hashlib.new(DIGEST_HASH_NAME)
+    count = 0
+    for matriculacion in matriculaciones:
+        if isinstance(matriculacion, Matriculacion):
+            hasher.update(matriculacion_to_canonical_json(matriculacion))
+            count += 1
+    return ChunkDigest(start=start, end=end, count=count, digest=hasher.hexdigest())
+
+
+def merkle_root(digests: List[str]) -> str:
+    """Raíz del árbol de Merkle de los digests de bloque: cada nivel combina pares de nodos (hash de ambos concatenados);
+    un nodo sin pareja pasa tal cual al siguiente nivel.
+    """
+    level = [bytes.fromhex(digest) for digest in digests]
+    if not level:
+        return hashlib.new(DIGEST_HASH_NAME).hexdigest()
+
+    while len(level) > 1:
+        next_level = [hashlib.new(DIGEST_HASH_NAME, level[i] + level[i + 1]).digest() for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            next_level.append(level[-1])
+        level = next_level
+    return level[0].hex()
+
+
+_open_files: Dict[str, MatriculacionesFile] = dict()
+
+
+def _digest_file_chunk(path: str, start: int, end: int, strict: bool) -> ChunkDigest:
+    # each worker process keeps its own mmap of the file
+    try:
+        file = _open_files[path]
+    except KeyError:
+        file = _open_files[path] = MatriculacionesFile(path, strict=strict)
+    return digest_chunk(file[start:end], start, end)
+
+
+def digest_file(
+        path: Union[pathlib.Path, str],
+        chunk_size: int = DEFAULT_DIGEST_CHUNK_SIZE,
+        workers: Optional[int] = None,
+        strict: bool = True,
+) -> DigestManifest:
+    """Calcula el manifiesto de bloques de un fichero de matriculaciones, en un pool de `workers` procesos
+    (o en el propio proceso, si workers=1).
+    """
+    path = str(path)
+    with MatriculacionesFile(path, strict=strict) as file:
+        lines = len(file)
+        ranges = [(start, min(start + chunk_size, lines)) for start in range(0, lines, chunk_size)]
+
+        if workers == 1:
+            chunks = [digest_chunk(file[start:end], start, end) for start, end in ranges]
+        else:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+                futures = [executor.submit(_digest_file_chunk, path, start, end, strict) for start, end in ranges]
+                chunks = [future.result() for future in futures]
+
+    return DigestManifest(
+        chunk_size=chunk_size,
+        lines=lines,
+        count=sum(chunk.count for chunk in chunks),
+        root=merkle_root([chunk.digest for chunk in chunks]),
+        chunks=chunks,
+    )
+
+
+def diff_manifests(old: DigestManifest, new: DigestManifest) -> List[Tuple[int, int]]:
+    """Rangos de líneas (inicio, fin no incluido) del manifiesto nuevo cuyos bloques difieren del antiguo.
+    Los bloques consecutivos cambiados se agrupan en un único rango.
+    """
+    if (old.chunk_size, old.hash_name) != (new.chunk_size, new.hash_name):
+        raise ValueError("Manifests with different chunk size or hash cannot be compared")
+    if old.root == new.root:
+        return []
+
+    ranges = list()
+    for i, chunk in enumerate(new.chunks):
+        old_chunk = old.chunks[i] if i < len(old.chunks) else None
+        if old_chunk is not None and (old_chunk.digest, old_chunk.end) == (chunk.digest, chunk.end):
+            continue
+
+        if ranges and ranges[-1][1] == chunk.start:
+            ranges[-1] = (ranges[-1][0], chunk.end)
+        else:
+            ranges.append((chunk.start, chunk.end))
+
+    # lines removed at the end of the file
+    if new.lines < old.lines and not (ranges and ranges[-1][1] == new.lines):
+        ranges.append((new.lines, new.lines))
+    return ranges
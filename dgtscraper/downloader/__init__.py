@@ -1 +1,13 @@
-from .matriculaciones import DGTDownloader
+# The downloaders are imported lazily, so importing helpers such as dgtscraper.downloader.lines
+# does not pull in bs4, requests and stream_unzip
+__all__ = ["DGTDownloader", "AsyncDGTDownloader"]
+
+
+def __getattr__(name):
+    if name == "DGTDownloader":
+        from .matriculaciones import DGTDownloader
+        return DGTDownloader
+    if name == "AsyncDGTDownloader":
+        from .matriculaciones_async import AsyncDGTDownloader
+        return AsyncDGTDownloader
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
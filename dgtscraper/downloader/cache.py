@@ -0,0 +1,199 @@
+import os
+import time
+import hashlib
+import pathlib
+import tempfile
+from typing import Generator, Iterable, List, Optional, Union
+
+import pydantic
+
+from .. import const
+
+
+class ZipCacheEntry(pydantic.BaseModel):
+    """Metadatos de un ZIP de matriculaciones guardado en caché."""
+
+    key: str
+    zip_size: int
+    zip_md5: str
+    zip_mtime_ns: int
+    """Fecha de modificación del ZIP al guardarlo, para detectar cambios sin leerlo entero."""
+    output_size: int
+    """Tamaño del fichero de texto extraído del ZIP."""
+    created_at: float
+    last_access_at: float
+    expires_at: Optional[float] = None
+
+
+class ZipCache:
+    """Caché en disco de los ZIP de matriculaciones descargados, con tamaño máximo y expulsión LRU.
+    Los meses se guardan indefinidamente (hasta ser expulsados); los días (datos provisionales) solo se guardan
+    si daily_ttl > 0, y caducan pasados daily_ttl segundos.
+    Al leer una entrada se comprueban el tamaño y la fecha de modificación del ZIP; con verify=True, también su MD5
+    (lo que supone leer el ZIP entero una vez más).
+    """
+
+    def __init__(
+            self,
+            path: Union[pathlib.Path, str],
+            max_size: int = const.DEFAULT_CACHE_MAX_SIZE,
+            daily_ttl: int = 0,
+            verify: bool = False,
+    ):
+        self.path = pathlib.Path(path)
+        self.max_size = max_size
+        self.daily_ttl = daily_ttl
+        self.verify = verify
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def get_key(year: int, month: int, day: Optional[int] = None) -> str:
+        if day:
+            return f"matriculaciones-{year}-{month:02d}-{day:02d}"
+        return f"matriculaciones-{year}-{month:02d}"
+
+    def accepts(self, year: int, month: int, day: Optional[int] = None) -> bool:
+        return not day or self.daily_ttl > 0
+
+    def get(self, year: int, month: int, day: Optional[int] = None) -> Optional[pathlib.Path]:
+        """Devuelve la ruta del ZIP en caché, si existe, no ha caducado y no está corrupto."""
+        key = self.get_key(year, month, day)
+        entry = self._read_entry(key)
+        if entry is None:
+            return None
+
+        zip_path = self._zip_path(key)
+        try:
+            stat = zip_path.stat()
+        except OSError:
+            stat = None
+        valid = (
+                stat is not None and
+                (entry.expires_at is None or time.time() < entry.expires_at) and
+                stat.st_size == entry.zip_size and
+                stat.st_mtime_ns == entry.zip_mtime_ns and
+                (not self.verify or _file_md5(zip_path) == entry.zip_md5)
+        )
+        if not valid:
+            self.remove(key)
+            return None
+
+        entry.last_access_at = time.time()
+        self._write_entry(entry)
+        return zip_path
+
+    def get_entry(self, year: int, month: int, day: Optional[int] = None) -> Optional[ZipCacheEntry]:
+        return self._read_entry(self.get_key(year, month, day))
+
+    def entries(self) -> List[ZipCacheEntry]:
+        entries = list()
+        for metadata_path in self.path.glob("*.json"):
+            entry = self._read_entry(metadata_path.stem)
+            if entry is not None:
+                entries.append(entry)
+        return entries
+
+    def writer(self, year: int, month: int, day: Optional[int] = None) -> "ZipCacheWriter":
+        key = self.get_key(year, month, day)
+        ttl = self.daily_ttl if day else None
+        return ZipCacheWriter(cache=self, key=key, ttl=ttl)
+
+    def remove(self, key: str):
+        for path in (self._zip_path(key), self._metadata_path(key)):
+            path.unlink(missing_ok=True)
+
+    def clear(self):
+        for entry in self.entries():
+            self.remove(entry.key)
+
+    def evict(self):
+        """Elimina las entradas usadas hace más tiempo, hasta que el tamaño total quepa en max_size."""
+        entries = sorted(self.entries(), key=lambda e: e.last_access_at)
+        total_size = sum(entry.zip_size for entry in entries)
+        while entries and total_size > self.max_size:
+            entry = entries.pop(0)
+            self.remove(entry.key)
+            total_size -= entry.zip_size
+
+    def _zip_path(self, key: str) -> pathlib.Path:
+        return self.path / f"{key}.zip"
+
+    def _metadata_path(self, key: str) -> pathlib.Path:
+        return self.path / f"{key}.json"
+
+    def _read_entry(self, key: str) -> Optional[ZipCacheEntry]:
+        try:
+            return ZipCacheEntry.parse_file(self._metadata_path(key))
+        except (OSError, ValueError):
+            return None
+
+    def _write_entry(self, entry: ZipCacheEntry):
+        _atomic_write(self._metadata_path(entry.key), entry.json().encode())
+
+
+class ZipCacheWriter:
+    """Guarda en caché un ZIP mientras se descarga.
+    El ZIP solo se añade a la caché al llamar a commit(); si se sale del contexto sin ello, se descarta.
+    """
+
+    def __init__(self, cache: ZipCache, key: str, ttl: Optional[int]):
+        self.cache = cache
+        self.key = key
+        self.ttl = ttl
+        self._zip_md5 = hashlib.md5()
+        self._zip_size = 0
+        self._output_size = 0
+        self._file = tempfile.NamedTemporaryFile(dir=cache.path, prefix=f".{key}.", suffix=".tmp", delete=False)
+        self._committed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if not self._committed:
+            self._file.close()
+            pathlib.Path(self._file.name).unlink(missing_ok=True)
+
+    def tee(self, chunks: Iterable[bytes]) -> Generator[bytes, None, None]:
+        """Devuelve los mismos chunks del ZIP, guardándolos a la vez en el fichero temporal."""
+        for chunk in chunks:
+            self._file.write(chunk)
+            self._zip_md5.update(chunk)
+            self._zip_size += len(chunk)
+            yield chunk
+
+    def update_output(self, data: bytes):
+        self._output_size += len(data)
+
+    def commit(self):
+        self._file.close()
+        now = time.time()
+        zip_path = self.cache._zip_path(self.key)
+        os.replace(self._file.name, zip_path)
+        entry = ZipCacheEntry(
+            key=self.key,
+            zip_size=self._zip_size,
+            zip_md5=self._zip_md5.hexdigest(),
+            zip_mtime_ns=zip_path.stat().st_mtime_ns,
+            output_size=self._output_size,
+            created_at=now,
+            last_access_at=now,
+            expires_at=now + self.ttl if self.ttl else None,
+        )
+        self.cache._write_entry(entry)
+        self._committed = True
+        self.cache.evict()
+
+
+def _file_md5(path: pathlib.Path) -> str:
+    md5 = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(const.DEFAULT_DOWNLOAD_CHUNK_SIZE), b""):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+def _atomic_write(path: pathlib.Path, data: bytes):
+    with tempfile.NamedTemporaryFile(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp", delete=False) as f:
+        f.write(data)
+    os.replace(f.name, path)
@@ -0,0 +1,33 @@
+"""Line splitting helpers, without the network dependencies of the downloaders (so parse workers can import them cheaply)."""
+
+from typing import AnyStr, Generator, Iterable
+
+
+def iter_block_lines(block: AnyStr) -> Generator[AnyStr, None, None]:
+    """Split a block of complete lines, keeping the line endings (only "\\n" is considered a line ending)."""
+    newline = "\n" if isinstance(block, str) else b"\n"
+    lines = block.split(newline)
+    last_line = lines.pop()
+    for line in lines:
+        yield line + newline
+    if last_line:
+        yield last_line
+
+
+def split_chunks_in_line_blocks(chunks: Iterable[bytes]) -> Generator[bytes, None, None]:
+    """Regroup arbitrary byte chunks into blocks that only contain complete lines.
+    Only the trailing incomplete line of each chunk is carried over to the next one, so no data is copied more than twice.
+    The last block may not end with a newline, if the input does not.
+    """
+    remainder = b""
+    for chunk in chunks:
+        last_newline = chunk.rfind(b"\n")
+        if last_newline == -1:
+            remainder += chunk
+            continue
+
+        yield remainder + chunk[:last_newline + 1]
+        remainder = chunk[last_newline + 1:]
+
+    if remainder:
+        yield remainder
@@ -1,25 +1,37 @@
+import time
 import pathlib
 import tempfile
 import datetime
-from typing import Optional, Union, Generator
+from typing import Dict, Optional, Union, Generator, Iterable
 
 import bs4
 import requests
 from stream_unzip import stream_unzip
 
+from .cache import ZipCache
+from .lines import iter_block_lines, split_chunks_in_line_blocks
+from ..parser.filters import compile_where, Condition, LineFilter
 from .. import const
 
+# msgError texts that mean the view state was not accepted (instead of an error about the requested data)
+EXPIRED_VIEW_MARKERS = ("caducad", "expirad", "viewexpired")
+
 
 class DGTDownloader:
-    def __init__(self):
+    def __init__(self, base_url: str = const.DGT_BASE_URL):
+        self.base_url = base_url.rstrip("/")
         self.unzip_chunk_size = const.DEFAULT_DOWNLOAD_CHUNK_SIZE
+        self.navigation_ttl = const.DEFAULT_NAVIGATION_TTL
         self.tmp_path = pathlib.Path(tempfile.gettempdir()) / "dgtparser"
         self.bs4_features = "html.parser"
 
         self.tmp_path.mkdir(exist_ok=True)
         self.session = requests.Session()
+        self.cache: Optional[ZipCache] = None
 
         self._last_viewstate = ""
+        self._navigation_expires_at: Optional[float] = None
+        self._navigation_year: Optional[int] = None
         self.session.headers.update({
             "User-Agent": "Mozilla/5.0 (X11; Linux x86_64; rv:109.0) Gecko/20100101 Firefox/113.0"
         })
@@ -46,9 +58,9 @@ class DGTDownloader:
                 path = path / filename
 
         path.touch(exist_ok=True)
-        with open(path, "w") as output_file:
-            for chunk in self.stream_matriculaciones_by_date(year=year, month=month, day=day):
-                output_file.write(chunk)
+        with open(path, "wb") as output_file:
+            for block in self.stream_matriculaciones_batches_by_date(year=year, month=month, day=day, decode=False):
+                output_file.write(block)
 
         return path
 
@@ -57,14 +69,126 @@ class DGTDownloader:
             year: int,
             month: int,
             day: Optional[int] = None,
+            where: Union[Dict[str, Condition], LineFilter, None] = None,
     ) -> Generator[str, None, None]:
-        self._get_viewstate_0()
-        self._get_viewstate_1_vehiculos()
-        self._get_viewstate_2_vehiculos_matriculaciones()
-        self._get_viewstate_3_microdatos()
-        if not day:
+        """Stream the lines of the matriculaciones file.
+        With where, only the lines matching its conditions on the raw fields are returned (see parser.filters).
+        """
+        where = compile_where(where)
+        for block in self.stream_matriculaciones_batches_by_date(year=year, month=month, day=day):
+            if where is None:
+                yield from iter_block_lines(block)
+            else:
+                yield from filter(where, iter_block_lines(block))
+
+    def stream_matriculaciones_batches_by_date(
+            self,
+            year: int,
+            month: int,
+            day: Optional[int] = None,
+            decode: bool = True,
+    ) -> Generator[Union[str, bytes], None, None]:
+        """Stream the matriculaciones file in blocks of complete lines (as many as fit in each downloaded chunk).
+        Blocks are decoded to str in a single call, or returned as raw iso-8859-1 bytes if decode=False.
+        """
+        if self.cache is not None and self.cache.accepts(year=year, month=month, day=day):
+            blocks = self._stream_cached_batches(year=year, month=month, day=day)
+            try:
+                for block in blocks:
+                    yield block.decode(const.FILE_ENCODING) if decode else block
+            finally:
+                blocks.close()
+            return
+
+        response = self._request_download(year=year, month=month, day=day)
+        try:
+            for block in self._unzip_stream_response_batches(response):
+                yield block.decode(const.FILE_ENCODING) if decode else block
+        finally:
+            # also when the consumer stops early (closing this generator)
+            response.close()
+
+    def enable_cache(
+            self,
+            max_size: int = const.DEFAULT_CACHE_MAX_SIZE,
+            daily_ttl: int = 0,
+            verify: bool = False,
+    ) -> ZipCache:
+        """Keep downloaded ZIPs in a disk cache under tmp_path, and stream them from disk on later downloads.
+        Daily (provisional) downloads are only cached if daily_ttl (seconds) is given.
+        Cached ZIPs are checked by size and mtime; with verify=True, also by their MD5 (reading them once more).
+        """
+        self.cache = ZipCache(self.tmp_path / "cache", max_size=max_size, daily_ttl=daily_ttl, verify=verify)
+        return self.cache
+
+    def _stream_cached_batches(self, year: int, month: int, day: Optional[int]) -> Generator[bytes, None, None]:
+        zip_path = self.cache.get(year=year, month=month, day=day)
+        if zip_path is not None:
+            with open(zip_path, "rb") as f:
+                yield from self._unzip_chunks_batches(iter(lambda: f.read(self.unzip_chunk_size), b""))
+            return
+
+        response = self._request_download(year=year, month=month, day=day)
+        try:
+            with self.cache.writer(year=year, month=month, day=day) as cache_writer:
+                zip_chunks = cache_writer.tee(response.iter_content(chunk_size=self.unzip_chunk_size))
+                for block in self._unzip_chunks_batches(zip_chunks):
+                    cache_writer.update_output(block)
+                    yield block
+
+                # read the rest of the zip (after the txt file) so it is cached complete
+                for _ in zip_chunks:
+                    pass
+                cache_writer.commit()
+        finally:
+            response.close()
+
+    def reset_navigation(self):
+        """Forget the cached JSF navigation state, so the next download navigates the portal from the start."""
+        self._navigation_expires_at = None
+        self._navigation_year = None
+
+    def _request_download(self, year: int, month: int, day: Optional[int]) -> requests.Response:
+        """Navigate to the microdatos form (reusing the cached navigation state if possible) and request the download.
+        If the cached state is rejected by the portal (expired or invalid view), navigate again from the start
+        and retry once. Other portal errors (e.g. no data for the date) are raised without retrying.
+        """
+        reused_navigation = self._navigation_is_valid()
+        try:
+            self._navigate(year=year, day=day)
+            response = self._post_download(year=year, month=month, day=day)
+        except Exception:
+            if not reused_navigation:
+                raise
+            response = None
+
+        if reused_navigation and (response is None or self._is_expired_view_response(response)):
+            if response is not None:
+                response.close()
+            self.reset_navigation()
+            self._navigate(year=year, day=day)
+            response = self._post_download(year=year, month=month, day=day)
+
+        self._validate_response(response)
+        return response
+
+    def _navigation_is_valid(self) -> bool:
+        return self._navigation_expires_at is not None and time.monotonic() < self._navigation_expires_at
+
+    def _navigate(self, year: int, day: Optional[int]):
+        if not self._navigation_is_valid():
+            self._get_viewstate_0()
+            self._get_viewstate_1_vehiculos()
+            self._get_viewstate_2_vehiculos_matriculaciones()
+            self._get_viewstate_3_microdatos()
+            self._navigation_year = None
+            self._navigation_expires_at = time.monotonic() + self.navigation_ttl
+
+        if not day and self._navigation_year != year:
             self._get_viewstate_4_year(year)
+            self._navigation_year = year
 
+    def _post_download(self, year: int, month: int, day: Optional[int]) -> requests.Response:
         payload = {
             "configuracionInfPersonalizado": "configuracionInfPersonalizado",
             "javax.faces.ViewState": self._last_viewstate,
@@ -89,18 +213,14 @@ class DGTDownloader:
                 "configuracionInfPersonalizado:filtroMesAnyo": str(year),
             })
 
-        response = self.session.post(
-            "https://sedeapl.dgt.gob.es/WEB_IEST_CONSULTA/microdatos.faces",
+        return self.session.post(
+            f"{self.base_url}/microdatos.faces",
             data=payload,
             stream=True,
         )
-        self._validate_response(response)
-
-        for chunk in self._unzip_stream_response(response):
-            yield chunk.decode(const.FILE_ENCODING)
 
     def _get_viewstate_0(self):
-        response = self.session.get("https://sedeapl.dgt.gob.es/WEB_IEST_CONSULTA/categoria.faces")
+        response = self.session.get(f"{self.base_url}/categoria.faces")
         self._parse_viewstate(response)
 
     def _get_viewstate_1_vehiculos(self):
@@ -110,7 +230,7 @@ class DGTDownloader:
             "javax.faces.ViewState": self._last_viewstate,
         }
         response = self.session.post(
-            url="https://sedeapl.dgt.gob.es/WEB_IEST_CONSULTA/categoria.faces",
+            url=f"{self.base_url}/categoria.faces",
             data=payload,
         )
         self._parse_viewstate(response)
@@ -122,7 +242,7 @@ class DGTDownloader:
             "javax.faces.ViewState": self._last_viewstate,
         }
         response = self.session.post(
-            url="https://sedeapl.dgt.gob.es/WEB_IEST_CONSULTA/categoria.faces",
+            url=f"{self.base_url}/categoria.faces",
             data=payload,
         )
         self._parse_viewstate(response)
@@ -134,7 +254,7 @@ class DGTDownloader:
             "javax.faces.ViewState": self._last_viewstate,
         }
         response = self.session.post(
-            url="https://sedeapl.dgt.gob.es/WEB_IEST_CONSULTA/subcategoria.faces",
+            url=f"{self.base_url}/subcategoria.faces",
             data=payload,
         )
         self._parse_viewstate(response)
@@ -153,11 +273,23 @@ class DGTDownloader:
             "javax.faces.ViewState": self._last_viewstate,
         }
         response = self.session.post(
-            url="https://sedeapl.dgt.gob.es/WEB_IEST_CONSULTA/microdatos.faces",
+            url=f"{self.base_url}/microdatos.faces",
             data=payload,
         )
         self._parse_viewstate(response)
 
+    def _is_expired_view_response(self, response: requests.Response) -> bool:
+        """Whether the portal rejected the JSF view state: an HTTP error, the form page returned again
+        without an error message, or an error message about an expired view.
+        """
+        if not response.ok:
+            return True
+        content_type = response.headers.get("Content-Type", "")
+        if "zip" in content_type or "html" not in content_type:
+            return False
+        error = self._parse_error(response)
+        return not error or any(marker in error.lower() for marker in EXPIRED_VIEW_MARKERS)
+
     def _validate_response(self, response: requests.Response):
         response.raise_for_status()
         content_type = response.headers.get("Content-Type", "")
@@ -181,19 +313,14 @@ class DGTDownloader:
             return error_li.text
 
     def _unzip_stream_response(self, response: requests.Response) -> Generator[bytes, None, None]:
-        response_iterator = response.iter_content(chunk_size=self.unzip_chunk_size)
-        for _, _, file_chunks_iterator in stream_unzip(response_iterator):
-            # Only a single txt file expected in the zip
+        for block in self._unzip_stream_response_batches(response):
+            yield from iter_block_lines(block)
 
-            buffer = b""
-            for chunk in file_chunks_iterator:  # type: bytes
-                buffer += chunk
-                while b"\n" in buffer:
-                    line, buffer = buffer.split(b"\n", 1)
-                    line += b"\n"
-                    yield line
-
-            if buffer:
-                yield buffer
+    def _unzip_stream_response_batches(self, response: requests.Response) -> Generator[bytes, None, None]:
+        yield from self._unzip_chunks_batches(response.iter_content(chunk_size=self.unzip_chunk_size))
 
+    def _unzip_chunks_batches(self, zip_chunks: Iterable[bytes]) -> Generator[bytes, None, None]:
+        for _, _, file_chunks_iterator in stream_unzip(zip_chunks):
+            # Only a single txt file expected in the zip
+            yield from split_chunks_in_line_blocks(file_chunks_iterator)
             break
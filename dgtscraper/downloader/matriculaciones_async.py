@@ -0,0 +1,110 @@
+import asyncio
+import contextlib
+from typing import AsyncGenerator, Callable, Dict, Iterable, Optional, Tuple, Union
+
+from .matriculaciones import DGTDownloader
+from .lines import iter_block_lines
+from ..parser.filters import compile_where, Condition, LineFilter
+
+DateTuple = Tuple[int, ...]
+"""(year, month) or (year, month, day)"""
+
+DEFAULT_CONCURRENCY = 4
+
+_END = object()
+
+
+class AsyncDGTDownloader:
+    """asyncio counterpart of DGTDownloader.
+    Each download runs on its own DGTDownloader (with its own session and JSF viewstate chain),
+    driven from a worker thread, so the event loop is never blocked by network I/O or decompression.
+    """
+
+    def __init__(self, downloader_factory: Callable[[], DGTDownloader] = DGTDownloader):
+        self.downloader_factory = downloader_factory
+
+    async def stream_matriculaciones_batches_by_date(
+            self,
+            year: int,
+            month: int,
+            day: Optional[int] = None,
+            decode: bool = True,
+    ) -> AsyncGenerator[Union[str, bytes], None]:
+        loop = asyncio.get_running_loop()
+        downloader = await loop.run_in_executor(None, self.downloader_factory)
+        iterator = downloader.stream_matriculaciones_batches_by_date(year=year, month=month, day=day, decode=decode)
+        pending = None
+        try:
+            while True:
+                # shielded, so that on cancellation the running next() call can be awaited before closing the iterator
+                pending = loop.run_in_executor(None, next, iterator, _END)
+                block = await asyncio.shield(pending)
+                if block is _END:
+                    break
+                yield block
+
+        finally:
+            if pending is not None and not pending.done():
+                await asyncio.wait([pending])
+            await loop.run_in_executor(None, iterator.close)
+            downloader.session.close()
+
+    async def stream_matriculaciones_by_date(
+            self,
+            year: int,
+            month: int,
+            day: Optional[int] = None,
+            where: Union[Dict[str, Condition], LineFilter, None] = None,
+    ) -> AsyncGenerator[str, None]:
+        where = compile_where(where)
+        async for block in self.stream_matriculaciones_batches_by_date(year=year, month=month, day=day):
+            for line in iter_block_lines(block):
+                if where is None or where(line):
+                    yield line
+
+    async def stream_many(
+            self,
+            dates: Iterable[DateTuple],
+            concurrency: int = DEFAULT_CONCURRENCY,
+            queue_size: int = 64,
+    ) -> AsyncGenerator[Tuple[DateTuple, str], None]:
+        """Download several dates, with at most `concurrency` downloads running at the same time.
+        Yields (date, line) tuples; lines of different dates are interleaved, but each date keeps its own order.
+        The queue between downloads and the consumer is bounded, so downloads pause when the consumer falls behind.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        queue = asyncio.Queue(maxsize=queue_size)
+
+        async def download(date: DateTuple):
+            async with semaphore:
+                blocks = self.stream_matriculaciones_batches_by_date(*date)
+                async with contextlib.aclosing(blocks):
+                    async for block in blocks:
+                        await queue.put((date, block))
+
+        tasks = [asyncio.create_task(download(tuple(date))) for date in dates]
+
+        async def wait_downloads():
+            try:
+                await asyncio.gather(*tasks)
+                await queue.put(_END)
+            except Exception as ex:
+                await queue.put(ex)
+
+        waiter = asyncio.create_task(wait_downloads())
+        try:
+            while True:
+                item = await queue.get()
+                if item is _END:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+
+                date, block = item
+                for line in iter_block_lines(block):
+                    yield date, line
+
+        finally:
+            for task in (*tasks, waiter):
+                task.cancel()
+            await asyncio.gather(*tasks, waiter, return_exceptions=True)
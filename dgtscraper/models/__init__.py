@@ -1,2 +1,4 @@
 from .common import ParseError
 from .matriculaciones import Matriculacion, ClaseMatriculaEnum
+from .checkpoint import IngestCheckpoint
+from .record import MatriculacionRecord
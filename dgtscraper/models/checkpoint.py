@@ -0,0 +1,37 @@
+import os
+import pathlib
+from typing import Optional, Union
+
+import pydantic
+
+
+class IngestCheckpoint(pydantic.BaseModel):
+    """Progreso confirmado de una ingesta de matriculaciones, para poder reanudarla tras un fallo.
+    Al reanudar se saltan las líneas por número, así que se asume que el fichero de origen no ha cambiado desde que se
+    guardó el checkpoint. Los datos diarios provisionales se revisan, y no cumplen esa condición.
+    """
+
+    source: str
+    """Origen de los datos (p.ej. la fecha descargada, 'YYYY-MM' o 'YYYY-MM-DD')."""
+    last_line_number: int = 0
+    """Última línea del fichero de origen cuyas matriculaciones ya se han guardado."""
+    count: int = 0
+    """Número de matriculaciones guardadas hasta last_line_number."""
+
+    @classmethod
+    def load(cls, path: Union[pathlib.Path, str], source: str) -> "IngestCheckpoint":
+        """Carga el checkpoint guardado para el origen indicado; si no existe, o es de otro origen, empieza de cero."""
+        try:
+            checkpoint = cls.parse_file(path)
+        except (OSError, ValueError):
+            checkpoint: Optional[IngestCheckpoint] = None
+
+        if checkpoint is None or checkpoint.source != source:
+            checkpoint = cls(source=source)
+        return checkpoint
+
+    def save(self, path: Union[pathlib.Path, str]):
+        path = pathlib.Path(path)
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_text(self.json())
+        os.replace(tmp_path, path)
@@ -28,6 +28,24 @@ class CampoMetadata(pydantic.BaseModel):
         return cls(field_name_in_class=field_name, **kwargs)
 
 
+def render_layout_module(model_name: str, fields_metadata: List[CampoMetadata]) -> str:
+    """Código fuente del módulo con la tabla estática de campos de un modelo (ver matriculaciones_layout.py)."""
+    lines = [
+        f'"""Posiciones de los campos de {model_name} en el fichero de ancho fijo.',
+        "",
+        f"Generado a partir de los docstrings de {model_name} con matriculaciones_generate_layout.py; no editar a mano.",
+        '"""',
+        "",
+        "# (campo en el modelo, clave DGT, posición, longitud)",
+        "LAYOUT = (",
+    ]
+    for metadata in fields_metadata:
+        row = (metadata.field_name_in_class, metadata.clave, metadata.posicion, metadata.longitud)
+        lines.append(f"    {row!r},")
+    lines.append(")")
+    return "\n".join(lines) + "\n"
+
+
 class ParseError(pydantic.BaseModel):
     exception: Exception
     line_number: Optional[int] = None
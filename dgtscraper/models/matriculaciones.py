@@ -3,9 +3,9 @@ import enum
 from typing import Optional
 
 import pydantic
-import class_doc
 
 from .common import CampoMetadata
+from .matriculaciones_layout import LAYOUT
 
 
 class ClaseMatriculaEnum(str, enum.Enum):
@@ -337,19 +337,32 @@ class Matriculacion(pydantic.BaseModel):
 
     @classmethod
     def get_fields_metadata(cls):
+        """Metadatos de los campos, ordenados por posición, desde la tabla estática de matriculaciones_layout.py."""
         singleton_attr_name = "__claves_fields_singleton"
         try:
             return getattr(cls, singleton_attr_name)
         except AttributeError:
-            fields_docs = class_doc.extract_docs_from_cls_obj(cls)
             result = [
-                CampoMetadata.from_docstring(
-                    field_name=field_name,
-                    docstring_lines=field_docs_lines,
-                )
-                for field_name, field_docs_lines in fields_docs.items()
+                CampoMetadata(field_name_in_class=field_name, clave=clave, posicion=posicion, longitud=longitud)
+                for field_name, clave, posicion, longitud in LAYOUT
             ]
-            result.sort(key=lambda metadata: metadata.posicion)
-
             setattr(cls, singleton_attr_name, result)
             return result
+
+    @classmethod
+    def extract_fields_metadata(cls):
+        """Metadatos de los campos, ordenados por posición, extraídos de los docstrings de la clase.
+        Necesita el código fuente del módulo; se usa para generar la tabla estática (y comprobar que no difiere).
+        """
+        import class_doc
+
+        fields_docs = class_doc.extract_docs_from_cls_obj(cls)
+        result = [
+            CampoMetadata.from_docstring(
+                field_name=field_name,
+                docstring_lines=field_docs_lines,
+            )
+            for field_name, field_docs_lines in fields_docs.items()
+        ]
+        result.sort(key=lambda metadata: metadata.posicion)
+        return result
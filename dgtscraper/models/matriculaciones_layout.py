@@ -0,0 +1,44 @@
+"""Posiciones de los campos de Matriculacion en el fichero de ancho fijo.
+
+Generado a partir de los docstrings de Matriculacion con matriculaciones_generate_layout.py; no editar a mano.
+"""
+
+# (campo en el modelo, clave DGT, posición, longitud)
+LAYOUT = (
+    ('fechaMatriculacion', 'FEC_MATRICULA', 1, 8),
+    ('claseMatricula', 'COD_CLASE_MAT', 2, 1),
+    ('fechaTransferencia', 'FEC_TRAMITACION', 3, 8),
+    ('vehiculoMarca', 'MARCA_ITV', 4, 30),
+    ('vehiculoModelo', 'MODELO_ITV', 5, 22),
+    ('codigoProcedencia', 'COD_PROCEDENCIA_ITV', 6, 1),
+    ('bastidor', 'BASTIDOR_ITV', 7, 21),
+    ('codigoTipo', 'COD_TIPO', 8, 2),
+    ('codPropulsion', 'COD_PROPULSION_ITV', 9, 1),
+    ('cilindrada', 'CILINDRADA_ITV', 10, 5),
+    ('potencia', 'POTENCIA_ITV', 11, 6),
+    ('tara', 'TARA', 12, 6),
+    ('pesoMaximo', 'PESO_MAX', 13, 6),
+    ('plazas', 'NUM_PLAZAS', 14, 3),
+    ('precintado', 'IND_PRECINTO', 15, 2),
+    ('embargado', 'IND_EMBARGO', 16, 2),
+    ('transmisiones', 'NUM_TRANSMISIONES', 17, 2),
+    ('titulares', 'NUM_TITULARES', 18, 2),
+    ('localidad', 'LOCALIDAD_VEHICULO', 19, 24),
+    ('provincia', 'COD_PROVINCIA_VEH', 20, 2),
+    ('provinciaMatriculacion', 'COD_PROVINCIA_MAT', 21, 2),
+    ('tramite', 'CLAVE_TRAMITE', 22, 1),
+    ('fechaTramite', 'FEC_TRAMITE', 23, 8),
+    ('codigoPostal', 'CODIGO_POSTAL', 24, 5),
+    ('fechaPrimeraMatriculacion', 'FEC_PRIM_MATRICULACION', 25, 8),
+    ('nuevo', 'IND_NUEVO_USADO', 26, 1),
+    ('personaJuridica', 'PERSONA_FISICA_JURIDICA', 27, 1),
+    ('codigoITV', 'CODIGO_ITV', 28, 9),
+    ('servicio', 'SERVICIO', 29, 3),
+    ('codigoMunicipioINE', 'COD_MUNICIPIO_INE_VEH', 30, 5),
+    ('municipio', 'MUNICIPIO', 31, 30),
+    ('potenciaKW', 'KW_ITV', 32, 7),
+    ('plazasMaximo', 'NUM_PLAZAS_MAX', 33, 3),
+    ('co2', 'CO2_ITV', 34, 5),
+    ('renting', 'RENTING', 35, 1),
+    ('titularTutelado', 'COD_TUTELA', 36, 1),
+)
@@ -0,0 +1,31 @@
+import collections
+from .matriculaciones import Matriculacion
+
+_MatriculacionRecordBase = collections.namedtuple("_MatriculacionRecordBase", list(Matriculacion.__fields__))
+
+
+class MatriculacionRecord(_MatriculacionRecordBase):
+    """Matriculación ligera, respaldada por una tupla: mismos atributos (ya convertidos) que Matriculacion,
+    sin __dict__ ni __fields_set__, y mucho más rápida de crear. No se valida con pydantic.
+    Para validarla o serializarla a JSON, se convierte a Matriculacion con to_model().
+    """
+
+    __slots__ = ()
+
+    @property
+    def cargaUtil(self) -> float:
+        return self.pesoMaximo - self.tara
+
+    @classmethod
+    def from_model(cls, matriculacion: Matriculacion) -> "MatriculacionRecord":
+        values = matriculacion.__dict__
+        return cls._make([values[field_name] for field_name in cls._fields])
+
+    def to_model(self, validate: bool = False) -> Matriculacion:
+        """Convierte a Matriculacion: sin validar (como el parseo con strict=False), o validando con pydantic,
+        lo que puede lanzar pydantic.ValidationError.
+        """
+        values = self._asdict()
+        if validate:
+            return Matriculacion(**values)
+        return Matriculacion.construct(**values)
@@ -1 +1,5 @@
 from .matriculaciones import parse_matriculaciones_file, parse_matriculaciones_line
+from .decoder import MatriculacionDecoder, get_memo_stats
+from .filters import Between, compile_where
+from .parallel import parse_matriculaciones_file_parallel
+from .mmap_file import MatriculacionesFile
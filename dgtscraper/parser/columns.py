@@ -0,0 +1,170 @@
+"""Parseo columnar de ficheros de matriculaciones, en bloques de columnas tipadas de NumPy.
+Requiere numpy (dependencia opcional, no incluida en requirements.txt).
+
+Tipos de columna:
+- Fechas: datetime64[D] (NaT si vacía o inválida)
+- Decimales: float64 (NaN si vacío o inválido)
+- Enteros: numpy.ma.MaskedArray de int64 (enmascarado si vacío o inválido)
+- Booleanos: bool
+- Textos y códigos: bytes de ancho fijo (S<longitud>), sin espacios, codificados en iso-8859-1
+"""
+
+import datetime
+from typing import Dict, Generator, IO, Iterable, List, Optional, Union
+
+import numpy as np
+
+from .decoder import get_decoder, FieldSlice
+from .interning import get_interner
+from ..models.matriculaciones import Matriculacion
+from .. import const
+
+DEFAULT_BATCH_SIZE = 65536
+HEADER_PREFIX = "Vehículos matriculados".encode(const.FILE_ENCODING)
+
+_BOOLEAN_TRUE_VALUES = {
+    "nuevo": [b"N"],
+    "personaJuridica": [b"X"],
+}
+_BOOLEAN_DEFAULT_TRUE_VALUES = [b"S", b"SI"]
+
+
+class ColumnBlock:
+    """Bloque de matriculaciones en formato columnar.
+    first_line_number es el número de línea (en el fichero original, empezando en 1) de la primera fila del bloque.
+    """
+
+    def __init__(self, columns: Dict[str, np.ndarray], first_line_number: int):
+        self.columns = columns
+        self.first_line_number = first_line_number
+
+    def __len__(self) -> int:
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def __getitem__(self, field_name: str) -> np.ndarray:
+        return self.columns[field_name]
+
+    def __iter__(self):
+        return iter(self.columns)
+
+    def __repr__(self):
+        return f"ColumnBlock(rows={len(self)}, first_line_number={self.first_line_number})"
+
+    def get_categorical_codes(self, field_name: str) -> np.ndarray:
+        """Códigos categóricos (int32) de una columna de texto internada, según el diccionario compartido del campo
+        (ver interning.py): el valor de cada código es get_interner().get_dictionary(field_name).values[código].
+        Los valores que no caben en el diccionario tienen el código -1.
+        """
+        dictionary = get_interner().get_dictionary(field_name)
+        uniques, inverse = np.unique(self.columns[field_name], return_inverse=True)
+        codes = np.array([dictionary.get_code(value.decode(const.FILE_ENCODING)) for value in uniques], dtype=np.int32)
+        return codes[inverse.reshape(-1)]
+
+
+def parse_matriculaciones_columns(
+        file: Union[IO[str], IO[bytes], Iterable[Union[str, bytes]]],
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        fields: Optional[Iterable[str]] = None,
+) -> Generator[ColumnBlock, None, None]:
+    """Lee un fichero de matriculaciones (en modo texto o binario), devolviendo bloques de hasta batch_size filas.
+    Si se indican fields, solo se decodifican esas columnas.
+    """
+    decoder = get_decoder()
+    line_length = decoder.line_length
+    lines: List[bytes] = list()
+    first_line_number: Optional[int] = None
+
+    line_number = 0
+    for line in file:
+        line_number += 1
+        if isinstance(line, str):
+            line = line.encode(const.FILE_ENCODING)
+        line = line.rstrip(b"\r\n")
+        if not line or line.startswith(HEADER_PREFIX):
+            continue
+
+        if first_line_number is None:
+            first_line_number = line_number
+        lines.append(line[:line_length].ljust(line_length))
+
+        if len(lines) >= batch_size:
+            yield decode_columns(b"".join(lines), first_line_number, fields=fields)
+            lines.clear()
+            first_line_number = None
+
+    if lines:
+        yield decode_columns(b"".join(lines), first_line_number, fields=fields)
+
+
+def decode_columns(block: bytes, first_line_number: int = 1, fields: Optional[Iterable[str]] = None) -> ColumnBlock:
+    """Decodifica un bloque de líneas de ancho fijo, todas de la longitud del decodificador y sin saltos de línea."""
+    decoder = get_decoder()
+    rows = np.frombuffer(block, dtype=np.uint8).reshape(-1, decoder.line_length)
+    fields = set(fields) if fields is not None else None
+    columns = {
+        field_slice.name: _decode_column(field_slice, rows[:, field_slice.start:field_slice.end])
+        for field_slice in decoder.slices
+        if fields is None or field_slice.name in fields
+    }
+    return ColumnBlock(columns=columns, first_line_number=first_line_number)
+
+
+def _decode_column(field_slice: FieldSlice, raw: np.ndarray) -> np.ndarray:
+    model_field = Matriculacion.__fields__[field_slice.name]
+    field_type = model_field.type_
+
+    if field_type is datetime.date:
+        return _decode_dates(raw)
+
+    values = np.char.strip(_as_bytes_column(raw))
+    if field_type is bool:
+        true_values = _BOOLEAN_TRUE_VALUES.get(field_slice.name, _BOOLEAN_DEFAULT_TRUE_VALUES)
+        return np.isin(values, true_values)
+    if field_type is float:
+        return _decode_floats(values)
+    if field_type is int:
+        floats = _decode_floats(values)
+        invalid = np.isnan(floats) | (floats != np.floor(floats))
+        return np.ma.MaskedArray(np.where(invalid, 0, floats).astype(np.int64), mask=invalid)
+    return values
+
+
+def _as_bytes_column(raw: np.ndarray) -> np.ndarray:
+    width = raw.shape[1]
+    return np.ascontiguousarray(raw).view(f"S{width}").reshape(-1)
+
+
+def _decode_floats(values: np.ndarray) -> np.ndarray:
+    values = np.where(values == b"", b"nan", values)
+    try:
+        return values.astype(np.float64)
+    except ValueError:
+        # alguno de los valores no es numérico: convertir uno a uno
+        return np.array([_to_float_or_nan(value) for value in values], dtype=np.float64)
+
+
+def _to_float_or_nan(value: bytes) -> float:
+    try:
+        return float(value)
+    except ValueError:
+        return np.nan
+
+
+def _decode_dates(raw: np.ndarray) -> np.ndarray:
+    """Convierte columnas 'DDMMYYYY' a datetime64[D]."""
+    digits = raw.astype(np.int64) - ord("0")
+    valid = np.all((digits >= 0) & (digits <= 9), axis=1)
+
+    day = digits[:, 0] * 10 + digits[:, 1]
+    month = digits[:, 2] * 10 + digits[:, 3]
+    year = digits[:, 4] * 1000 + digits[:, 5] * 100 + digits[:, 6] * 10 + digits[:, 7]
+    valid &= (month >= 1) & (month <= 12) & (day >= 1)
+
+    months = (year - 1970) * 12 + np.where(valid, month - 1, 0)
+    month_start = months.astype("datetime64[M]")
+    dates = month_start.astype("datetime64[D]") + np.where(valid, day - 1, 0).astype("timedelta64[D]")
+
+    # descartar días fuera del mes (p.ej. 31 de febrero)
+    valid &= dates.astype("datetime64[M]") == month_start
+    dates[~valid] = np.datetime64("NaT")
+    return dates
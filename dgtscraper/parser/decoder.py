@@ -0,0 +1,211 @@
+import datetime
+import functools
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple, Any
+
+from ..models.matriculaciones import Matriculacion, ClaseMatriculaEnum
+
+
+class FieldSlice(NamedTuple):
+    """Posición precalculada de un campo dentro de una línea, junto a su conversor."""
+
+    name: str
+    start: int
+    end: int
+    converter: Callable[[str], Any]
+
+
+def convert_date(v: str) -> datetime.date:
+    """Equivalent to Matriculacion.convert_date followed by pydantic date parsing, for 'DDMMYYYY' strings."""
+    if len(v) != 8 or not v.isdigit():
+        raise ValueError(f"Invalid date {v!r}")
+    return datetime.date(int(v[4:8]), int(v[2:4]), int(v[0:2]))
+
+
+def convert_optional_date(v: str) -> Optional[datetime.date]:
+    if not v:
+        return None
+    return convert_date(v)
+
+
+def convert_optional_int(v: str) -> Optional[int]:
+    if not v:
+        return None
+    return int(v)
+
+
+def convert_potenciakw(v: str) -> Optional[float]:
+    if v == "*******":
+        return None
+    return float(v)
+
+
+def convert_str(v: str) -> str:
+    return v
+
+
+_BOOLEAN_VALUES = {"SI": True, "S": True, "": False, "NO": False, "N": False}
+_ESTADO_NUEVO_VALUES = {"N": True, "U": False}
+_PERSONA_JURIDICA_VALUES = {"X": True, "D": False}
+
+
+def convert_boolean(v: str) -> bool:
+    return _BOOLEAN_VALUES[v]
+
+
+def convert_estado_nuevo(v: str) -> bool:
+    return _ESTADO_NUEVO_VALUES[v]
+
+
+def convert_persona_juridica(v: str) -> bool:
+    return _PERSONA_JURIDICA_VALUES[v]
+
+
+# Conversores que replican los pre-validators particulares de Matriculacion
+FIELD_CONVERTERS: Dict[str, Callable[[str], Any]] = {
+    "nuevo": convert_estado_nuevo,
+    "personaJuridica": convert_persona_juridica,
+    "potenciaKW": convert_potenciakw,
+}
+
+# Conversores por tipo de campo: (tipo, admite nulos) -> conversor
+TYPE_CONVERTERS: Dict[tuple, Callable[[str], Any]] = {
+    (datetime.date, False): convert_date,
+    (datetime.date, True): convert_optional_date,
+    (int, False): int,
+    (int, True): convert_optional_int,
+    (float, False): float,
+    (bool, False): convert_boolean,
+    (str, False): convert_str,
+    (ClaseMatriculaEnum, False): ClaseMatriculaEnum,
+}
+
+
+def get_field_converter(field_name: str) -> Callable[[str], Any]:
+    try:
+        return FIELD_CONVERTERS[field_name]
+    except KeyError:
+        model_field = Matriculacion.__fields__[field_name]
+        return TYPE_CONVERTERS[(model_field.type_, model_field.allow_none)]
+
+
+# Campos con pocos valores distintos (fechas, enums, booleanos, códigos numéricos), cuya conversión se memoriza
+MEMOIZED_FIELDS = (
+    "fechaMatriculacion",
+    "claseMatricula",
+    "fechaTransferencia",
+    "plazas",
+    "precintado",
+    "embargado",
+    "transmisiones",
+    "titulares",
+    "fechaTramite",
+    "fechaPrimeraMatriculacion",
+    "nuevo",
+    "personaJuridica",
+    "codigoMunicipioINE",
+    "potenciaKW",
+    "plazasMaximo",
+    "co2",
+    "renting",
+    "titularTutelado",
+)
+DEFAULT_MEMO_SIZE = 4096
+
+_memoized_converters: Dict[str, Callable[[str], Any]] = dict()
+
+
+def get_memoized_converter(field_name: str) -> Callable[[str], Any]:
+    """Conversor del campo con una cache LRU acotada (DEFAULT_MEMO_SIZE valores) de texto a valor convertido,
+    compartida por todos los decodificadores del proceso. Los valores que no se pueden convertir no se cachean.
+    """
+    try:
+        return _memoized_converters[field_name]
+    except KeyError:
+        converter = functools.lru_cache(maxsize=DEFAULT_MEMO_SIZE)(get_field_converter(field_name))
+        return _memoized_converters.setdefault(field_name, converter)
+
+
+def get_memo_stats() -> Dict[str, dict]:
+    """Aciertos, fallos, tamaño y tasa de aciertos de la cache de cada campo memorizado."""
+    stats = dict()
+    for field_name, converter in _memoized_converters.items():
+        info = converter.cache_info()
+        calls = info.hits + info.misses
+        stats[field_name] = {
+            "hits": info.hits,
+            "misses": info.misses,
+            "size": info.currsize,
+            "hit_rate": info.hits / calls if calls else 0.0,
+        }
+    return stats
+
+
+def clear_memo():
+    for converter in _memoized_converters.values():
+        converter.cache_clear()
+
+
+class MatriculacionDecoder:
+    """Decodificador de líneas de matriculaciones, compilado una única vez a partir de los metadatos de campos.
+    Convierte cada línea a valores tipados sin pasar por la validación de pydantic.
+    Cualquier valor que no se pueda convertir lanza una excepción; en ese caso, se debe recurrir al modelo pydantic.
+    converters permite sustituir el conversor de algunos campos (por nombre de campo).
+    Con memoize=True, los campos de MEMOIZED_FIELDS usan los conversores memorizados (ver get_memoized_converter).
+    """
+
+    def __init__(self, converters: Optional[Dict[str, Callable[[str], Any]]] = None, memoize: bool = True):
+        converters = dict(converters or dict())
+        if memoize:
+            for field_name in MEMOIZED_FIELDS:
+                converters.setdefault(field_name, get_memoized_converter(field_name))
+        self.slices: List[FieldSlice] = list()
+        index_start = 0
+        for field_metadata in Matriculacion.get_fields_metadata():
+            index_end = index_start + field_metadata.longitud
+            field_name = field_metadata.field_name_in_class
+            self.slices.append(FieldSlice(
+                name=field_name,
+                start=index_start,
+                end=index_end,
+                converter=converters.get(field_name) or get_field_converter(field_name),
+            ))
+            index_start = index_end
+
+        self.line_length = index_start
+        self._projections: Dict[Tuple[str, ...], List[FieldSlice]] = dict()
+
+    def decode(self, line: str) -> dict:
+        return {
+            name: converter(line[start:end].strip())
+            for name, start, end, converter in self.slices
+        }
+
+    def project(self, fields: Tuple[str, ...]) -> List[FieldSlice]:
+        """Slices de los campos indicados (en el orden indicado), para decodificar solo esas columnas."""
+        try:
+            return self._projections[fields]
+        except KeyError:
+            slices_by_name = {field_slice.name: field_slice for field_slice in self.slices}
+            try:
+                projection = [slices_by_name[field_name] for field_name in fields]
+            except KeyError as ex:
+                raise ValueError(f"Unknown field {ex.args[0]}") from None
+            self._projections[fields] = projection
+            return projection
+
+    def decode_values(self, line: str) -> list:
+        """Valores convertidos de la línea, en el orden de los campos (el de Matriculacion.__fields__)."""
+        return [converter(line[start:end].strip()) for _, start, end, converter in self.slices]
+
+    def decode_to_model(self, line: str) -> Matriculacion:
+        return Matriculacion.construct(**self.decode(line))
+
+
+def get_decoder() -> MatriculacionDecoder:
+    global _decoder
+    if _decoder is None:
+        _decoder = MatriculacionDecoder()
+    return _decoder
+
+
+_decoder: Optional[MatriculacionDecoder] = None
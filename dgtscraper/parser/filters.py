@@ -0,0 +1,135 @@
+"""Filtros sobre las líneas sin parsear (predicate pushdown).
+
+Las condiciones se evalúan sobre el texto de cada campo en la línea de ancho fijo (según Matriculacion.get_fields_metadata),
+antes de convertir o validar nada: una línea descartada solo cuesta extraer y comparar los campos filtrados.
+
+Condiciones de `where` ({campo: condición}, deben cumplirse todas):
+- Un valor: igualdad. Los textos se comparan con el valor del campo sin espacios; las fechas (datetime.date o 'YYYY-MM-DD'),
+  números, booleanos y enums, con el valor convertido.
+- Un conjunto, lista o tupla de valores: el campo debe ser uno de ellos.
+- Between(min, max): rango, con ambos extremos incluidos (None para no limitar). Las fechas se comparan como fechas
+  (sin construir objetos date), los campos numéricos como números y el resto como textos.
+- Una función: recibe el texto del campo (sin espacios) y devuelve si la línea se acepta.
+
+Los valores vacíos o inválidos de campos numéricos o de fecha no cumplen ninguna condición de valor ni de rango.
+"""
+
+import datetime
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+
+from .decoder import get_decoder, FieldSlice
+from ..models.matriculaciones import Matriculacion
+
+
+class Between(NamedTuple):
+    min: Any = None
+    max: Any = None
+
+
+Condition = Union[Any, Between, Callable[[str], bool]]
+RawTest = Callable[[str], bool]
+
+
+class LineFilter:
+    """Filtro compilado: where ya traducido a comparaciones sobre las posiciones de cada campo."""
+
+    def __init__(self, where: Dict[str, Condition]):
+        self.where = where
+        slices = {field_slice.name: field_slice for field_slice in get_decoder().slices}
+        self._tests: List[Tuple[int, int, RawTest]] = list()
+        for field_name, condition in where.items():
+            try:
+                field_slice = slices[field_name]
+            except KeyError:
+                raise ValueError(f"Unknown field {field_name}") from None
+            self._tests.append((field_slice.start, field_slice.end, _compile_condition(field_slice, condition)))
+
+    def __call__(self, line: str) -> bool:
+        for start, end, test in self._tests:
+            if not test(line[start:end].strip()):
+                return False
+        return True
+
+
+def compile_where(where: Union[Dict[str, Condition], LineFilter, None]) -> Optional[LineFilter]:
+    if where is None or isinstance(where, LineFilter):
+        return where
+    return LineFilter(where)
+
+
+def _compile_condition(field_slice: FieldSlice, condition: Condition) -> RawTest:
+    if callable(condition) and not isinstance(condition, type):
+        return condition
+
+    field_type = Matriculacion.__fields__[field_slice.name].type_
+    to_key = _get_key_function(field_type, field_slice.converter)
+
+    if isinstance(condition, Between):
+        low = _value_key(field_type, condition.min) if condition.min is not None else None
+        high = _value_key(field_type, condition.max) if condition.max is not None else None
+
+        def test_between(raw: str) -> bool:
+            key = to_key(raw)
+            if key is None:
+                return False
+            return (low is None or key >= low) and (high is None or key <= high)
+        return test_between
+
+    if isinstance(condition, (set, frozenset, list, tuple)):
+        keys = frozenset(_value_key(field_type, value) for value in condition)
+        if to_key is _str_key:
+            return keys.__contains__
+        return lambda raw: to_key(raw) in keys
+
+    key = _value_key(field_type, condition)
+    if to_key is _str_key:
+        return key.__eq__
+    return lambda raw: to_key(raw) == key
+
+
+def _str_key(raw: str) -> str:
+    return raw
+
+
+def _date_key(raw: str) -> Optional[str]:
+    """'DDMMYYYY' -> 'YYYYMMDD', que se puede comparar como texto."""
+    if len(raw) != 8 or not raw.isdigit():
+        return None
+    return raw[4:8] + raw[2:4] + raw[0:2]
+
+
+def _number_key(raw: str) -> Optional[float]:
+    try:
+        return float(raw)
+    except ValueError:
+        return None
+
+
+def _get_key_function(field_type: type, converter: Callable[[str], Any]) -> Callable[[str], Any]:
+    if field_type is datetime.date:
+        return _date_key
+    if field_type in (int, float):
+        return _number_key
+    if field_type is str:
+        return _str_key
+
+    # booleans and enums: compare the converted values
+    def converted_key(raw: str) -> Any:
+        try:
+            return converter(raw)
+        except (KeyError, ValueError):
+            return None
+    return converted_key
+
+
+def _value_key(field_type: type, value: Any) -> Any:
+    """Convierte un valor de la condición a la misma forma que la clave del campo."""
+    if field_type is datetime.date:
+        if isinstance(value, str):
+            value = datetime.date.fromisoformat(value)
+        return value.strftime("%Y%m%d")
+    if field_type in (int, float):
+        return float(value)
+    if field_type is str:
+        return str(value)
+    return value
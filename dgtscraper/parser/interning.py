@@ -0,0 +1,104 @@
+"""Internado de valores repetidos entre matriculaciones.
+
+Los campos de texto de baja cardinalidad (marcas, modelos, localidades, códigos...) se repiten cientos de miles de veces
+en un mes. Cada campo tiene un diccionario compartido y acotado de valores: al parsear, cada valor se sustituye por
+la instancia ya guardada en el diccionario, de forma que todas las matriculaciones comparten la misma cadena.
+Cuando un diccionario se llena, los valores nuevos se dejan sin internar (y sin código categórico).
+
+El índice de cada valor en su diccionario es su código categórico, estable durante la vida del proceso, que pueden usar
+los consumidores columnares (ver ColumnBlock.get_categorical_codes).
+"""
+
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from .decoder import MatriculacionDecoder
+
+INTERNED_FIELDS = (
+    "vehiculoMarca",
+    "vehiculoModelo",
+    "codigoProcedencia",
+    "codigoTipo",
+    "codPropulsion",
+    "localidad",
+    "provincia",
+    "provinciaMatriculacion",
+    "tramite",
+    "codigoPostal",
+    "codigoITV",
+    "servicio",
+    "municipio",
+)
+DEFAULT_MAX_VALUES = 65536
+
+
+class FieldDictionary:
+    """Valores de un campo, por orden de aparición; el índice de cada valor es su código categórico."""
+
+    def __init__(self, field_name: str, max_values: int = DEFAULT_MAX_VALUES):
+        self.field_name = field_name
+        self.max_values = max_values
+        self.values: List[str] = list()
+        self._codes: Dict[str, int] = dict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.values)
+
+    def intern(self, value: str) -> str:
+        code = self._codes.get(value)
+        if code is None:
+            code = self._add(value)
+        return value if code is None else self.values[code]
+
+    def get_code(self, value: str) -> int:
+        """Código categórico del valor (añadiéndolo al diccionario si no estaba), o -1 si el diccionario está lleno."""
+        code = self._codes.get(value)
+        if code is None:
+            code = self._add(value)
+        return -1 if code is None else code
+
+    def _add(self, value: str) -> Optional[int]:
+        with self._lock:
+            code = self._codes.get(value)
+            if code is None and len(self.values) < self.max_values:
+                code = len(self.values)
+                self.values.append(value)
+                self._codes[value] = code
+            return code
+
+
+class Interner:
+    def __init__(self, fields: Iterable[str] = INTERNED_FIELDS, max_values: int = DEFAULT_MAX_VALUES):
+        self.dictionaries: Dict[str, FieldDictionary] = {
+            field_name: FieldDictionary(field_name, max_values) for field_name in fields
+        }
+        self._dictionaries_items = list(self.dictionaries.items())
+        # decoder whose converters of interned fields return the shared instances
+        self.decoder = MatriculacionDecoder(converters={
+            field_name: dictionary.intern for field_name, dictionary in self.dictionaries.items()
+        })
+
+    def get_dictionary(self, field_name: str) -> FieldDictionary:
+        try:
+            return self.dictionaries[field_name]
+        except KeyError:
+            raise ValueError(f"Field {field_name} is not interned") from None
+
+    def intern_values(self, values: dict) -> dict:
+        """Sustituye (en el propio diccionario) los valores de los campos internados por sus instancias compartidas."""
+        for field_name, dictionary in self._dictionaries_items:
+            value = values.get(field_name)
+            if value.__class__ is str:
+                values[field_name] = dictionary.intern(value)
+        return values
+
+
+def get_interner() -> Interner:
+    global _interner
+    if _interner is None:
+        _interner = Interner()
+    return _interner
+
+
+_interner: Optional[Interner] = None
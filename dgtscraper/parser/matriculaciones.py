@@ -1,23 +1,83 @@
-from typing import Generator, Union, Optional, TextIO
+from typing import Dict, Generator, Iterable, Union, Optional, TextIO, Tuple
 
+import pydantic
+
+from .decoder import get_decoder, get_memoized_converter, MEMOIZED_FIELDS
+from .interning import get_interner, Interner
+from .filters import compile_where, Condition, LineFilter
 from ..models.matriculaciones import Matriculacion
+from ..models.record import MatriculacionRecord
 from ..models.common import ParseError
 
 
-def parse_matriculaciones_file(file: TextIO) -> Generator[Union[Matriculacion, ParseError], None, None]:
+def parse_matriculaciones_file(
+        file: TextIO,
+        strict: bool = True,
+        intern: bool = False,
+        as_record: bool = False,
+        fields: Optional[Iterable[str]] = None,
+        where: Union[Dict[str, Condition], LineFilter, None] = None,
+) -> Generator[Union[Matriculacion, MatriculacionRecord, dict, ParseError], None, None]:
+    if fields is not None:
+        fields = tuple(fields)
+    where = compile_where(where)
     i = 0
     for line in file:
         i += 1
-        yield parse_matriculaciones_line(line, i)
+        yield parse_matriculaciones_line(
+            line, i, strict=strict, intern=intern, as_record=as_record, fields=fields, where=where,
+        )
 
 
-def parse_matriculaciones_line(line: str, _line_number: Optional[int] = None) -> Union[Matriculacion, ParseError, None]:
+def parse_matriculaciones_line(
+        line: str,
+        _line_number: Optional[int] = None,
+        strict: bool = True,
+        intern: bool = False,
+        as_record: bool = False,
+        fields: Optional[Iterable[str]] = None,
+        where: Union[Dict[str, Condition], LineFilter, None] = None,
+) -> Union[Matriculacion, MatriculacionRecord, dict, ParseError, None]:
+    """Parsea una línea de matriculaciones.
+    Con strict=False, la línea se convierte con el decodificador compilado y se construye el modelo sin validarlo
+    con pydantic; si la conversión falla, se recurre a la validación estricta para obtener el ParseError.
+    Con intern=True, los textos repetidos se comparten entre matriculaciones (ver interning.py); los diccionarios
+    de valores son globales del proceso y no se vacían, por lo que solo conviene en procesos que parsean muchas líneas.
+    Con as_record=True, se devuelve un MatriculacionRecord en lugar del modelo pydantic (validado antes si strict=True).
+    Con fields, solo se extraen y convierten esos campos, y se devuelve un dict {campo: valor};
+    con strict=True, cada campo se valida con su validador de pydantic.
+    Con where, las líneas que no cumplen las condiciones se descartan (devolviendo None) antes de parsearlas
+    (ver filters.py); para parsear muchas líneas sueltas, conviene compilarlo una vez con compile_where().
+    """
     if not line or line.startswith("Vehículos matriculados"):
         return None
+    if where is not None and not compile_where(where)(line):
+        return None
+
+    interner = get_interner() if intern else None
+    if fields is not None:
+        if as_record:
+            raise ValueError("as_record cannot be combined with a fields projection")
+        return _parse_matriculaciones_line_fields(line, _line_number, tuple(fields), strict, interner)
+    if not strict:
+        try:
+            if as_record:
+                decoder = interner.decoder if interner is not None else get_decoder()
+                return MatriculacionRecord._make(decoder.decode_values(line))
+            if interner is None:
+                return get_decoder().decode_to_model(line)
+            return Matriculacion.construct(**interner.decoder.decode(line))
+        except Exception:
+            pass
 
     kwargs = _parse_matriculaciones_line_to_kwargs(line)
+    if interner is not None:
+        interner.intern_values(kwargs)
     try:
-        return Matriculacion(**kwargs)
+        matriculacion = Matriculacion(**_convert_memoized_values(kwargs))
+        if as_record:
+            return MatriculacionRecord.from_model(matriculacion)
+        return matriculacion
 
     except Exception as ex:
         return ParseError(
@@ -29,12 +89,56 @@ def parse_matriculaciones_line(line: str, _line_number: Optional[int] = None) ->
 
 
 def _parse_matriculaciones_line_to_kwargs(line: str) -> dict:
-    kwargs = dict()
-    index_start = 0
-    for field_metadata in Matriculacion.get_fields_metadata():
-        index_end = index_start + field_metadata.longitud
-        value = line[index_start:index_end]
-        index_start = index_end
-        kwargs[field_metadata.field_name_in_class] = value.strip()
-
-    return kwargs
+    return {
+        field_slice.name: line[field_slice.start:field_slice.end].strip()
+        for field_slice in get_decoder().slices
+    }
+
+
+def _convert_memoized_values(kwargs: dict) -> dict:
+    """Copia de los kwargs con los campos memorizados ya convertidos (con los conversores memorizados),
+    que los pre-validators de Matriculacion dejan pasar tal cual. Los valores que no se pueden convertir
+    se dejan como texto, para que sea pydantic quien los valide y genere el error.
+    """
+    values = dict(kwargs)
+    for field_name in MEMOIZED_FIELDS:
+        try:
+            values[field_name] = get_memoized_converter(field_name)(values[field_name])
+        except (KeyError, ValueError):
+            pass
+    return values
+
+
+def _parse_matriculaciones_line_fields(
+        line: str,
+        line_number: Optional[int],
+        fields: Tuple[str, ...],
+        strict: bool,
+        interner: Optional[Interner],
+) -> Union[dict, ParseError]:
+    decoder = interner.decoder if interner is not None else get_decoder()
+    projection = decoder.project(fields)
+    if not strict:
+        try:
+            return {name: converter(line[start:end].strip()) for name, start, end, converter in projection}
+        except Exception:
+            pass
+
+    kwargs = {name: line[start:end].strip() for name, start, end, _ in projection}
+    if interner is not None:
+        interner.intern_values(kwargs)
+
+    values, errors = dict(), list()
+    for name, value in kwargs.items():
+        values[name], error = Matriculacion.__fields__[name].validate(value, values, loc=name, cls=Matriculacion)
+        if error:
+            errors.append(error)
+    if not errors:
+        return values
+
+    return ParseError(
+        exception=pydantic.ValidationError(errors, Matriculacion),
+        line_number=line_number,
+        line_content=line,
+        parsed_fields=kwargs,
+    )
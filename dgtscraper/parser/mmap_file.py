@@ -0,0 +1,164 @@
+import os
+import mmap
+import array
+import struct
+import pathlib
+from typing import Iterator, List, Optional, Union
+
+from .matriculaciones import parse_matriculaciones_line
+from ..models.matriculaciones import Matriculacion
+from ..models.common import ParseError
+from .. import const
+
+HEADER_PREFIX = "Vehículos matriculados".encode(const.FILE_ENCODING)
+INDEX_SUFFIX = ".idx"
+INDEX_MAGIC = b"DGTIDX01"
+COUNT_BLOCK_SIZE = 16 * 1024 * 1024
+INDEX_HEADER = struct.Struct("<8sQQ")  # magic, tamaño del fichero, mtime (ns)
+
+ParseResult = Union[Matriculacion, ParseError, None]
+
+
+class MatriculacionesFile:
+    """Acceso aleatorio a un fichero de matriculaciones extraído, mediante mmap.
+    Las líneas solo se decodifican y parsean al accederse (file[i], file[i:j], iteración).
+
+    Si todas las líneas tienen la misma longitud, la posición de cada matriculación se calcula directamente.
+    En caso contrario, se construye un índice de posiciones de línea, que se guarda junto al fichero
+    (con sufijo .idx) y se reutiliza mientras el fichero no cambie.
+    """
+
+    def __init__(
+            self,
+            path: Union[pathlib.Path, str],
+            strict: bool = True,
+            encoding: str = const.FILE_ENCODING,
+            index_path: Union[pathlib.Path, str, None] = None,
+    ):
+        self.path = pathlib.Path(path)
+        self.strict = strict
+        self.encoding = encoding
+        self.index_path = pathlib.Path(index_path) if index_path else self.path.with_name(self.path.name + INDEX_SUFFIX)
+
+        # longitud de cada línea (incluyendo el salto de línea), si son de longitud fija
+        self.record_length: Optional[int] = None
+        self._offsets: Optional[array.array] = None
+
+        self._file = open(self.path, "rb")
+        self._size = os.fstat(self._file.fileno()).st_size
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self._size else b""
+
+        self._data_start = 0
+        self._first_line_number = 1
+        if self._mmap[:len(HEADER_PREFIX)] == HEADER_PREFIX:
+            self._data_start = self._find_line_end(0)
+            self._first_line_number = 2
+
+        self._count = 0
+        if not self._detect_fixed_length():
+            self._load_or_build_index()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, item: Union[int, slice]) -> Union[ParseResult, List[ParseResult]]:
+        if isinstance(item, slice):
+            return [self._parse(i) for i in range(*item.indices(self._count))]
+
+        if item < 0:
+            item += self._count
+        if not 0 <= item < self._count:
+            raise IndexError("MatriculacionesFile index out of range")
+        return self._parse(item)
+
+    def __iter__(self) -> Iterator[ParseResult]:
+        for i in range(self._count):
+            yield self._parse(i)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        if isinstance(self._mmap, mmap.mmap):
+            self._mmap.close()
+        self._file.close()
+
+    def get_line(self, i: int) -> str:
+        """Devuelve el texto de la matriculación i (sin parsear)."""
+        if self.record_length is not None:
+            start = self._data_start + i * self.record_length
+            end = min(start + self.record_length, self._size)
+        else:
+            start = self._offsets[i]
+            end = self._offsets[i + 1]
+        return self._mmap[start:end].decode(self.encoding)
+
+    def _parse(self, i: int) -> ParseResult:
+        return parse_matriculaciones_line(self.get_line(i), self._first_line_number + i, strict=self.strict)
+
+    def _find_line_end(self, start: int) -> int:
+        end = self._mmap.find(b"\n", start)
+        return self._size if end == -1 else end + 1
+
+    def _detect_fixed_length(self) -> bool:
+        data_size = self._size - self._data_start
+        if not data_size:
+            return True
+
+        record_length = self._find_line_end(self._data_start) - self._data_start
+        count, remainder = divmod(data_size, record_length)
+        if remainder:
+            # se admite que la última línea no termine en salto de línea
+            if remainder != record_length - 1 or self._mmap[self._size - 1:self._size] == b"\n":
+                return False
+            count += 1
+
+        full_records = data_size // record_length
+        line_ends = self._mmap[self._data_start + record_length - 1:self._data_start + full_records * record_length:record_length]
+        if line_ends != b"\n" * full_records or self._count_newlines(self._data_start) != full_records:
+            return False
+
+        self.record_length = record_length
+        self._count = count
+        return True
+
+    def _count_newlines(self, start: int) -> int:
+        count = 0
+        for block_start in range(start, self._size, COUNT_BLOCK_SIZE):
+            count += self._mmap[block_start:block_start + COUNT_BLOCK_SIZE].count(b"\n")
+        return count
+
+    def _load_or_build_index(self):
+        stat = self.path.stat()
+        try:
+            with open(self.index_path, "rb") as f:
+                magic, size, mtime_ns = INDEX_HEADER.unpack(f.read(INDEX_HEADER.size))
+                if magic == INDEX_MAGIC and size == stat.st_size and mtime_ns == stat.st_mtime_ns:
+                    offsets = array.array("Q")
+                    offsets.frombytes(f.read())
+                    self._set_offsets(offsets)
+                    return
+        except (OSError, struct.error, ValueError):
+            pass
+
+        offsets = array.array("Q", [self._data_start])
+        position = self._data_start
+        while position < self._size:
+            position = self._find_line_end(position)
+            offsets.append(position)
+        self._set_offsets(offsets)
+
+        try:
+            with open(self.index_path, "wb") as f:
+                f.write(INDEX_HEADER.pack(INDEX_MAGIC, stat.st_size, stat.st_mtime_ns))
+                offsets.tofile(f)
+        except OSError:
+            # el índice es solo una optimización; si no se puede guardar, se reconstruirá en la siguiente apertura
+            pass
+
+    def _set_offsets(self, offsets: array.array):
+        self._offsets = offsets
+        self._count = len(offsets) - 1
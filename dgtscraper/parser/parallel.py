@@ -0,0 +1,107 @@
+import io
+import os
+import mmap
+import pathlib
+import collections
+import concurrent.futures
+from typing import Generator, List, NamedTuple, Optional, Union
+
+from .matriculaciones import parse_matriculaciones_line
+from ..models.matriculaciones import Matriculacion
+from ..models.common import ParseError
+from .. import const
+
+DEFAULT_PARALLEL_CHUNK_SIZE = 8 * 1024 * 1024
+
+ParseResult = Union[Matriculacion, ParseError, None]
+
+
+class FileChunk(NamedTuple):
+    """Rango de bytes de un fichero, alineado a inicio y fin de línea."""
+
+    start: int
+    end: int
+    first_line_number: int
+
+
+def split_file_chunks(path: Union[pathlib.Path, str], chunk_size: int = DEFAULT_PARALLEL_CHUNK_SIZE) -> List[FileChunk]:
+    """Divide un fichero en rangos de aproximadamente chunk_size bytes, terminados en salto de línea,
+    junto con el número de línea global (empezando en 1) de la primera línea de cada rango.
+    """
+    chunks = list()
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if not size:
+            return chunks
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            start = 0
+            line_number = 1
+            while start < size:
+                end = mm.find(b"\n", min(start + chunk_size, size) - 1)
+                end = size if end == -1 else end + 1
+                chunks.append(FileChunk(start=start, end=end, first_line_number=line_number))
+                line_number += _count_lines(mm[start:end])
+                start = end
+
+    return chunks
+
+
+def _count_lines(data: bytes) -> int:
+    """Cuenta las líneas terminadas igual que el lector de texto (saltos universales: "\\n", "\\r\\n" y "\\r" suelto).
+    Los rangos terminan siempre en "\\n", así que un "\\r\\n" nunca queda partido entre dos rangos.
+    """
+    return data.count(b"\n") + data.count(b"\r") - data.count(b"\r\n")
+
+
+def parse_matriculaciones_file_chunk(
+        path: Union[pathlib.Path, str],
+        chunk: FileChunk,
+        strict: bool = True,
+) -> List[ParseResult]:
+    with open(path, "rb") as f:
+        f.seek(chunk.start)
+        data = f.read(chunk.end - chunk.start)
+
+    results = list()
+    text_file = io.TextIOWrapper(io.BytesIO(data), encoding=const.FILE_ENCODING)
+    for i, line in enumerate(text_file, start=chunk.first_line_number):
+        results.append(parse_matriculaciones_line(line, i, strict=strict))
+    return results
+
+
+def parse_matriculaciones_file_parallel(
+        path: Union[pathlib.Path, str],
+        workers: Optional[int] = None,
+        ordered: bool = True,
+        strict: bool = True,
+        chunk_size: int = DEFAULT_PARALLEL_CHUNK_SIZE,
+) -> Generator[ParseResult, None, None]:
+    """Parsea un fichero de matriculaciones en un pool de procesos, dividiéndolo en rangos de bytes.
+    Con ordered=True, los resultados se devuelven en el mismo orden que parse_matriculaciones_file;
+    con ordered=False, se devuelve cada rango según termina de parsearse.
+    Los números de línea de los ParseError son siempre globales al fichero.
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = collections.deque(split_file_chunks(path, chunk_size))
+    max_pending = workers * 2
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = collections.deque()
+
+        def submit_pending():
+            while chunks and len(pending) < max_pending:
+                pending.append(executor.submit(parse_matriculaciones_file_chunk, path, chunks.popleft(), strict))
+
+        submit_pending()
+        while pending:
+            if ordered:
+                future = pending.popleft()
+            else:
+                done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                future = done.pop()
+                pending.remove(future)
+
+            results = future.result()
+            submit_pending()
+            yield from results
@@ -0,0 +1,258 @@
+import time
+import queue
+import contextlib
+import threading
+import concurrent.futures
+from typing import TYPE_CHECKING, Callable, Iterable, List, Optional, Tuple, Union
+
+from .downloader.lines import iter_block_lines
+from .parser import parse_matriculaciones_line
+from .models import Matriculacion, ParseError
+from .sinks import Sink
+
+if TYPE_CHECKING:
+    from .downloader import DGTDownloader
+
+DEFAULT_PARSE_BATCH_SIZE = 5000
+
+DateTuple = Tuple[int, ...]
+"""(year, month) or (year, month, day)"""
+
+_END = object()
+
+
+def iter_months(start: Tuple[int, int], end: Tuple[int, int]) -> Iterable[Tuple[int, int]]:
+    """Iterate (year, month) tuples between start and end, both included."""
+    year, month = start
+    while (year, month) <= tuple(end):
+        yield year, month
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def format_date(date: DateTuple) -> str:
+    return "-".join([str(date[0])] + [f"{chunk:02d}" for chunk in date[1:]])
+
+
+def parse_lines_batch(
+        lines: List[str],
+        first_line_number: int,
+        strict: bool = True,
+) -> List[Union[Matriculacion, ParseError]]:
+    """Parse a batch of consecutive lines. ParseErrors are returned along with the matriculaciones."""
+    results = list()
+    for i, line in enumerate(lines, start=first_line_number):
+        result = parse_matriculaciones_line(line, i, strict=strict)
+        if result:
+            results.append(result)
+    return results
+
+
+class StageStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.lines = 0
+        self.busy_time = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, lines: int, busy_time: float):
+        with self._lock:
+            self.items += 1
+            self.lines += lines
+            self.busy_time += busy_time
+
+    def summary(self, elapsed: float) -> str:
+        rate = self.lines / elapsed if elapsed else 0.0
+        return f"{self.name}: {self.lines} lines in {self.items} batches, {rate:.0f} lines/s (busy {self.busy_time:.1f}s)"
+
+
+class BackfillPipeline:
+    """Staged pipeline to load many dates: download workers -> parse pool -> sink writers.
+    Stages are connected by bounded queues, so a slow stage makes the previous ones wait (backpressure)
+    instead of buffering whole months in memory.
+
+    - Download: `download_workers` threads, each one with its own DGTDownloader.
+    - Parse: a process pool with `parse_workers` processes (or the dispatcher thread itself, if 0).
+    - Sink: `sink_workers` threads calling Sink.write concurrently.
+
+    ParseErrors are counted and passed to `on_parse_error`, if given. While running, `on_report` (if given)
+    is called with the pipeline every `report_interval` seconds (e.g. to print its summary).
+    """
+
+    def __init__(
+            self,
+            sink: Sink,
+            download_workers: int = 2,
+            parse_workers: int = 2,
+            sink_workers: int = 1,
+            queue_size: int = 8,
+            parse_batch_size: int = DEFAULT_PARSE_BATCH_SIZE,
+            strict: bool = True,
+            downloader_factory: Optional[Callable[[], "DGTDownloader"]] = None,
+            on_parse_error: Optional[Callable[[ParseError], None]] = None,
+            on_report: Optional[Callable[["BackfillPipeline"], None]] = None,
+    ):
+        self.sink = sink
+        self.download_workers = download_workers
+        self.parse_workers = parse_workers
+        self.sink_workers = sink_workers
+        self.queue_size = queue_size
+        self.parse_batch_size = parse_batch_size
+        self.strict = strict
+        if downloader_factory is None:
+            # imported here, so the parse workers (which import this module) do not load the downloader dependencies
+            from .downloader import DGTDownloader
+            downloader_factory = DGTDownloader
+        self.downloader_factory = downloader_factory
+        self.on_parse_error = on_parse_error
+        self.on_report = on_report
+
+        self.download_stats = StageStats("download")
+        self.parse_stats = StageStats("parse")
+        self.sink_stats = StageStats("sink")
+        self.parse_errors = 0
+        self._parse_errors_lock = threading.Lock()
+        self.started_at: Optional[float] = None
+
+        self._dates_queue = queue.Queue()
+        self._lines_queue = queue.Queue(maxsize=queue_size)
+        self._results_queue = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._exception: Optional[BaseException] = None
+
+    def run(self, dates: Iterable[DateTuple], report_interval: Optional[float] = None):
+        self.started_at = time.monotonic()
+        for date in dates:
+            self._dates_queue.put(tuple(date))
+
+        downloaders = [self._start_thread(self._download_worker) for _ in range(self.download_workers)]
+        dispatcher = self._start_thread(self._parse_dispatcher)
+        writers = [self._start_thread(self._sink_worker) for _ in range(self.sink_workers)]
+
+        for thread in downloaders:
+            self._join(thread, report_interval)
+        self._put(self._lines_queue, _END)
+        self._join(dispatcher, report_interval)
+        for _ in writers:
+            self._put(self._results_queue, _END)
+        for thread in writers:
+            self._join(thread, report_interval)
+
+        if self._exception is not None:
+            raise self._exception
+
+    def summary(self) -> str:
+        elapsed = time.monotonic() - self.started_at if self.started_at else 0.0
+        return "\n".join(
+            stats.summary(elapsed) for stats in (self.download_stats, self.parse_stats, self.sink_stats)
+        ) + f"\nparse errors: {self.parse_errors}\nelapsed: {elapsed:.1f}s"
+
+    def _download_worker(self):
+        downloader = self.downloader_factory()
+        while not self._stop.is_set():
+            try:
+                date = self._dates_queue.get_nowait()
+            except queue.Empty:
+                return
+
+            source = format_date(date)
+            lines = list()
+            line_number = 1
+            started_at = time.monotonic()
+            # closing the generator releases the HTTP response when the pipeline stops halfway through a file
+            with contextlib.closing(downloader.stream_matriculaciones_batches_by_date(*date)) as blocks:
+                for block in blocks:
+                    if self._stop.is_set():
+                        return
+                    lines.extend(iter_block_lines(block))
+                    if len(lines) >= self.parse_batch_size:
+                        self.download_stats.add(len(lines), time.monotonic() - started_at)
+                        self._put(self._lines_queue, (source, line_number, lines))
+                        line_number += len(lines)
+                        lines = list()
+                        started_at = time.monotonic()
+
+            if lines:
+                self.download_stats.add(len(lines), time.monotonic() - started_at)
+                self._put(self._lines_queue, (source, line_number, lines))
+
+    def _parse_dispatcher(self):
+        if not self.parse_workers:
+            while (item := self._get(self._lines_queue)) is not _END:
+                source, first_line_number, lines = item
+                started_at = time.monotonic()
+                results = parse_lines_batch(lines, first_line_number, self.strict)
+                self.parse_stats.add(len(lines), time.monotonic() - started_at)
+                self._put(self._results_queue, (source, results))
+            return
+
+        with concurrent.futures.ProcessPoolExecutor(max_workers=self.parse_workers) as executor:
+            pending = dict()
+            while (item := self._get(self._lines_queue)) is not _END:
+                source, first_line_number, lines = item
+                future = executor.submit(parse_lines_batch, lines, first_line_number, self.strict)
+                pending[future] = (source, len(lines), time.monotonic())
+                if len(pending) >= self.parse_workers * 2:
+                    self._forward_parsed(pending, concurrent.futures.FIRST_COMPLETED)
+            self._forward_parsed(pending, concurrent.futures.ALL_COMPLETED)
+
+    def _forward_parsed(self, pending: dict, return_when: str):
+        done, _ = concurrent.futures.wait(pending, return_when=return_when)
+        for future in done:
+            source, lines_count, started_at = pending.pop(future)
+            self.parse_stats.add(lines_count, time.monotonic() - started_at)
+            self._put(self._results_queue, (source, future.result()))
+
+    def _sink_worker(self):
+        while (item := self._get(self._results_queue)) is not _END:
+            source, results = item
+            matriculaciones = list()
+            for result in results:
+                if isinstance(result, ParseError):
+                    with self._parse_errors_lock:
+                        self.parse_errors += 1
+                    if self.on_parse_error is not None:
+                        self.on_parse_error(result)
+                else:
+                    matriculaciones.append(result)
+
+            started_at = time.monotonic()
+            if matriculaciones:
+                self.sink.write(source, matriculaciones)
+            self.sink_stats.add(len(results), time.monotonic() - started_at)
+
+    def _start_thread(self, target: Callable[[], None]) -> threading.Thread:
+        def run():
+            try:
+                target()
+            except BaseException as ex:
+                if self._exception is None:
+                    self._exception = ex
+                self._stop.set()
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
+    def _join(self, thread: threading.Thread, report_interval: Optional[float]):
+        while thread.is_alive():
+            thread.join(report_interval)
+            if report_interval and self.on_report is not None and thread.is_alive():
+                self.on_report(self)
+
+    def _put(self, q: queue.Queue, item):
+        """Put an item in a bounded queue, giving up if the pipeline is stopping because of an error."""
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def _get(self, q: queue.Queue):
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        return _END
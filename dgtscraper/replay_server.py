@@ -0,0 +1,219 @@
+"""Servidor local que imita el flujo JSF del portal de microdatos de la DGT (categoria.faces, subcategoria.faces,
+microdatos.faces), sirviendo ZIPs de matriculaciones sintéticos. Permite medir y probar las descargas sin conexión,
+inyectando latencia, límites de ancho de banda, desconexiones a mitad de descarga y páginas de error (msgError).
+
+Uso: DGTDownloader(base_url=server.base_url)
+"""
+
+import time
+import uuid
+import html
+import threading
+import urllib.parse
+import http.server
+from typing import Dict, Optional, Set, Tuple
+
+import pydantic
+
+from .synthetic import generate_matriculaciones_bytes, zip_matriculaciones
+
+DateTuple = Tuple[int, ...]
+
+VIEWSTATE_PAGE = """<html><body>
+<form id="configuracionInfPersonalizado" method="post">
+<input type="hidden" name="javax.faces.ViewState" id="javax.faces.ViewState" value="{viewstate}" />
+</form>
+{errors}
+</body></html>"""
+
+ERROR_ITEM = '<ul><li class="msgError">{message}</li></ul>'
+
+
+class ReplayServerConfig(pydantic.BaseModel):
+    lines_per_month: int = 1000
+    lines_per_day: int = 100
+    latency: float = 0.0
+    """Segundos de espera antes de responder a cada petición."""
+    bandwidth: Optional[int] = None
+    """Bytes por segundo al servir los ZIP (sin límite si None)."""
+    chunk_size: int = 16384
+    disconnect_after: Optional[int] = None
+    """Cerrar la conexión tras enviar este número de bytes del ZIP."""
+    disconnect_downloads: int = 0
+    """Número de descargas (las primeras) que sufren la desconexión de disconnect_after; 0 para todas."""
+    viewstate_ttl: Optional[float] = None
+    """Segundos tras los que un viewstate caduca (la descarga devuelve un msgError de vista caducada)."""
+    error_dates: Set[DateTuple] = set()
+    """Fechas, (año, mes) o (año, mes, día), para las que se responde con un msgError en lugar del ZIP."""
+
+
+class ReplayServerStats:
+    def __init__(self):
+        self.requests: Dict[str, int] = dict()
+        self.downloads = 0
+        self.expired_views = 0
+        self._lock = threading.Lock()
+
+    def add_request(self, path: str):
+        with self._lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+
+
+class ReplayServer:
+    def __init__(self, config: Optional[ReplayServerConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or ReplayServerConfig()
+        self.stats = ReplayServerStats()
+        self._viewstates: Dict[str, float] = dict()  # viewstate -> issued at
+        self._zips: Dict[DateTuple, bytes] = dict()
+        self._lock = threading.Lock()
+        self._httpd = http.server.ThreadingHTTPServer((host, port), self._build_handler())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/WEB_IEST_CONSULTA"
+
+    def start(self) -> "ReplayServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def get_data(self, date: DateTuple) -> bytes:
+        """Fichero de matriculaciones (sin comprimir) servido para una fecha; siempre el mismo para la misma fecha."""
+        year, month = date[:2]
+        count = self.config.lines_per_day if len(date) == 3 else self.config.lines_per_month
+        seed = date[0] * 10000 + date[1] * 100 + (date[2] if len(date) == 3 else 0)
+        return generate_matriculaciones_bytes(count, year=year, month=month, seed=seed)
+
+    def get_zip(self, date: DateTuple) -> bytes:
+        with self._lock:
+            try:
+                return self._zips[date]
+            except KeyError:
+                data = self._zips[date] = zip_matriculaciones(self.get_data(date))
+                return data
+
+    def new_viewstate(self) -> str:
+        viewstate = f"j_id{uuid.uuid4().hex[:12]}"
+        with self._lock:
+            self._viewstates[viewstate] = time.monotonic()
+        return viewstate
+
+    def viewstate_is_valid(self, viewstate: str) -> bool:
+        with self._lock:
+            issued_at = self._viewstates.get(viewstate)
+        if issued_at is None:
+            return False
+        return self.config.viewstate_ttl is None or time.monotonic() - issued_at < self.config.viewstate_ttl
+
+    def _build_handler(self):
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                self._handle(dict())
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                form = urllib.parse.parse_qs(self.rfile.read(length).decode(), keep_blank_values=True)
+                self._handle({key: values[-1] for key, values in form.items()})
+
+            def _handle(self, form: Dict[str, str]):
+                page = urllib.parse.urlparse(self.path).path.rsplit("/", 1)[-1]
+                server.stats.add_request(page)
+                if server.config.latency:
+                    time.sleep(server.config.latency)
+
+                if page not in ("categoria.faces", "subcategoria.faces", "microdatos.faces"):
+                    self._send(404, "text/html", b"Not found")
+                    return
+                if page == "microdatos.faces" and any(value == "Descargar" for value in form.values()):
+                    self._download(form)
+                    return
+                if self.command == "POST" and not server.viewstate_is_valid(form.get("javax.faces.ViewState", "")):
+                    self._send_page(error="La vista ha caducado")
+                    return
+                self._send_page()
+
+            def _download(self, form: Dict[str, str]):
+                if not server.viewstate_is_valid(form.get("javax.faces.ViewState", "")):
+                    with server._lock:
+                        server.stats.expired_views += 1
+                    self._send_page(error="La vista ha caducado")
+                    return
+
+                daily = form.get("configuracionInfPersonalizado:filtroDiario", "")
+                if daily:
+                    day, month, year = (int(chunk) for chunk in daily.split("/"))
+                    date = (year, month, day)
+                else:
+                    date = (int(form["configuracionInfPersonalizado:filtroMesAnyo"]),
+                            int(form["configuracionInfPersonalizado:filtroMesMes"]))
+
+                if date in server.config.error_dates or date[:2] in server.config.error_dates:
+                    self._send_page(error="No existen datos para la fecha seleccionada")
+                    return
+
+                with server._lock:
+                    server.stats.downloads += 1
+                    download_number = server.stats.downloads
+                self._send_zip(server.get_zip(date), download_number)
+
+            def _send_zip(self, content: bytes, download_number: int):
+                config = server.config
+                disconnect_after = config.disconnect_after
+                if config.disconnect_downloads and download_number > config.disconnect_downloads:
+                    disconnect_after = None
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/zip")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+
+                sent = 0
+                while sent < len(content):
+                    chunk = content[sent:sent + config.chunk_size]
+                    if disconnect_after is not None and sent + len(chunk) > disconnect_after:
+                        self.wfile.write(chunk[:max(disconnect_after - sent, 0)])
+                        self.wfile.flush()
+                        self.close_connection = True
+                        return
+
+                    self.wfile.write(chunk)
+                    sent += len(chunk)
+                    if config.bandwidth:
+                        time.sleep(len(chunk) / config.bandwidth)
+
+            def _send_page(self, error: Optional[str] = None):
+                errors = ERROR_ITEM.format(message=html.escape(error)) if error else ""
+                body = VIEWSTATE_PAGE.format(viewstate=server.new_viewstate(), errors=errors)
+                self._send(200, "text/html;charset=UTF-8", body.encode())
+
+            def _send(self, status: int, content_type: str, body: bytes):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
@@ -0,0 +1,89 @@
+import enum
+import json
+import hashlib
+import datetime
+from typing import Any, Callable, Iterable, List, NamedTuple, Optional
+
+from .models.matriculaciones import Matriculacion
+
+_encode_str: Callable[[str], str] = json.encoder.encode_basestring_ascii
+_SORTED_FIELDS = sorted(Matriculacion.__fields__)
+_KEY_PREFIXES = [_encode_str(key) + ": " for key in _SORTED_FIELDS]
+
+
+def _encode_float(value: float) -> str:
+    if value != value:
+        return "NaN"
+    if value == float("inf"):
+        return "Infinity"
+    if value == -float("inf"):
+        return "-Infinity"
+    return float.__repr__(value)
+
+
+def _encode_value(value: Any) -> str:
+    if value is None:
+        return "null"
+    if value is True:
+        return "true"
+    if value is False:
+        return "false"
+    if isinstance(value, enum.Enum):
+        value = value.value
+    if isinstance(value, str):
+        return _encode_str(value)
+    if isinstance(value, int):
+        return int.__repr__(value)
+    if isinstance(value, float):
+        return _encode_float(value)
+    if isinstance(value, datetime.date):
+        return '"' + value.isoformat() + '"'
+    raise TypeError(f"Cannot serialize {value!r}")
+
+
+def get_matriculacion_id(matriculacion: Matriculacion) -> str:
+    """Identidad de una matriculación ('bastidor|fechaTramite'), usada como _id en MongoDB y como clave en los deltas."""
+    return f"{matriculacion.bastidor}|{matriculacion.fechaTramite.isoformat()}"
+
+
+def matriculacion_to_canonical_json(matriculacion: Matriculacion) -> bytes:
+    """Serializa una matriculación a JSON con las claves ordenadas, en una sola pasada.
+    El resultado es idéntico byte a byte a json.dumps(json.loads(matriculacion.json()), sort_keys=True).encode().
+    """
+    values = matriculacion.__dict__
+    return ("{" + ", ".join([
+        prefix + _encode_value(values[key])
+        for key, prefix in zip(_SORTED_FIELDS, _KEY_PREFIXES)
+    ]) + "}").encode("ascii")
+
+
+class Fingerprint(NamedTuple):
+    hexdigest: str
+    count: int
+
+
+def fingerprint(
+        matriculaciones: Iterable[Optional[Matriculacion]],
+        hash_name: str = "md5",
+        buffer_size: int = 1000,
+) -> Fingerprint:
+    """Hash de la serialización canónica de una secuencia de matriculaciones (la misma huella MD5 usada en los tests).
+    Los elementos que no son Matriculacion (None, ParseError) se ignoran.
+    Las serializaciones se pasan al hash en grupos de buffer_size, para reducir el número de llamadas.
+    """
+    hasher = hashlib.new(hash_name)
+    buffer: List[bytes] = list()
+    count = 0
+    for matriculacion in matriculaciones:
+        if not isinstance(matriculacion, Matriculacion):
+            continue
+
+        buffer.append(matriculacion_to_canonical_json(matriculacion))
+        count += 1
+        if len(buffer) >= buffer_size:
+            hasher.update(b"".join(buffer))
+            buffer.clear()
+
+    if buffer:
+        hasher.update(b"".join(buffer))
+    return Fingerprint(hexdigest=hasher.hexdigest(), count=count)
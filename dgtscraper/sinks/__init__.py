@@ -0,0 +1 @@
+from .base import Sink, NullSink, JsonLinesSink
@@ -0,0 +1,66 @@
+import abc
+import pathlib
+import threading
+from typing import Dict, List, TextIO, Union
+
+from ..models.matriculaciones import Matriculacion
+
+
+class Sink(abc.ABC):
+    """Destino de matriculaciones parseadas.
+    write() puede llamarse desde varios hilos a la vez; las implementaciones deben ser thread-safe.
+    """
+
+    @abc.abstractmethod
+    def write(self, source: str, matriculaciones: List[Matriculacion]):
+        pass
+
+    def delete(self, source: str, ids: List[str]):
+        """Elimina las matriculaciones ya escritas con los ids indicados (ver serializer.get_matriculacion_id).
+        Solo lo admiten los destinos que permiten modificar lo escrito (no los ficheros de solo escritura).
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class NullSink(Sink):
+    """Descarta las matriculaciones (útil para medir descarga y parseo)."""
+
+    def write(self, source: str, matriculaciones: List[Matriculacion]):
+        pass
+
+    def delete(self, source: str, ids: List[str]):
+        pass
+
+
+class JsonLinesSink(Sink):
+    """Escribe las matriculaciones en ficheros JSON Lines, uno por origen: '{directorio}/{origen}.jsonl'."""
+
+    def __init__(self, path: Union[pathlib.Path, str]):
+        self.path = pathlib.Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._files: Dict[str, TextIO] = dict()
+        self._lock = threading.Lock()
+
+    def write(self, source: str, matriculaciones: List[Matriculacion]):
+        data = "".join(matriculacion.json() + "\n" for matriculacion in matriculaciones)
+        with self._lock:
+            try:
+                file = self._files[source]
+            except KeyError:
+                file = self._files[source] = open(self.path / f"{source}.jsonl", "w", encoding="utf-8")
+            file.write(data)
+
+    def close(self):
+        with self._lock:
+            for file in self._files.values():
+                file.close()
+            self._files.clear()
@@ -0,0 +1,242 @@
+"""Escritura de matriculaciones en MongoDB.
+Requiere pymongo (dependencia opcional, no incluida en requirements.txt).
+"""
+
+import zlib
+import enum
+import datetime
+import threading
+import collections
+import concurrent.futures
+from typing import Deque, List, Optional
+
+import pymongo
+import pymongo.errors
+import pymongo.collection
+
+from .base import Sink
+from ..models.matriculaciones import Matriculacion
+from ..serializer import get_matriculacion_id
+
+DEFAULT_MONGO_BATCH_SIZE = 5000
+DEFAULT_MONGO_WRITERS = 4
+DUPLICATE_KEY_ERROR_CODE = 11000
+
+
+def format_matriculacion_doc(matriculacion: Matriculacion) -> dict:
+    """Convierte una matriculación a documento de MongoDB, con los mismos valores que json.loads(matriculacion.json())
+    (fechas en formato ISO y enums por su valor), pero sin serializar y parsear JSON.
+    """
+    doc = dict()
+    for key, value in matriculacion.__dict__.items():
+        if isinstance(value, datetime.date):
+            value = value.isoformat()
+        elif isinstance(value, enum.Enum):
+            value = value.value
+        doc[key] = value
+
+    doc["_id"] = get_matriculacion_id(matriculacion)
+    return doc
+
+
+class MongoWriteStats:
+    def __init__(self):
+        self.inserted = 0
+        self.upserted = 0
+        self.matched = 0
+        self.duplicated = 0
+        self.deleted = 0
+        self.batches = 0
+        self._lock = threading.Lock()
+
+    def add(self, inserted: int = 0, upserted: int = 0, matched: int = 0, duplicated: int = 0):
+        with self._lock:
+            self.inserted += inserted
+            self.upserted += upserted
+            self.matched += matched
+            self.duplicated += duplicated
+            self.batches += 1
+
+    def add_deleted(self, deleted: int):
+        with self._lock:
+            self.deleted += deleted
+
+    def __str__(self):
+        return (f"{self.batches} batches: {self.inserted} inserted, {self.upserted} upserted, "
+                f"{self.matched} matched, {self.duplicated} duplicated, {self.deleted} deleted")
+
+
+class MongoSink(Sink):
+    """Escribe matriculaciones en una colección de MongoDB, en bulks de batch_size documentos,
+    desde varios hilos que comparten el pool de conexiones del MongoClient.
+
+    - upsert (por defecto): actualiza o inserta cada documento por su _id ('bastidor|fechaTramite').
+      Si un _id se repite (p.ej. matriculaciones sin bastidor del mismo día), se queda la última escrita.
+    - insert_only: inserta directamente, ignorando los _id ya existentes (se queda la primera escrita).
+      Más rápido, para colecciones nuevas.
+
+    Cada _id se asigna siempre al mismo hilo escritor, que envía sus bulks de uno en uno y en orden,
+    de forma que las repeticiones de un _id se aplican en el orden en que se escribieron.
+    """
+
+    def __init__(
+            self,
+            collection: pymongo.collection.Collection,
+            batch_size: int = DEFAULT_MONGO_BATCH_SIZE,
+            writers: int = DEFAULT_MONGO_WRITERS,
+            insert_only: bool = False,
+            client: Optional[pymongo.MongoClient] = None,
+    ):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.writers = max(writers, 1)
+        self.insert_only = insert_only
+        self.stats = MongoWriteStats()
+        self.client = client
+        """MongoClient creado por el propio destino (en from_uri), que se cierra en close()."""
+
+        # one single-threaded executor (and buffer) per writer, so the bulks of a writer are applied in order
+        self._executors = [
+            concurrent.futures.ThreadPoolExecutor(max_workers=1) for _ in range(self.writers)
+        ]
+        self._pending: Deque[concurrent.futures.Future] = collections.deque()
+        self._buffers: List[List[dict]] = [list() for _ in range(self.writers)]
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_uri(cls, uri: str, db: str, collection: str, **kwargs) -> "MongoSink":
+        writers = kwargs.get("writers", DEFAULT_MONGO_WRITERS)
+        client = pymongo.MongoClient(uri, maxPoolSize=max(writers, 1) * 2)
+        return cls(client[db][collection], client=client, **kwargs)
+
+    def write(self, source: str, matriculaciones: List[Matriculacion]):
+        docs = [format_matriculacion_doc(matriculacion) for matriculacion in matriculaciones]
+        with self._lock:
+            for writer, writer_docs in enumerate(self._split_by_writer(docs)):
+                buffer = self._buffers[writer]
+                buffer.extend(writer_docs)
+                while len(buffer) >= self.batch_size:
+                    batch = buffer[:self.batch_size]
+                    del buffer[:self.batch_size]
+                    self._submit_docs(writer, batch)
+
+    def submit(self, matriculaciones: List[Matriculacion]) -> concurrent.futures.Future:
+        """Envía las matriculaciones sin pasar por el buffer de write() (un bulk por cada escritor al que van).
+        El Future se resuelve cuando MongoDB confirma todas las escrituras. Si hay demasiados bulks pendientes,
+        espera a que termine alguno antes de enviarlo.
+        """
+        docs = [format_matriculacion_doc(matriculacion) for matriculacion in matriculaciones]
+        with self._lock:
+            futures = [
+                self._submit_docs(writer, writer_docs)
+                for writer, writer_docs in enumerate(self._split_by_writer(docs)) if writer_docs
+            ]
+        return _gather_futures(futures)
+
+    def delete(self, source: str, ids: List[str]):
+        """Elimina los documentos con los _id indicados, tras confirmar las escrituras pendientes
+        (por si alguna de ellas afecta a los mismos documentos).
+        """
+        self.flush()
+        for i in range(0, len(ids), self.batch_size):
+            result = self.collection.delete_many({"_id": {"$in": ids[i:i + self.batch_size]}})
+            self.stats.add_deleted(result.deleted_count)
+
+    def flush(self):
+        """Envía lo que quede en el buffer, y espera a que se confirmen todas las escrituras pendientes."""
+        with self._lock:
+            for writer, buffer in enumerate(self._buffers):
+                if buffer:
+                    self._submit_docs(writer, buffer)
+                    self._buffers[writer] = list()
+            pending = list(self._pending)
+            self._pending.clear()
+
+        for future in pending:
+            future.result()
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            for executor in self._executors:
+                executor.shutdown(wait=True)
+            if self.client is not None:
+                self.client.close()
+
+    def _split_by_writer(self, docs: List[dict]) -> List[List[dict]]:
+        """Reparte los documentos entre los escritores según su _id (siempre el mismo escritor para cada _id)."""
+        if self.writers == 1:
+            return [docs]
+        docs_by_writer = [list() for _ in range(self.writers)]
+        for doc in docs:
+            docs_by_writer[zlib.crc32(doc["_id"].encode("utf-8")) % self.writers].append(doc)
+        return docs_by_writer
+
+    def _submit_docs(self, writer: int, docs: List[dict]) -> concurrent.futures.Future:
+        # backpressure: no more than 2 bulks per writer in flight
+        while len(self._pending) >= self.writers * 2:
+            self._pending.popleft().result()
+        while self._pending and self._pending[0].done():
+            self._pending.popleft().result()
+
+        write_docs = self._insert_docs if self.insert_only else self._upsert_docs
+        future = self._executors[writer].submit(write_docs, docs)
+        self._pending.append(future)
+        return future
+
+    def _upsert_docs(self, docs: List[dict]):
+        # repeated _ids in the bulk: only the last one is written (as sequential upserts would leave it),
+        # the others are counted as matched
+        unique_docs = list({doc["_id"]: doc for doc in docs}.values())
+        result = self.collection.bulk_write([
+            pymongo.UpdateOne(filter={"_id": doc["_id"]}, update={"$set": doc}, upsert=True)
+            for doc in unique_docs
+        ], ordered=True)
+        self.stats.add(
+            upserted=result.upserted_count,
+            matched=result.matched_count + len(docs) - len(unique_docs),
+        )
+
+    def _insert_docs(self, docs: List[dict]):
+        # repeated _ids in the bulk: only the first one is inserted, the others are counted as duplicated
+        unique_docs = dict()
+        for doc in docs:
+            unique_docs.setdefault(doc["_id"], doc)
+        repeated = len(docs) - len(unique_docs)
+        docs = list(unique_docs.values())
+        try:
+            result = self.collection.insert_many(docs, ordered=False)
+            self.stats.add(inserted=len(result.inserted_ids), duplicated=repeated)
+        except pymongo.errors.BulkWriteError as ex:
+            write_errors = ex.details.get("writeErrors", [])
+            if any(error.get("code") != DUPLICATE_KEY_ERROR_CODE for error in write_errors):
+                raise
+            self.stats.add(inserted=ex.details.get("nInserted", 0), duplicated=len(write_errors) + repeated)
+
+
+def _gather_futures(futures: List[concurrent.futures.Future]) -> concurrent.futures.Future:
+    """Future que se resuelve cuando se resuelven todos los indicados (con la primera excepción, si alguno falla)."""
+    if len(futures) == 1:
+        return futures[0]
+
+    gathered = concurrent.futures.Future()
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def on_done(future: concurrent.futures.Future):
+        with lock:
+            if gathered.done():
+                return
+            if future.exception() is not None:
+                gathered.set_exception(future.exception())
+                return
+            remaining[0] -= 1
+            if not remaining[0]:
+                gathered.set_result(None)
+
+    if not futures:
+        gathered.set_result(None)
+    for future in futures:
+        future.add_done_callback(on_done)
+    return gathered
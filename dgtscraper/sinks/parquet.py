@@ -0,0 +1,132 @@
+"""Exportación de matriculaciones a Parquet, particionado por año/mes de matriculación.
+Requiere pyarrow (dependencia opcional, no incluida en requirements.txt).
+"""
+
+import enum
+import uuid
+import pathlib
+import datetime
+import threading
+from typing import Dict, List, Tuple, Union
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .base import Sink
+from ..models.matriculaciones import Matriculacion
+
+DEFAULT_ROW_GROUP_SIZE = 100_000
+DEFAULT_MAX_BUFFERED_ROWS = 1_000_000
+
+DICTIONARY_COLUMNS = ["vehiculoMarca", "vehiculoModelo", "municipio", "localidad", "codigoITV"]
+"""Columnas con muchos valores repetidos, que se guardan con codificación de diccionario."""
+
+SORT_COLUMNS = ["provincia", "fechaMatriculacion"]
+"""Cada fichero se ordena entero por estas columnas antes de dividirlo en row groups, de forma que cada row group
+cubre un rango estrecho de valores y sus estadísticas (min/max) permiten descartar row groups al filtrar por ellas."""
+
+_ARROW_TYPES = {
+    datetime.date: pa.date32(),
+    str: pa.string(),
+    int: pa.int64(),
+    float: pa.float64(),
+    bool: pa.bool_(),
+}
+
+
+def get_arrow_schema() -> pa.Schema:
+    fields = list()
+    for name, model_field in Matriculacion.__fields__.items():
+        field_type = model_field.type_
+        if issubclass(field_type, enum.Enum):
+            field_type = str
+        arrow_type = _ARROW_TYPES[field_type]
+        if name in DICTIONARY_COLUMNS:
+            arrow_type = pa.dictionary(pa.int32(), arrow_type)
+        fields.append(pa.field(name, arrow_type, nullable=model_field.allow_none))
+    return pa.schema(fields)
+
+
+class ParquetSink(Sink):
+    """Escribe las matriculaciones en '{directorio}/year={año}/month={mes}/part-{id}.parquet',
+    según su fechaMatriculacion, en row groups de hasta row_group_size filas.
+
+    Las filas de cada partición se acumulan en memoria (ya convertidas a Arrow, no como Matriculacion) y se escriben,
+    ordenadas por SORT_COLUMNS, en un fichero completo al cerrar el destino; o antes, si entre todas las particiones
+    se superan max_buffered_rows filas: entonces se escriben las particiones que llevan más tiempo sin recibir filas
+    (las de meses ya descargados, en una carga de varios meses). Si una partición ya escrita recibe más filas,
+    estas se escriben en otro fichero de la misma partición.
+    """
+
+    def __init__(
+            self,
+            path: Union[pathlib.Path, str],
+            row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+            max_buffered_rows: int = DEFAULT_MAX_BUFFERED_ROWS,
+    ):
+        self.path = pathlib.Path(path)
+        self.row_group_size = row_group_size
+        self.max_buffered_rows = max_buffered_rows
+        self.schema = get_arrow_schema()
+        # partition -> buffered tables, in order of last write (the least recently written first)
+        self._buffers: Dict[Tuple[int, int], List[pa.Table]] = dict()
+        self._buffered_rows = 0
+        self._lock = threading.Lock()
+
+    @property
+    def buffered_rows(self) -> int:
+        return self._buffered_rows
+
+    def write(self, source: str, matriculaciones: List[Matriculacion]):
+        by_partition: Dict[Tuple[int, int], List[Matriculacion]] = dict()
+        for matriculacion in matriculaciones:
+            partition = (matriculacion.fechaMatriculacion.year, matriculacion.fechaMatriculacion.month)
+            by_partition.setdefault(partition, list()).append(matriculacion)
+        tables = {partition: self._to_table(rows) for partition, rows in by_partition.items()}
+
+        with self._lock:
+            for partition, table in tables.items():
+                buffer = self._buffers.pop(partition, list())
+                buffer.append(table)
+                self._buffers[partition] = buffer
+                self._buffered_rows += table.num_rows
+
+            while self._buffered_rows > self.max_buffered_rows:
+                self._flush(next(iter(self._buffers)))
+
+    def close(self):
+        with self._lock:
+            for partition in list(self._buffers):
+                self._flush(partition)
+
+    def _flush(self, partition: Tuple[int, int]):
+        """Escribe las filas acumuladas de la partición en un fichero nuevo, ordenadas por SORT_COLUMNS."""
+        tables = self._buffers.pop(partition, None)
+        if not tables:
+            return
+
+        table = pa.concat_tables(tables).sort_by([(column, "ascending") for column in SORT_COLUMNS])
+        self._buffered_rows -= table.num_rows
+
+        year, month = partition
+        partition_path = self.path / f"year={year}" / f"month={month:02d}"
+        partition_path.mkdir(parents=True, exist_ok=True)
+        with pq.ParquetWriter(
+                partition_path / f"part-{uuid.uuid4().hex}.parquet",
+                self.schema,
+                use_dictionary=DICTIONARY_COLUMNS,
+                write_statistics=True,
+        ) as writer:
+            writer.write_table(table, row_group_size=self.row_group_size)
+
+    def _to_table(self, matriculaciones: List[Matriculacion]) -> pa.Table:
+        columns = list()
+        for field in self.schema:
+            values = [getattr(m, field.name) for m in matriculaciones]
+            if values and isinstance(values[0], enum.Enum):
+                values = [v.value for v in values]
+            if pa.types.is_dictionary(field.type):
+                columns.append(pa.array(values, type=field.type.value_type).dictionary_encode())
+            else:
+                columns.append(pa.array(values, type=field.type))
+        return pa.Table.from_arrays(columns, schema=self.schema)
@@ -0,0 +1,144 @@
+"""Generador de ficheros de matriculaciones sintéticos, con el formato de ancho fijo de Matriculacion.get_fields_metadata()
+y distribuciones de valores parecidas a las reales. Útil para benchmarks y pruebas sin conexión.
+"""
+
+import io
+import random
+import pathlib
+import calendar
+import zipfile
+from typing import Dict, Generator, Optional, Union
+
+from .models.matriculaciones import Matriculacion
+from . import const
+
+HEADER_LINE = "Vehículos matriculados\n"
+
+MARCAS = {
+    "SEAT": ["IBIZA", "LEON", "ARONA", "ATECA"],
+    "VOLKSWAGEN": ["GOLF", "POLO", "T-ROC", "TIGUAN"],
+    "TOYOTA": ["COROLLA", "C-HR", "YARIS", "RAV4"],
+    "RENAULT": ["CLIO", "CAPTUR", "MEGANE", "AUSTRAL"],
+    "PEUGEOT": ["208", "2008", "3008", "308"],
+    "CITROËN": ["C3", "C4", "C5 AIRCROSS", "BERLINGO"],
+    "DACIA": ["SANDERO", "DUSTER", "JOGGER"],
+    "HYUNDAI": ["TUCSON", "KONA", "I20"],
+    "KIA": ["SPORTAGE", "NIRO", "CEED"],
+    "TESLA": ["MODEL 3", "MODEL Y"],
+    "YAMAHA": ["NMAX 125", "TRACER 9", "MT-07"],
+    "HONDA": ["PCX125", "CIVIC", "HR-V"],
+}
+MARCAS_WEIGHTS = [10, 9, 9, 8, 8, 6, 6, 5, 5, 2, 3, 3]
+
+PROVINCIAS = {
+    "M": ("MADRID", "28", [("28079", "Madrid"), ("28065", "Getafe"), ("28005", "Alcalá de Henares")]),
+    "B": ("BARCELONA", "08", [("08019", "Barcelona"), ("08101", "L'Hospitalet de Llobregat")]),
+    "V": ("VALENCIA", "46", [("46250", "València"), ("46244", "Torrent")]),
+    "SE": ("SEVILLA", "41", [("41091", "Sevilla"), ("41038", "Dos Hermanas")]),
+    "MA": ("MALAGA", "29", [("29067", "Málaga"), ("29069", "Marbella")]),
+    "A": ("ALICANTE", "03", [("03014", "Alacant/Alicante"), ("03065", "Elx/Elche")]),
+    "Z": ("ZARAGOZA", "50", [("50297", "Zaragoza")]),
+    "C": ("CORUÑA (A)", "15", [("15030", "Coruña (A)"), ("15078", "Santiago de Compostela")]),
+}
+PROVINCIAS_WEIGHTS = [30, 20, 10, 8, 8, 7, 5, 5]
+
+PROPULSIONES = ["0", "1", "2", "3", "4", "5"]  # gasolina, diésel, eléctrico, otros, butano, solar...
+PROPULSIONES_WEIGHTS = [55, 30, 8, 2, 1, 4]
+
+
+def format_line(values: Dict[str, str]) -> str:
+    """Compone una línea de ancho fijo a partir de los valores (en texto, sin convertir) de cada campo."""
+    return "".join(
+        values.get(metadata.field_name_in_class, "").ljust(metadata.longitud)[:metadata.longitud]
+        for metadata in Matriculacion.get_fields_metadata()
+    ) + "\n"
+
+
+def _format_date(year: int, month: int, day: int) -> str:
+    return f"{day:02d}{month:02d}{year:04d}"
+
+
+def generate_matriculaciones_values(rng: random.Random, year: int, month: int) -> Dict[str, str]:
+    days_in_month = calendar.monthrange(year, month)[1]
+    day = rng.randint(1, days_in_month)
+    marca = rng.choices(list(MARCAS), MARCAS_WEIGHTS)[0]
+    provincia = rng.choices(list(PROVINCIAS), PROVINCIAS_WEIGHTS)[0]
+    localidad, _, municipios = PROVINCIAS[provincia]
+    codigo_ine, municipio = rng.choice(municipios)
+    propulsion = rng.choices(PROPULSIONES, PROPULSIONES_WEIGHTS)[0]
+    electrico = propulsion == "2"
+    nuevo = rng.random() < 0.8
+    primera_matriculacion = (year, month, day) if nuevo else (rng.randint(2000, year - 1), rng.randint(1, 12), rng.randint(1, 28))
+    tara = rng.randint(900, 2200)
+
+    return {
+        "fechaMatriculacion": _format_date(year, month, day),
+        "claseMatricula": rng.choices(["0", "6", "2", "5"], [90, 4, 4, 2])[0],
+        "fechaTransferencia": "" if nuevo else _format_date(year, month, day),
+        "vehiculoMarca": marca,
+        "vehiculoModelo": rng.choice(MARCAS[marca]),
+        "codigoProcedencia": rng.choices(["0", "1", "2"], [85, 12, 3])[0],
+        "bastidor": "" if rng.random() < 0.01 else "".join(rng.choices("ABCDEFGHJKLMNPRSTUVWXYZ0123456789", k=17)),
+        "codigoTipo": rng.choices(["40", "25", "90", "50", "20"], [70, 10, 8, 7, 5])[0],
+        "codPropulsion": propulsion,
+        "cilindrada": "0" if electrico else str(rng.choice([999, 1197, 1498, 1598, 1968, 2487])),
+        "potencia": f"{rng.uniform(5, 20):.2f}",
+        "tara": str(tara),
+        "pesoMaximo": str(tara + rng.randint(300, 700)),
+        "plazas": rng.choices(["5", "2", "7", "1"], [80, 8, 7, 5])[0],
+        "precintado": "NO",
+        "embargado": "SI" if rng.random() < 0.01 else "NO",
+        "transmisiones": "0" if nuevo else str(rng.randint(1, 4)),
+        "titulares": "1" if nuevo else str(rng.randint(1, 5)),
+        "localidad": localidad,
+        "provincia": provincia,
+        "provinciaMatriculacion": provincia,
+        "tramite": rng.choices(["1", "2", "3"], [80, 15, 5])[0],
+        "fechaTramite": _format_date(year, month, day),
+        "codigoPostal": codigo_ine[:2] + f"{rng.randint(0, 999):03d}",
+        "fechaPrimeraMatriculacion": _format_date(*primera_matriculacion),
+        "nuevo": "N" if nuevo else "U",
+        "personaJuridica": "X" if rng.random() < 0.3 else "D",
+        "codigoITV": f"E{rng.randint(1, 13)}*{rng.randint(2007, 2023)}*{rng.randint(0, 9)}",
+        "servicio": rng.choices(["B00", "B07", "A00"], [85, 10, 5])[0],
+        "codigoMunicipioINE": codigo_ine,
+        "municipio": municipio,
+        "potenciaKW": "*******" if rng.random() < 0.02 else str(rng.randint(50, 250)),
+        "plazasMaximo": "5",
+        "co2": "" if electrico or rng.random() < 0.05 else str(rng.randint(90, 220)),
+        "renting": "S" if rng.random() < 0.2 else "N",
+        "titularTutelado": "N",
+    }
+
+
+def generate_matriculaciones_lines(
+        count: int,
+        year: int = 2023,
+        month: int = 1,
+        seed: Optional[int] = 0,
+        header: bool = True,
+) -> Generator[str, None, None]:
+    rng = random.Random(seed)
+    if header:
+        yield HEADER_LINE
+    for _ in range(count):
+        yield format_line(generate_matriculaciones_values(rng, year, month))
+
+
+def generate_matriculaciones_bytes(count: int, **kwargs) -> bytes:
+    return "".join(generate_matriculaciones_lines(count, **kwargs)).encode(const.FILE_ENCODING)
+
+
+def write_matriculaciones_file(path: Union[pathlib.Path, str], count: int, **kwargs) -> pathlib.Path:
+    path = pathlib.Path(path)
+    with open(path, "w", encoding=const.FILE_ENCODING) as f:
+        f.writelines(generate_matriculaciones_lines(count, **kwargs))
+    return path
+
+
+def zip_matriculaciones(data: bytes, filename: str = "matriculaciones.txt") -> bytes:
+    """Comprime un fichero de matriculaciones en un ZIP, como los que sirve el portal de la DGT."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr(filename, data)
+    return buffer.getvalue()
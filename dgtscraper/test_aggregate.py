@@ -0,0 +1,51 @@
+import io
+import collections
+
+import pytest
+
+from dgtscraper.parser import parse_matriculaciones_line
+from dgtscraper.synthetic import generate_matriculaciones_bytes
+
+np = pytest.importorskip("numpy")
+
+
+def test_aggregate_matches_line_parser():
+    from dgtscraper.aggregate import Aggregator
+
+    data = generate_matriculaciones_bytes(3000, year=2023, month=5, seed=3)
+    aggregator = Aggregator(group_by=["month", "codPropulsion"], metrics=["count", "mean:co2", "max:co2", "sum:nuevo"])
+    aggregator.update_file(io.BytesIO(data), batch_size=700)
+
+    expected = collections.defaultdict(list)
+    for line in data.decode("iso-8859-1").splitlines(keepends=True):
+        if matriculacion := parse_matriculaciones_line(line):
+            expected[("2023-05", matriculacion.codPropulsion)].append(matriculacion)
+
+    rows = aggregator.results()
+    assert [tuple(row[:2]) for row in rows] == sorted(expected)
+    for month, propulsion, count, mean_co2, max_co2, sum_nuevo in rows:
+        group = expected[(month, propulsion)]
+        co2 = [m.co2 for m in group if m.co2 is not None]
+        assert count == len(group)
+        assert sum_nuevo == sum(m.nuevo for m in group)
+        if co2:
+            assert mean_co2 == pytest.approx(sum(co2) / len(co2))
+            assert max_co2 == max(co2)
+        else:
+            assert mean_co2 is None and max_co2 is None
+
+
+def test_aggregate_csv_without_groups():
+    from dgtscraper.aggregate import Aggregator
+
+    aggregator = Aggregator(group_by=[], metrics=["count", "min:tara"])
+    aggregator.update_file(io.BytesIO(generate_matriculaciones_bytes(100, seed=1)))
+    output = io.StringIO()
+    aggregator.write_csv(output)
+
+    header, row = output.getvalue().splitlines()
+    assert header == "count,min_tara"
+    assert row.startswith("100,")
+
+    with pytest.raises(ValueError):
+        Aggregator(group_by=["vehiculoMarca"], metrics=["mean:vehiculoModelo"])
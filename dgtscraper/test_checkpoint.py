@@ -0,0 +1,124 @@
+import collections
+import concurrent.futures
+
+import pytest
+
+from dgtscraper.models import IngestCheckpoint
+from dgtscraper.test_matriculaciones_parser import build_line
+
+
+class FakeBulkWriteResult:
+    def __init__(self, upserted_count: int):
+        self.upserted_count = upserted_count
+        self.matched_count = 0
+
+
+class FakeCollection:
+    """Minimal pymongo collection for MongoSink upserts; fails the bulk number fail_at (1-based), if given."""
+
+    def __init__(self, fail_at=None):
+        self.ids = list()
+        self.bulks = 0
+        self.fail_at = fail_at
+
+    def bulk_write(self, operations, ordered=True):
+        self.bulks += 1
+        if self.bulks == self.fail_at:
+            raise ConnectionError("connection lost")
+        ids = [operation._filter["_id"] for operation in operations]
+        self.ids.extend(ids)
+        return FakeBulkWriteResult(len(ids))
+
+
+class FakeDownloader:
+    def __init__(self, lines):
+        self.lines = lines
+
+    def stream_matriculaciones_by_date(self, year, month, day=None):
+        yield from self.lines
+
+
+def test_checkpoint_roundtrip(tmp_path):
+    path = tmp_path / "checkpoint.json"
+    assert IngestCheckpoint.load(path, source="2024-01") == IngestCheckpoint(source="2024-01")
+
+    IngestCheckpoint(source="2024-01", last_line_number=120, count=118).save(path)
+    assert IngestCheckpoint.load(path, source="2024-01") == IngestCheckpoint(source="2024-01", last_line_number=120, count=118)
+    assert not (tmp_path / "checkpoint.json.tmp").exists()
+
+
+def test_checkpoint_other_source_or_invalid_starts_over(tmp_path):
+    path = tmp_path / "checkpoint.json"
+    IngestCheckpoint(source="2024-01", last_line_number=120, count=118).save(path)
+    assert IngestCheckpoint.load(path, source="2024-02") == IngestCheckpoint(source="2024-02")
+
+    path.write_text("{not json")
+    assert IngestCheckpoint.load(path, source="2024-01") == IngestCheckpoint(source="2024-01")
+
+
+def test_save_checkpoint_advances_over_acknowledged_batches_in_order(tmp_path):
+    from matriculaciones_to_mongodb import save_checkpoint
+
+    path = tmp_path / "checkpoint.json"
+    checkpoint = IngestCheckpoint(source="2024-01")
+    first, second, third = (concurrent.futures.Future() for _ in range(3))
+    pending = collections.deque([(first, 10, 10), (second, 20, 9), (third, 30, 10)])
+
+    # a later batch acknowledged before the first one does not advance the checkpoint
+    second.set_result(None)
+    save_checkpoint(checkpoint, path, pending)
+    assert checkpoint.last_line_number == 0
+    assert not path.exists()
+
+    first.set_result(None)
+    save_checkpoint(checkpoint, path, pending)
+    assert (checkpoint.last_line_number, checkpoint.count) == (20, 19)
+    assert IngestCheckpoint.load(path, source="2024-01") == checkpoint
+    assert len(pending) == 1
+
+    # a failed batch raises, and the checkpoint stays at the last acknowledged batch
+    third.set_exception(ConnectionError("connection lost"))
+    with pytest.raises(ConnectionError):
+        save_checkpoint(checkpoint, path, pending)
+    assert IngestCheckpoint.load(path, source="2024-01").last_line_number == 20
+
+
+def test_ingest_resumes_after_failure(tmp_path):
+    pytest.importorskip("pymongo")
+    from dgtscraper.sinks.mongodb import MongoSink
+    from matriculaciones_to_mongodb import ingest
+
+    path = tmp_path / "checkpoint.json"
+    lines = [build_line(bastidor=f"B{i:03d}") for i in range(10)]
+    downloader = FakeDownloader(lines)
+
+    # 3 lines per bulk, a single writer: the second bulk (lines 4-6) fails
+    collection = FakeCollection(fail_at=2)
+    checkpoint = IngestCheckpoint(source="2024-01")
+    with pytest.raises(ConnectionError):
+        ingest(downloader, MongoSink(collection, batch_size=3, writers=1), 2024, 1, None, checkpoint, path)
+    # the checkpoint never goes past the acknowledged batches (it may lag behind them)
+    checkpoint = IngestCheckpoint.load(path, source="2024-01")
+    assert checkpoint.last_line_number in (0, 3)
+    assert collection.ids[:checkpoint.last_line_number] == [f"B{i:03d}|2024-01-02" for i in range(checkpoint.last_line_number)]
+
+    collection = FakeCollection()
+    resumed_from = checkpoint.last_line_number
+    ingest(downloader, MongoSink(collection, batch_size=3, writers=1), 2024, 1, None, checkpoint, path)
+    assert collection.ids == [f"B{i:03d}|2024-01-02" for i in range(resumed_from, 10)]
+    assert not path.exists()
+
+
+def test_ingest_skips_checkpointed_lines(tmp_path):
+    pytest.importorskip("pymongo")
+    from dgtscraper.sinks.mongodb import MongoSink
+    from matriculaciones_to_mongodb import ingest
+
+    path = tmp_path / "checkpoint.json"
+    IngestCheckpoint(source="2024-01", last_line_number=6, count=6).save(path)
+    downloader = FakeDownloader([build_line(bastidor=f"B{i:03d}") for i in range(10)])
+    collection = FakeCollection()
+
+    checkpoint = IngestCheckpoint.load(path, source="2024-01")
+    ingest(downloader, MongoSink(collection, batch_size=3, writers=1), 2024, 1, None, checkpoint, path)
+    assert collection.ids == [f"B{i:03d}|2024-01-02" for i in range(6, 10)]
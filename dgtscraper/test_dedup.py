@@ -0,0 +1,62 @@
+import pytest
+
+from dgtscraper.dedup import DedupIndex, DedupSink
+from dgtscraper.parser import parse_matriculaciones_line
+from dgtscraper.test_delta import RecordingSink
+from dgtscraper.test_matriculaciones_parser import build_line
+
+
+@pytest.mark.parametrize("kwargs", [
+    pytest.param({}, id="table"),
+    pytest.param({"bloom_fp_rate": 0.01}, id="table+bloom"),
+])
+def test_dedup_index_exact(tmp_path, kwargs):
+    index = DedupIndex(expected_keys=100, **kwargs)
+    keys = [f"B{i:05d}|2024-01-02" for i in range(1000)]  # grows past expected_keys
+
+    assert all(index.add(key) for key in keys)
+    assert not any(index.add(key) for key in keys)
+    assert len(index) == 1000
+    assert not any(f"X{i}" in index for i in range(1000))
+
+    index.save(tmp_path / "dedup.idx")
+    loaded = DedupIndex.load(tmp_path / "dedup.idx")
+    assert len(loaded) == 1000 and loaded.nbytes == index.nbytes
+    assert all(key in loaded for key in keys)
+    assert loaded.add("new key")
+
+
+def test_dedup_index_bloom_only(tmp_path):
+    index = DedupIndex(expected_keys=10000, bloom_fp_rate=0.01, exact=False)
+    new = sum(index.add(f"B{i:05d}|2024-01-02") for i in range(10000))
+
+    assert not any(index.add(f"B{i:05d}|2024-01-02") for i in range(10000))  # no false negatives
+    assert new > 9800  # false positives: ~1% of new keys taken as seen
+    assert index.nbytes < 10000 * 2
+
+    index.save(tmp_path / "dedup.idx")
+    assert "B00001|2024-01-02" in DedupIndex.load(tmp_path / "dedup.idx")
+
+
+def test_dedup_sink():
+    sink = RecordingSink()
+    dedup_sink = DedupSink(sink, DedupIndex(expected_keys=10))
+    january = [parse_matriculaciones_line(build_line(bastidor=f"B{i}")) for i in range(5)]
+    dedup_sink.write("2024-01", january)
+    dedup_sink.write("2024-02", january[3:] + [parse_matriculaciones_line(build_line(bastidor="B9"))])
+
+    assert sink.written == ["B0", "B1", "B2", "B3", "B4", "B9"]
+    assert (dedup_sink.written, dedup_sink.duplicated) == (6, 2)
+
+
+def test_dedup_sink_passes_through_empty_bastidor():
+    sink = RecordingSink()
+    index = DedupIndex(expected_keys=10)
+    dedup_sink = DedupSink(sink, index)
+    matriculaciones = [parse_matriculaciones_line(build_line(bastidor="", vehiculoModelo=f"M{i}")) for i in range(3)]
+    dedup_sink.write("2024-01", matriculaciones)
+    dedup_sink.write("2024-02", matriculaciones)
+
+    assert sink.written == [""] * 6
+    assert (dedup_sink.written, dedup_sink.duplicated) == (6, 0)
+    assert len(index) == 0
@@ -0,0 +1,98 @@
+import pytest
+
+from dgtscraper.delta import DeltaIndex, DeltaChange, write_delta
+from dgtscraper.parser import parse_matriculaciones_line
+from dgtscraper.sinks import Sink
+from dgtscraper.test_matriculaciones_parser import build_line
+
+
+class RecordingSink(Sink):
+    def __init__(self):
+        self.written = list()
+        self.deleted = list()
+
+    def write(self, source, matriculaciones):
+        self.written.extend(m.bastidor for m in matriculaciones)
+
+    def delete(self, source, ids):
+        self.deleted.extend(ids)
+
+
+def parse(lines):
+    return [parse_matriculaciones_line(line) for line in lines]
+
+
+def test_delta_index_diff_and_persistence(tmp_path):
+    index_path = tmp_path / "2024-01-02.idx"
+    day = [build_line(bastidor=f"B{i:05d}") for i in range(10)]
+
+    index = DeltaIndex.load(index_path)
+    snapshot = DeltaIndex()
+    sink = RecordingSink()
+    counts = write_delta(sink, "2024-01-02", index.diff(parse(day), snapshot), batch_size=4)
+    assert counts == {DeltaChange.NEW: 10, DeltaChange.CHANGED: 0, DeltaChange.REMOVED: 0}
+    snapshot.save(index_path)
+
+    # revised day: one record changed, one removed, one added
+    day[3] = build_line(bastidor="B00003", co2="150")
+    del day[7]
+    day.append(build_line(bastidor="B00010"))
+
+    index = DeltaIndex.load(index_path)
+    assert len(index) == 10
+    snapshot = DeltaIndex()
+    sink = RecordingSink()
+    counts = write_delta(sink, "2024-01-02", index.diff(parse(day), snapshot))
+    assert counts == {DeltaChange.NEW: 1, DeltaChange.CHANGED: 1, DeltaChange.REMOVED: 1}
+    assert sink.written == ["B00003", "B00010"]
+    assert sink.deleted == ["B00007|2024-01-02"]
+    assert len(snapshot) == 10
+
+    # unchanged download: empty delta
+    snapshot.save(index_path)
+    records = list(DeltaIndex.load(index_path).diff(parse(day), DeltaIndex()))
+    assert records == []
+
+
+def test_delta_index_truncated_file_is_invalid(tmp_path):
+    index_path = tmp_path / "2024-01-02.idx"
+    DeltaIndex({"B00001|2024-01-02": 1, "B00002|2024-01-02": 2}).save(index_path)
+    data = index_path.read_bytes()
+    assert len(DeltaIndex.load(index_path)) == 2
+
+    for size in (3, len(data) - 20, len(data) - 1):
+        index_path.write_bytes(data[:size])
+        with pytest.raises(ValueError, match="Invalid delta index file"):
+            DeltaIndex.load(index_path)
+
+
+def test_delta_parse_errors_do_not_remove():
+    day = [build_line(bastidor=f"B{i:05d}") for i in range(5)]
+    index = DeltaIndex()
+    list(DeltaIndex().diff(parse(day), index))
+
+    # a previously seen line becomes unparseable, another one is really removed
+    revised = list(day)
+    revised[2] = build_line(bastidor="B00002", plazas="X")
+    del revised[4]
+    snapshot = DeltaIndex()
+    sink = RecordingSink()
+    counts = write_delta(sink, "2024-01-02", index.diff(parse(revised), snapshot))
+
+    assert counts == {DeltaChange.NEW: 0, DeltaChange.CHANGED: 0, DeltaChange.REMOVED: 0}
+    assert sink.deleted == []
+    assert snapshot.parse_errors == 1
+    assert snapshot.hashes == index.hashes
+
+    # once the file parses again, the removal is emitted
+    records = list(snapshot.diff(parse(day[:4]), DeltaIndex()))
+    assert [(record.change, record.id) for record in records] == [(DeltaChange.REMOVED, "B00004|2024-01-02")]
+
+
+def test_delta_duplicated_ids_keep_last():
+    first, second = build_line(bastidor="B1", co2="100"), build_line(bastidor="B1", co2="200")
+    snapshot = DeltaIndex()
+    records = list(DeltaIndex().diff(parse([first, second]), snapshot))
+    assert [(record.change, record.matriculacion.co2) for record in records] == [(DeltaChange.NEW, 200)]
+
+    assert list(snapshot.diff(parse([first, second]), DeltaIndex())) == []
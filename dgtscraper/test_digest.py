@@ -0,0 +1,30 @@
+from dgtscraper.digest import digest_file, diff_manifests, merkle_root
+from dgtscraper.test_matriculaciones_parser import build_line
+
+
+def write_file(path, lines):
+    path.write_text("Vehículos matriculados\n" + "".join(lines), encoding="iso-8859-1")
+
+
+def test_merkle_root_combines_pairs():
+    assert merkle_root(["aa"]) == "aa"
+    assert merkle_root(["aa", "bb", "cc"]) != merkle_root(["aa", "bb", "cd"])
+
+
+def test_digest_file_and_diff(tmp_path):
+    lines = [build_line(bastidor=f"B{i:05d}") for i in range(95)]
+    old_path, new_path = tmp_path / "old.txt", tmp_path / "new.txt"
+    write_file(old_path, lines)
+    lines[12] = build_line(bastidor="CHANGED")
+    lines[57] = build_line(plazas="X")  # parse error: excluded from the digest, so the chunk changes
+    write_file(new_path, lines[:90])
+
+    old = digest_file(old_path, chunk_size=10, workers=1)
+    parallel = digest_file(old_path, chunk_size=10, workers=2)
+    new = digest_file(new_path, chunk_size=10, workers=1)
+
+    assert parallel == old
+    assert (old.lines, old.count, len(old.chunks)) == (95, 95, 10)
+    assert new.count == 89
+    assert diff_manifests(old, old) == []
+    assert diff_manifests(old, new) == [(10, 20), (50, 60), (90, 90)]
@@ -0,0 +1,315 @@
+import os
+import io
+import hashlib
+import time
+import asyncio
+import zipfile
+
+import pytest
+import requests
+
+from dgtscraper.downloader import DGTDownloader, AsyncDGTDownloader
+from dgtscraper.downloader.matriculaciones import split_chunks_in_line_blocks
+from dgtscraper.replay_server import ReplayServer, ReplayServerConfig
+
+
+class FakeZipResponse:
+    def __init__(self, content: bytes):
+        self.content = content
+
+    def iter_content(self, chunk_size: int):
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i:i + chunk_size]
+
+
+def zip_bytes(data: bytes) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("matriculaciones.txt", data)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("chunks", [
+    pytest.param([b"a\nbb\nccc\n"], id="single"),
+    pytest.param([b"a\nb", b"b\ncc", b"c", b"\n"], id="split"),
+    pytest.param([b"a\nbb\n", b"ccc"], id="no-trailing-newline"),
+    pytest.param([b"", b"a", b"\n"], id="empty-chunks"),
+])
+def test_split_chunks_in_line_blocks(chunks):
+    blocks = list(split_chunks_in_line_blocks(chunks))
+
+    assert b"".join(blocks) == b"".join(chunks)
+    assert all(block.endswith(b"\n") for block in blocks[:-1])
+
+
+def test_unzip_stream_response_lines():
+    data = "Vehículos matriculados\n".encode("iso-8859-1") + b"".join(b"%05d\n" % i for i in range(5000)) + b"end"
+    downloader = DGTDownloader()
+    downloader.unzip_chunk_size = 1000
+
+    lines = list(downloader._unzip_stream_response(FakeZipResponse(zip_bytes(data))))
+
+    assert lines == data.splitlines(keepends=True)
+
+
+class FakeDownloader:
+    active = 0
+    max_active = 0
+
+    def __init__(self):
+        self.session = requests.Session()
+
+    def stream_matriculaciones_batches_by_date(self, year, month, day=None, decode=True):
+        FakeDownloader.active += 1
+        FakeDownloader.max_active = max(FakeDownloader.max_active, FakeDownloader.active)
+        try:
+            for i in range(3):
+                time.sleep(0.01)
+                yield f"{year}-{month}:{i}a\n{year}-{month}:{i}b\n"
+        finally:
+            FakeDownloader.active -= 1
+
+
+def test_async_stream_many():
+    async def collect():
+        downloader = AsyncDGTDownloader(downloader_factory=FakeDownloader)
+        return [item async for item in downloader.stream_many([(2023, m) for m in range(1, 7)], concurrency=2)]
+
+    results = asyncio.run(collect())
+
+    assert len(results) == 6 * 6
+    for month in range(1, 7):
+        lines = [line for date, line in results if date == (2023, month)]
+        assert lines == [f"2023-{month}:{i}{x}\n" for i in range(3) for x in "ab"]
+    assert FakeDownloader.max_active <= 2
+    assert FakeDownloader.active == 0
+
+
+class FakeDownloadResponse(FakeZipResponse):
+    def __init__(self, content: bytes, content_type: str = "application/zip"):
+        super().__init__(content)
+        self.headers = {"Content-Type": content_type}
+        self.text = content.decode("iso-8859-1")
+        self.ok = True
+
+        self.closed = False
+
+    def raise_for_status(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def test_navigation_state_reused_and_renewed(monkeypatch):
+    downloader = DGTDownloader()
+    calls = []
+    responses = []
+    for step in ("_get_viewstate_0", "_get_viewstate_1_vehiculos",
+                 "_get_viewstate_2_vehiculos_matriculaciones", "_get_viewstate_3_microdatos"):
+        monkeypatch.setattr(downloader, step, lambda step=step: calls.append(step))
+    monkeypatch.setattr(downloader, "_get_viewstate_4_year", lambda year: calls.append(year))
+    monkeypatch.setattr(downloader, "_post_download", lambda **kwargs: responses.pop(0))
+
+    def download(year, month):
+        return list(downloader.stream_matriculaciones_by_date(year, month))
+
+    responses.append(FakeDownloadResponse(zip_bytes(b"a\n")))
+    assert download(2023, 1) == ["a\n"]
+    assert calls == ["_get_viewstate_0", "_get_viewstate_1_vehiculos",
+                     "_get_viewstate_2_vehiculos_matriculaciones", "_get_viewstate_3_microdatos", 2023]
+
+    # same year: no navigation at all; new year: only the year step
+    calls.clear()
+    responses.extend([FakeDownloadResponse(zip_bytes(b"b\n")), FakeDownloadResponse(zip_bytes(b"c\n"))])
+    assert download(2023, 2) == ["b\n"]
+    assert download(2022, 2) == ["c\n"]
+    assert calls == [2022]
+
+    # expired view: full navigation and retry
+    calls.clear()
+    responses.extend([
+        FakeDownloadResponse(b"<html>expired</html>", content_type="text/html"),
+        FakeDownloadResponse(zip_bytes(b"d\n")),
+    ])
+    assert download(2022, 3) == ["d\n"]
+    assert calls[0] == "_get_viewstate_0" and calls[-1] == 2022 and len(calls) == 5
+
+    # portal error about the data: raised without navigating again
+    calls.clear()
+    responses.extend([
+        FakeDownloadResponse(b'<html><li class="msgError">No existen datos</li></html>', content_type="text/html"),
+        FakeDownloadResponse(zip_bytes(b"e\n")),
+    ])
+    with pytest.raises(ValueError, match="No existen datos"):
+        download(2022, 4)
+    assert calls == []
+    assert len(responses) == 1
+
+
+def test_zip_cache(monkeypatch, tmp_path):
+    downloader = DGTDownloader()
+    downloader.tmp_path = tmp_path
+    downloader.unzip_chunk_size = 100
+    cache = downloader.enable_cache(max_size=10 ** 6)
+    data = b"".join(b"%05d\n" % i for i in range(1000))
+    content = zip_bytes(data)
+    requests_made = []
+
+    def request_download(year, month, day):
+        requests_made.append((year, month, day))
+        return FakeDownloadResponse(content)
+
+    monkeypatch.setattr(downloader, "_request_download", request_download)
+
+    for _ in range(2):
+        assert "".join(downloader.stream_matriculaciones_by_date(2023, 1)) == data.decode()
+    assert requests_made == [(2023, 1, None)]
+
+    entry = cache.get_entry(2023, 1)
+    assert entry.zip_size == len(content)
+    assert entry.output_size == len(data)
+    assert entry.zip_md5 == hashlib.md5(content).hexdigest()
+
+    # daily downloads bypass the cache by default
+    for _ in range(2):
+        list(downloader.stream_matriculaciones_by_date(2023, 1, 15))
+    assert requests_made[1:] == [(2023, 1, 15)] * 2
+
+    # entries whose zip changed (size or mtime) are discarded and downloaded again
+    zip_path = tmp_path / "cache" / "matriculaciones-2023-01.zip"
+    zip_path.write_bytes(content[:-1])
+    list(downloader.stream_matriculaciones_by_date(2023, 1))
+    assert requests_made[-1] == (2023, 1, None)
+    mtime_ns = zip_path.stat().st_mtime_ns
+    os.utime(zip_path, ns=(mtime_ns + 10 ** 9, mtime_ns + 10 ** 9))
+    list(downloader.stream_matriculaciones_by_date(2023, 1))
+    assert len(requests_made) == 5
+
+    # the md5 is only checked with verify
+    mtime_ns = zip_path.stat().st_mtime_ns
+    zip_path.write_bytes(b"x" * len(content))
+    os.utime(zip_path, ns=(mtime_ns, mtime_ns))
+    assert cache.get(2023, 1) == zip_path
+    cache.verify = True
+    assert cache.get(2023, 1) is None
+    cache.verify = False
+    list(downloader.stream_matriculaciones_by_date(2023, 1))
+    assert len(requests_made) == 6
+
+    # LRU eviction keeps the cache within its budget
+    cache.max_size = len(content) * 2
+    for month in (2, 3):
+        list(downloader.stream_matriculaciones_by_date(2023, month))
+    assert sorted(e.key for e in cache.entries()) == ["matriculaciones-2023-02", "matriculaciones-2023-03"]
+
+
+def test_zip_cache_discards_partial_downloads(monkeypatch, tmp_path):
+    downloader = DGTDownloader()
+    downloader.tmp_path = tmp_path
+    downloader.unzip_chunk_size = 100
+    cache = downloader.enable_cache()
+    monkeypatch.setattr(downloader, "_request_download",
+                        lambda **kwargs: FakeDownloadResponse(zip_bytes(b"a\n" * 1000)))
+
+    lines = downloader.stream_matriculaciones_by_date(2023, 1)
+    next(lines)
+    lines.close()
+
+    assert cache.entries() == []
+    assert list((tmp_path / "cache").iterdir()) == []
+
+
+@pytest.mark.parametrize("cached", [False, True])
+def test_stream_closes_response_when_stopped_early(monkeypatch, tmp_path, cached):
+    downloader = DGTDownloader()
+    downloader.tmp_path = tmp_path
+    downloader.unzip_chunk_size = 100
+    if cached:
+        downloader.enable_cache()
+    response = FakeDownloadResponse(zip_bytes(b"a\n" * 1000))
+    monkeypatch.setattr(downloader, "_request_download", lambda **kwargs: response)
+
+    lines = downloader.stream_matriculaciones_by_date(2023, 1)
+    next(lines)
+    assert not response.closed
+    lines.close()
+    assert response.closed
+
+
+@pytest.fixture
+def replay_server():
+    with ReplayServer(ReplayServerConfig(lines_per_month=300, lines_per_day=20, chunk_size=1024)) as server:
+        yield server
+
+
+def test_replay_server_download(replay_server, tmp_path):
+    downloader = DGTDownloader(base_url=replay_server.base_url)
+
+    path = downloader.download_matriculaciones_by_date(2023, 3, path=tmp_path)
+    assert path.read_bytes() == replay_server.get_data((2023, 3))
+
+    lines = list(downloader.stream_matriculaciones_by_date(2023, 3, 15))
+    assert "".join(lines).encode("iso-8859-1") == replay_server.get_data((2023, 3, 15))
+    assert len(lines) == 21
+
+    # navigation reached on the first download is reused by the second one
+    assert replay_server.stats.requests == {"categoria.faces": 3, "subcategoria.faces": 1, "microdatos.faces": 3}
+    assert replay_server.stats.downloads == 2
+
+
+def test_replay_server_stream_where(replay_server):
+    downloader = DGTDownloader(base_url=replay_server.base_url)
+    lines = list(downloader.stream_matriculaciones_by_date(2023, 6, where={"provincia": "M", "codPropulsion": "2"}))
+
+    all_lines = replay_server.get_data((2023, 6)).decode("iso-8859-1").splitlines(keepends=True)
+    assert lines == [line for line in all_lines if line[152:154] == "M " and line[93] == "2"]
+    assert lines
+
+
+def test_replay_server_expired_view(replay_server):
+    replay_server.config.viewstate_ttl = 0.2
+    downloader = DGTDownloader(base_url=replay_server.base_url)
+    list(downloader.stream_matriculaciones_by_date(2023, 1))
+
+    time.sleep(0.3)
+    list(downloader.stream_matriculaciones_by_date(2023, 2))
+    assert replay_server.stats.expired_views == 1
+    assert replay_server.stats.downloads == 2
+    assert replay_server.stats.requests["categoria.faces"] == 6
+
+
+def test_replay_server_error(replay_server):
+    replay_server.config.error_dates = {(2023, 4)}
+    downloader = DGTDownloader(base_url=replay_server.base_url)
+
+    with pytest.raises(ValueError, match="No existen datos"):
+        list(downloader.stream_matriculaciones_by_date(2023, 4))
+
+    # with a reused navigation, the error is not taken as an expired view
+    list(downloader.stream_matriculaciones_by_date(2023, 1))
+    with pytest.raises(ValueError, match="No existen datos"):
+        list(downloader.stream_matriculaciones_by_date(2023, 4))
+    assert replay_server.stats.requests["categoria.faces"] == 3
+    assert replay_server.stats.requests["microdatos.faces"] == 4
+
+
+def test_replay_server_disconnect(replay_server):
+    replay_server.config.disconnect_after = 2000
+    downloader = DGTDownloader(base_url=replay_server.base_url)
+
+    with pytest.raises(requests.RequestException):
+        list(downloader.stream_matriculaciones_by_date(2023, 5))
+
+
+def test_replay_server_async_stream_many(replay_server):
+    downloader = AsyncDGTDownloader(downloader_factory=lambda: DGTDownloader(base_url=replay_server.base_url))
+    dates = [(2023, 1), (2023, 2), (2023, 2, 10)]
+
+    async def collect():
+        return [item async for item in downloader.stream_many(dates, concurrency=3)]
+
+    results = asyncio.run(collect())
+    for date in dates:
+        lines = [line for line_date, line in results if line_date == date]
+        assert "".join(lines).encode("iso-8859-1") == replay_server.get_data(date)
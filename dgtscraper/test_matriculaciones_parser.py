@@ -0,0 +1,400 @@
+import io
+import json
+import hashlib
+import datetime
+
+import pytest
+
+from dgtscraper.parser import parse_matriculaciones_line, parse_matriculaciones_file, Between, compile_where
+from dgtscraper.models import Matriculacion, ParseError, ClaseMatriculaEnum
+
+SAMPLE_FIELDS = {
+    "fechaMatriculacion": "02012024",
+    "claseMatricula": "0",
+    "fechaTransferencia": "",
+    "vehiculoMarca": "SEAT",
+    "vehiculoModelo": "IBIZA",
+    "codigoProcedencia": "0",
+    "bastidor": "VSSZZZKJZRR000001",
+    "codigoTipo": "40",
+    "codPropulsion": "0",
+    "cilindrada": "999",
+    "potencia": "8.34",
+    "tara": "1090",
+    "pesoMaximo": "1580",
+    "plazas": "5",
+    "precintado": "NO",
+    "embargado": "NO",
+    "transmisiones": "0",
+    "titulares": "1",
+    "localidad": "MADRID",
+    "provincia": "M",
+    "provinciaMatriculacion": "M",
+    "tramite": "1",
+    "fechaTramite": "02012024",
+    "codigoPostal": "28001",
+    "fechaPrimeraMatriculacion": "02012024",
+    "nuevo": "N",
+    "personaJuridica": "D",
+    "codigoITV": "E9*2018*0",
+    "servicio": "B00",
+    "codigoMunicipioINE": "28079",
+    "municipio": "Madrid",
+    "potenciaKW": "70",
+    "plazasMaximo": "5",
+    "co2": "120",
+    "renting": "N",
+    "titularTutelado": "N",
+}
+
+
+def build_line(**overrides) -> str:
+    fields = {**SAMPLE_FIELDS, **overrides}
+    return "".join(
+        fields[metadata.field_name_in_class].ljust(metadata.longitud)[:metadata.longitud]
+        for metadata in Matriculacion.get_fields_metadata()
+    ) + "\n"
+
+
+@pytest.mark.parametrize("overrides", [
+    pytest.param({}, id="default"),
+    pytest.param({"fechaTransferencia": "15032020", "co2": "", "potenciaKW": "*******"}, id="nullables"),
+    pytest.param({"precintado": "SI", "embargado": "S", "nuevo": "U", "personaJuridica": "X"}, id="booleans"),
+    pytest.param({"vehiculoMarca": "CITROËN", "claseMatricula": "8"}, id="latin1-enum"),
+])
+def test_parse_line_fast_equals_strict(overrides):
+    line = build_line(**overrides)
+    strict = parse_matriculaciones_line(line)
+    fast = parse_matriculaciones_line(line, strict=False)
+
+    assert isinstance(strict, Matriculacion)
+    assert fast == strict
+    assert fast.json() == strict.json()
+
+
+@pytest.mark.parametrize("overrides", [
+    pytest.param({"fechaMatriculacion": ""}, id="required-date"),
+    pytest.param({"claseMatricula": "Z"}, id="enum"),
+    pytest.param({"plazas": "X"}, id="int"),
+])
+def test_parse_line_fast_falls_back_to_parse_error(overrides):
+    line = build_line(**overrides)
+    result = parse_matriculaciones_line(line, 7, strict=False)
+
+    assert isinstance(result, ParseError)
+    assert result.line_number == 7
+
+
+@pytest.mark.parametrize("strict", [True, False])
+def test_memoized_converters_report_hits(strict):
+    from dgtscraper.parser import get_memo_stats
+    from dgtscraper.parser.decoder import get_memoized_converter
+
+    line = build_line(codigoMunicipioINE="28080", fechaMatriculacion="03012024")
+    parse_matriculaciones_line(line, strict=strict)
+    before = get_memo_stats()["codigoMunicipioINE"]
+    results = [parse_matriculaciones_line(line, strict=strict) for _ in range(3)]
+    after = get_memo_stats()["codigoMunicipioINE"]
+
+    assert results[0] == results[2]
+    assert results[0].codigoMunicipioINE == 28080
+    assert after["hits"] - before["hits"] == 3
+    assert after["misses"] == before["misses"]
+    assert 0 < after["hit_rate"] <= 1
+    assert get_memoized_converter("fechaMatriculacion")("03012024") is results[0].fechaMatriculacion
+    assert isinstance(parse_matriculaciones_line(build_line(codigoMunicipioINE="X"), strict=strict), ParseError)
+
+
+def test_static_layout_matches_docstrings():
+    import pathlib
+    from dgtscraper.models.common import render_layout_module
+
+    layout_path = pathlib.Path(__file__).parent / "models" / "matriculaciones_layout.py"
+    expected = render_layout_module("Matriculacion", Matriculacion.extract_fields_metadata())
+    assert layout_path.read_text(encoding="utf-8") == expected, \
+        "matriculaciones_layout.py is outdated, regenerate it with matriculaciones_generate_layout.py"
+    assert Matriculacion.get_fields_metadata() == Matriculacion.extract_fields_metadata()
+    assert sum(metadata.longitud for metadata in Matriculacion.get_fields_metadata()) == 244
+
+
+def test_parser_import_does_not_load_downloader_dependencies():
+    import pathlib
+    import subprocess
+    import sys
+
+    code = (
+        "import sys, dgtscraper, dgtscraper.parser, dgtscraper.pipeline; "
+        "from dgtscraper.models import Matriculacion; Matriculacion.get_fields_metadata(); "
+        "print(' '.join(m for m in ('bs4', 'requests', 'stream_unzip', 'class_doc') if m in sys.modules))"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True, cwd=pathlib.Path(__file__).parent.parent,
+    ).stdout
+    assert output.strip() == ""
+
+
+def test_parse_file_skips_header():
+    file = io.StringIO("Vehículos matriculados\n" + build_line() + build_line(bastidor=""))
+    results = list(parse_matriculaciones_file(file, strict=False))
+
+    assert results[0] is None
+    assert [r.bastidor for r in results[1:]] == ["VSSZZZKJZRR000001", ""]
+
+
+@pytest.mark.parametrize("strict", [True, False])
+def test_parse_line_fields_projection(strict):
+    fields = ["fechaMatriculacion", "provincia", "codPropulsion", "co2", "potenciaKW", "nuevo"]
+    for overrides in ({}, {"co2": "", "potenciaKW": "*******", "nuevo": "U"}):
+        line = build_line(**overrides)
+        model = parse_matriculaciones_line(line)
+        projected = parse_matriculaciones_line(line, strict=strict, fields=fields)
+        assert projected == {field: getattr(model, field) for field in fields}
+
+    error = parse_matriculaciones_line(build_line(co2="X"), 5, strict=strict, fields=fields)
+    assert isinstance(error, ParseError) and error.line_number == 5
+    # fields outside the projection are not validated
+    assert parse_matriculaciones_line(build_line(plazas="X"), strict=strict, fields=fields)["provincia"] == "M"
+
+    with pytest.raises(ValueError):
+        parse_matriculaciones_line(build_line(), strict=strict, fields=["unknown"])
+
+    file = io.StringIO("Vehículos matriculados\n" + build_line() + build_line(provincia="B"))
+    results = list(parse_matriculaciones_file(file, strict=strict, fields=["provincia"]))
+    assert results == [None, {"provincia": "M"}, {"provincia": "B"}]
+
+
+@pytest.mark.parametrize("where, expected", [
+    pytest.param({"provincia": "B"}, [1], id="str"),
+    pytest.param({"codPropulsion": {"1", "2"}, "provincia": "M"}, [2], id="set-and"),
+    pytest.param({"fechaMatriculacion": datetime.date(2024, 2, 1)}, [2], id="date"),
+    pytest.param({"fechaMatriculacion": Between("2024-01-15", None)}, [1, 2], id="date-range"),
+    pytest.param({"co2": Between(100, 130)}, [0, 1], id="number-range"),
+    pytest.param({"co2": 120}, [0], id="number"),
+    pytest.param({"nuevo": False}, [1], id="bool"),
+    pytest.param({"claseMatricula": ClaseMatriculaEnum.Historica}, [2], id="enum"),
+    pytest.param({"provincia": lambda raw: raw != "B"}, [0, 2], id="callable"),
+])
+def test_parse_file_where(where, expected):
+    lines = [
+        build_line(),
+        build_line(provincia="B", fechaMatriculacion="20012024", co2="100", nuevo="U"),
+        build_line(codPropulsion="2", fechaMatriculacion="01022024", co2="", claseMatricula="8"),
+    ]
+    results = list(parse_matriculaciones_file(io.StringIO("".join(lines)), strict=False, where=where))
+    assert [i for i, result in enumerate(results) if result] == expected
+    assert all(result == parse_matriculaciones_line(lines[i]) for i, result in enumerate(results) if result)
+
+    with pytest.raises(ValueError):
+        compile_where({"unknown": "x"})
+
+
+@pytest.mark.parametrize("strict", [True, False])
+def test_parse_line_as_record(strict):
+    from dgtscraper.models import MatriculacionRecord
+
+    line = build_line(fechaTransferencia="15032020", co2="", potenciaKW="*******", claseMatricula="8")
+    model = parse_matriculaciones_line(line)
+    record = parse_matriculaciones_line(line, strict=strict, as_record=True)
+
+    assert isinstance(record, MatriculacionRecord)
+    assert record._fields == tuple(Matriculacion.__fields__)
+    assert record._asdict() == model.__dict__
+    assert record.cargaUtil == model.cargaUtil
+    assert record.to_model() == model
+    assert record.to_model(validate=True).json() == model.json()
+    assert MatriculacionRecord.from_model(model) == record
+    assert not hasattr(record, "__dict__")
+
+    assert isinstance(parse_matriculaciones_line(build_line(plazas="X"), 3, strict=strict, as_record=True), ParseError)
+
+
+@pytest.mark.parametrize("strict", [True, False])
+def test_parse_line_interns_repeated_values(strict):
+    from dgtscraper.parser.interning import get_interner
+
+    first, second = (
+        parse_matriculaciones_line(build_line(vehiculoModelo="IB" + "IZA"), strict=strict, intern=True) for _ in range(2)
+    )
+    plain, other_plain = (parse_matriculaciones_line(build_line(), strict=strict) for _ in range(2))
+
+    assert first == second == plain
+    assert first.vehiculoModelo is second.vehiculoModelo
+    assert plain.vehiculoModelo is not other_plain.vehiculoModelo  # interning is opt-in
+    assert first.bastidor is not second.bastidor
+
+    # models do not share mutable state
+    assert first.__fields_set__ is not second.__fields_set__
+    first.co2 = 1
+    assert second.co2 == 120
+    dictionary = get_interner().get_dictionary("vehiculoModelo")
+    assert dictionary.values[dictionary.get_code("IBIZA")] is first.vehiculoModelo
+
+
+def test_field_dictionary_is_bounded():
+    from dgtscraper.parser.interning import FieldDictionary
+
+    dictionary = FieldDictionary("vehiculoMarca", max_values=2)
+    assert [dictionary.get_code(value) for value in ("A", "B", "A", "C")] == [0, 1, 0, -1]
+    value = "".join(["C", "D"])
+    assert dictionary.intern(value) is value
+    assert len(dictionary) == 2
+
+
+def test_parse_columns_matches_line_parser():
+    numpy = pytest.importorskip("numpy")
+    from dgtscraper.parser.columns import parse_matriculaciones_columns
+
+    lines = [
+        build_line(),
+        build_line(fechaTransferencia="29022020", co2="", potenciaKW="*******", nuevo="U", precintado="SI"),
+        build_line(fechaTransferencia="31022020", plazas="X"),
+    ]
+    file = io.StringIO("Vehículos matriculados\n" + "".join(lines))
+    blocks = list(parse_matriculaciones_columns(file, batch_size=2))
+
+    assert [len(block) for block in blocks] == [2, 1]
+    assert [block.first_line_number for block in blocks] == [2, 4]
+
+    first, second = blocks[0], blocks[1]
+    expected = parse_matriculaciones_line(lines[1])
+    assert first["fechaTransferencia"][1] == numpy.datetime64(expected.fechaTransferencia)
+    assert first["co2"].mask.tolist() == [False, True]
+    assert first["co2"][0] == 120
+    assert numpy.isnan(first["potenciaKW"][1])
+    assert first["nuevo"].tolist() == [True, False]
+    assert first["precintado"].tolist() == [False, True]
+    assert first["vehiculoMarca"][0] == b"SEAT"
+    assert first["potencia"][0] == 8.34
+
+    assert numpy.isnat(second["fechaTransferencia"][0])
+    assert second["plazas"].mask[0]
+
+    from dgtscraper.parser.interning import get_interner
+    codes = first.get_categorical_codes("vehiculoMarca")
+    assert [get_interner().get_dictionary("vehiculoMarca").values[code] for code in codes] == ["SEAT", "SEAT"]
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+def test_parse_file_parallel_matches_serial(tmp_path, ordered):
+    from dgtscraper.parser import parse_matriculaciones_file_parallel
+
+    lines = [build_line(bastidor=f"B{i:020d}") for i in range(50)]
+    lines[31] = build_line(plazas="X")
+    path = tmp_path / "matriculaciones.txt"
+    path.write_text("Vehículos matriculados\n" + "".join(lines), encoding="iso-8859-1")
+
+    with open(path, "r", encoding="iso-8859-1") as f:
+        expected = list(parse_matriculaciones_file(f))
+    results = list(parse_matriculaciones_file_parallel(path, workers=2, ordered=ordered, chunk_size=1000))
+
+    def summarize(result):
+        if isinstance(result, ParseError):
+            return f"error:{result.line_number}"
+        return result.json() if result else ""
+
+    errors = [r for r in results if isinstance(r, ParseError)]
+    assert [e.line_number for e in errors] == [33]
+    if ordered:
+        assert list(map(summarize, results)) == list(map(summarize, expected))
+    else:
+        assert sorted(map(summarize, results)) == sorted(map(summarize, expected))
+
+
+def test_parse_file_parallel_counts_lone_carriage_returns_as_lines(tmp_path):
+    from dgtscraper.parser import parse_matriculaciones_file_parallel
+
+    lines = [build_line(bastidor=f"B{i:020d}") for i in range(50)]
+    lines[5] = "nota\r" + lines[5]
+    lines[20] = lines[20].replace("\n", "\r\n")
+    lines[40] = build_line(plazas="X")
+    path = tmp_path / "matriculaciones.txt"
+    path.write_bytes("".join(lines).encode("iso-8859-1"))
+
+    with open(path, "r", encoding="iso-8859-1") as f:
+        expected = [r.line_number for r in parse_matriculaciones_file(f) if isinstance(r, ParseError)]
+    results = parse_matriculaciones_file_parallel(path, workers=2, chunk_size=1000)
+    assert [r.line_number for r in results if isinstance(r, ParseError)] == expected
+    assert expected[-1] == 42
+
+
+@pytest.mark.parametrize("irregular", [False, True])
+def test_matriculaciones_file_random_access(tmp_path, irregular):
+    from dgtscraper.parser import MatriculacionesFile
+
+    lines = [build_line(bastidor=f"B{i:020d}") for i in range(20)]
+    if irregular:
+        lines[5] = lines[5].rstrip("\n") + "EXTRA\n"
+    path = tmp_path / "matriculaciones.txt"
+    path.write_text("Vehículos matriculados\n" + "".join(lines), encoding="iso-8859-1")
+
+    for _ in range(2):  # the second open reuses the saved index, if any
+        with MatriculacionesFile(path) as file:
+            assert len(file) == 20
+            assert (file.record_length is None) == irregular
+            assert (tmp_path / "matriculaciones.txt.idx").exists() == irregular
+            assert file[5].bastidor == f"B{5:020d}"
+            assert file[-1].bastidor == f"B{19:020d}"
+            assert [m.bastidor for m in file[17:]] == [f"B{i:020d}" for i in range(17, 20)]
+            assert len(list(file)) == 20
+
+    with MatriculacionesFile(path) as file:
+        with pytest.raises(IndexError):
+            file[20]
+
+
+def legacy_sorted_json(matriculacion: Matriculacion) -> bytes:
+    return json.dumps(json.loads(matriculacion.json()), sort_keys=True).encode()
+
+
+@pytest.mark.parametrize("strict", [True, False])
+def test_canonical_json_matches_legacy_serialization(strict):
+    from dgtscraper.serializer import matriculacion_to_canonical_json, fingerprint
+
+    matriculaciones = [parse_matriculaciones_line(line, strict=strict) for line in (
+        build_line(),
+        build_line(vehiculoMarca="CITROËN", municipio='A "Coruña"\\', potencia="0.1", co2=""),
+        build_line(fechaTransferencia="15032020", potenciaKW="*******", cilindrada="1e3", precintado="SI"),
+    )]
+    for matriculacion in matriculaciones:
+        assert matriculacion_to_canonical_json(matriculacion) == legacy_sorted_json(matriculacion)
+
+    legacy_md5 = hashlib.md5(b"".join(map(legacy_sorted_json, matriculaciones)))
+    result = fingerprint([None, *matriculaciones, None], buffer_size=2)
+    assert result == (legacy_md5.hexdigest(), 3)
+
+
+def test_fingerprint_matches_legacy_md5_over_a_file():
+    """Offline counterpart of the live MD5 test in test_matriculaciones.py: the same digest, computed with the serializer."""
+    from dgtscraper.serializer import fingerprint
+    from dgtscraper.synthetic import generate_matriculaciones_lines
+
+    matriculaciones = [parse_matriculaciones_line(line) for line in generate_matriculaciones_lines(2500, seed=2)]
+    legacy_md5 = hashlib.md5()
+    parsed_count = 0
+    for matriculacion in matriculaciones:
+        if not matriculacion:
+            continue
+        legacy_md5.update(legacy_sorted_json(matriculacion))
+        parsed_count += 1
+
+    assert parsed_count > 2000
+    assert fingerprint(matriculaciones) == (legacy_md5.hexdigest(), parsed_count)
+
+
+def test_synthetic_lines_parse_equally_strict_and_fast():
+    from dgtscraper.synthetic import generate_matriculaciones_lines
+
+    for line in generate_matriculaciones_lines(500, seed=1):
+        strict = parse_matriculaciones_line(line)
+        assert not isinstance(strict, ParseError)
+        assert parse_matriculaciones_line(line, strict=False) == strict
+
+
+def test_benchmarks_run():
+    from dgtscraper.benchmark import run_benchmarks, compare_results
+
+    results = run_benchmarks(lines=200, repeat=1, workers=1, only=["unzip_stream_batches", "parse_line_fast"])
+
+    assert sorted(results["results"]) == ["parse_line_fast", "unzip_stream_batches"]
+    assert results["results"]["parse_line_fast"]["lines"] == 201
+    assert compare_results(results, results) == {"parse_line_fast": 1.0, "unzip_stream_batches": 1.0}
@@ -0,0 +1,117 @@
+import time
+import threading
+
+import pytest
+
+from dgtscraper.pipeline import BackfillPipeline, iter_months
+from dgtscraper.sinks import Sink
+from dgtscraper.test_matriculaciones_parser import build_line
+
+
+class FakeDownloader:
+    def stream_matriculaciones_batches_by_date(self, year, month, day=None, decode=True):
+        yield "Vehículos matriculados\n"
+        for i in range(0, 30, 7):
+            yield "".join(build_line(bastidor=f"{year}{month:02d}{j:05d}") for j in range(i, min(i + 7, 30)))
+        yield build_line(plazas="X")
+
+
+class CollectSink(Sink):
+    def __init__(self):
+        self.written = dict()
+        self._lock = threading.Lock()
+
+    def write(self, source, matriculaciones):
+        with self._lock:
+            self.written.setdefault(source, []).extend(m.bastidor for m in matriculaciones)
+
+
+def test_iter_months():
+    assert list(iter_months((2023, 11), (2024, 2))) == [(2023, 11), (2023, 12), (2024, 1), (2024, 2)]
+
+
+@pytest.mark.parametrize("parse_workers", [0, 2])
+def test_backfill_pipeline(parse_workers):
+    sink = CollectSink()
+    errors = []
+    pipeline = BackfillPipeline(
+        sink=sink,
+        download_workers=2,
+        parse_workers=parse_workers,
+        sink_workers=2,
+        queue_size=2,
+        parse_batch_size=10,
+        downloader_factory=FakeDownloader,
+        on_parse_error=errors.append,
+    )
+    pipeline.run(iter_months((2023, 11), (2024, 2)))
+
+    assert sorted(sink.written) == ["2023-11", "2023-12", "2024-01", "2024-02"]
+    assert sorted(sink.written["2024-01"]) == [f"202401{j:05d}" for j in range(30)]
+    assert sorted(e.line_number for e in errors) == [32] * 4
+    assert pipeline.download_stats.lines == pipeline.parse_stats.lines == 4 * 32
+    assert pipeline.sink_stats.lines == 4 * 31
+
+
+class SlowDownloader(FakeDownloader):
+    def stream_matriculaciones_batches_by_date(self, year, month, day=None, decode=True):
+        for block in super().stream_matriculaciones_batches_by_date(year, month, day, decode):
+            time.sleep(0.02)
+            yield block
+
+
+def test_backfill_pipeline_reports_through_callbacks(capsys):
+    reports = []
+    pipeline = BackfillPipeline(
+        sink=CollectSink(),
+        download_workers=1,
+        parse_workers=0,
+        parse_batch_size=10,
+        downloader_factory=SlowDownloader,
+        on_report=lambda p: reports.append(p.summary()),
+    )
+    pipeline.run(iter_months((2023, 11), (2024, 2)), report_interval=0.05)
+
+    assert reports and all(report.startswith("download:") for report in reports)
+    assert pipeline.parse_errors == 4
+    assert capsys.readouterr().out == ""
+
+
+class FailingSink(Sink):
+    def write(self, source, matriculaciones):
+        raise ConnectionError("connection lost")
+
+
+class EndlessDownloader:
+    def __init__(self):
+        self.closed = threading.Event()
+
+    def stream_matriculaciones_batches_by_date(self, year, month, day=None, decode=True):
+        try:
+            while True:
+                yield build_line()
+        finally:
+            self.closed.set()
+
+
+def test_backfill_pipeline_stops_downloads_on_error():
+    downloader = EndlessDownloader()
+    pipeline = BackfillPipeline(
+        sink=FailingSink(),
+        download_workers=1,
+        parse_workers=0,
+        parse_batch_size=10,
+        downloader_factory=lambda: downloader,
+    )
+    with pytest.raises(ConnectionError):
+        pipeline.run(iter_months((2024, 1), (2024, 1)))
+    assert downloader.closed.wait(5)
+
+
+def test_incomplete_sink_fails_on_creation():
+    class IncompleteSink(Sink):
+        def close(self):
+            pass
+
+    with pytest.raises(TypeError):
+        IncompleteSink()
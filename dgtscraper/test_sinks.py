@@ -0,0 +1,160 @@
+import os
+import json
+import time
+import types
+import random
+import threading
+
+import pytest
+
+from dgtscraper.parser import parse_matriculaciones_line
+from dgtscraper.test_matriculaciones_parser import build_line
+
+
+def test_parquet_sink_partitions_and_types(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    from dgtscraper.sinks.parquet import ParquetSink
+
+    lines = [build_line(fechaMatriculacion="15012024", provincia=p, co2="") for p in ("M", "B", "M")]
+    lines.append(build_line(fechaMatriculacion="01022024", provincia="V"))
+    matriculaciones = [parse_matriculaciones_line(line) for line in lines]
+
+    with ParquetSink(tmp_path, row_group_size=2) as sink:
+        sink.write("2024-01", matriculaciones)
+
+    january = sorted((tmp_path / "year=2024" / "month=01").glob("*.parquet"))
+    assert len(january) == 1
+    assert len(list((tmp_path / "year=2024" / "month=02").glob("*.parquet"))) == 1
+
+    table = pq.read_table(january[0])
+    assert table.num_rows == 3
+    assert str(table.schema.field("fechaMatriculacion").type) == "date32[day]"
+    assert str(table.schema.field("vehiculoMarca").type) == "dictionary<values=string, indices=int32, ordered=0>"
+    assert table.column("co2").null_count == 3
+    assert table.column("claseMatricula").to_pylist() == ["0"] * 3
+
+    metadata = pq.ParquetFile(january[0]).metadata
+    assert metadata.num_row_groups == 2
+
+
+def test_parquet_sink_clusters_whole_partition(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    from dgtscraper.sinks.parquet import ParquetSink
+
+    with ParquetSink(tmp_path, row_group_size=2) as sink:
+        for _ in range(2):
+            sink.write("2024-01", [
+                parse_matriculaciones_line(build_line(fechaMatriculacion="15012024", provincia=p)) for p in "MBV"
+            ])
+
+    (path,) = (tmp_path / "year=2024" / "month=01").glob("*.parquet")
+    metadata = pq.ParquetFile(path).metadata
+    provincia_index = metadata.schema.to_arrow_schema().get_field_index("provincia")
+    statistics = [metadata.row_group(i).column(provincia_index).statistics for i in range(metadata.num_row_groups)]
+    assert [(s.min, s.max) for s in statistics] == [("B", "B"), ("M", "M"), ("V", "V")]
+
+
+def test_parquet_sink_bounds_buffered_rows(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    from dgtscraper.sinks.parquet import ParquetSink
+
+    sink = ParquetSink(tmp_path, max_buffered_rows=4)
+    for month in range(1, 5):
+        sink.write(f"2024-{month:02d}", [
+            parse_matriculaciones_line(build_line(fechaMatriculacion=f"1{i}{month:02d}2024")) for i in range(3)
+        ])
+        assert sink.buffered_rows <= 4
+
+    # the least recently written months were already written, the last one waits until close
+    assert [len(list(tmp_path.glob(f"year=2024/month={month:02d}/*.parquet"))) for month in range(1, 5)] == [1, 1, 1, 0]
+    sink.close()
+    assert sink.buffered_rows == 0
+    assert pq.read_table(tmp_path / "year=2024" / "month=04").num_rows == 3
+
+
+def test_mongodb_doc_matches_json_roundtrip():
+    pytest.importorskip("pymongo")
+    from dgtscraper.sinks.mongodb import format_matriculacion_doc
+
+    for overrides in ({}, {"fechaTransferencia": "15032020", "co2": "", "potenciaKW": "*******"}):
+        matriculacion = parse_matriculaciones_line(build_line(**overrides))
+        expected = json.loads(matriculacion.json())
+        expected["_id"] = "VSSZZZKJZRR000001|2024-01-02"
+
+        assert format_matriculacion_doc(matriculacion) == expected
+
+
+@pytest.mark.skipif(not os.getenv("MONGO_URI"), reason="MONGO_URI (local mongod) not set")
+@pytest.mark.parametrize("insert_only", [False, True])
+def test_mongodb_sink(insert_only):
+    from dgtscraper.sinks.mongodb import MongoSink
+
+    matriculaciones = [parse_matriculaciones_line(build_line(bastidor=f"B{i:05d}")) for i in range(25)]
+    sink = MongoSink.from_uri(os.environ["MONGO_URI"], "dgtscraper_test", "matriculaciones",
+                              batch_size=10, writers=2, insert_only=insert_only)
+    sink.collection.drop()
+    with sink:
+        sink.write("2024-01", matriculaciones)
+        sink.write("2024-01", matriculaciones[:5])
+
+    if insert_only:
+        assert (sink.stats.inserted, sink.stats.duplicated) == (25, 5)
+    else:
+        assert (sink.stats.upserted, sink.stats.matched) == (25, 5)
+
+    import pymongo
+    with pymongo.MongoClient(os.environ["MONGO_URI"]) as client:
+        collection = client["dgtscraper_test"]["matriculaciones"]
+        assert collection.count_documents({}) == 25
+        collection.drop()
+
+
+class FakeMongoCollection:
+    """Applies MongoSink upserts to a dict, with random delays so concurrent bulks interleave."""
+
+    def __init__(self):
+        self.docs = dict()
+        self._lock = threading.Lock()
+
+    def bulk_write(self, operations, ordered=True):
+        assert ordered
+        time.sleep(random.random() / 500)
+        upserted = matched = 0
+        with self._lock:
+            for operation in operations:
+                _id = operation._filter["_id"]
+                matched += _id in self.docs
+                upserted += _id not in self.docs
+                self.docs[_id] = operation._doc["$set"]
+        return types.SimpleNamespace(upserted_count=upserted, matched_count=matched)
+
+
+class FakeMongoClient:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_mongodb_sink_repeated_ids_last_wins():
+    pytest.importorskip("pymongo")
+    from dgtscraper.sinks.mongodb import MongoSink
+
+    collection, client = FakeMongoCollection(), FakeMongoClient()
+    # records without bastidor of the same day share the _id "|2024-01-02"
+    matriculaciones = [
+        parse_matriculaciones_line(build_line(bastidor=f"B{i:03d}" if i % 3 else "", co2=str(i)))
+        for i in range(300)
+    ]
+    with MongoSink(collection, batch_size=7, writers=4, client=client) as sink:
+        for i in range(0, 300, 11):
+            sink.write("2024-01", matriculaciones[i:i + 11])
+        sink.submit(matriculaciones[:5]).result()
+
+    assert collection.docs["|2024-01-02"]["co2"] == 3  # last written: matriculaciones[:5]
+    assert collection.docs["B299|2024-01-02"]["co2"] == 299
+    assert len(collection.docs) == 201
+    assert (sink.stats.upserted, sink.stats.matched) == (201, 99 + 5)
+    assert client.closed
+
@@ -0,0 +1,112 @@
+import pathlib
+import argparse
+
+from dgtscraper.downloader import DGTDownloader
+from dgtscraper.pipeline import BackfillPipeline, iter_months
+from dgtscraper.sinks import Sink, NullSink, JsonLinesSink
+from dgtscraper.dedup import DedupIndex, DedupSink
+
+
+def parse_month(date: str) -> tuple[int, int]:
+    date_chunks = date.split("-")
+    return int(date_chunks[0]), int(date_chunks[1])
+
+
+def build_sink(spec: str, args: argparse.Namespace) -> Sink:
+    """Sinks: "null", "jsonl:{directory}", "parquet:{directory}", "mongodb" (with the --mongo-* arguments)."""
+    name, _, arg = spec.partition(":")
+    if name == "null":
+        return NullSink()
+    if name == "jsonl" and arg:
+        return JsonLinesSink(arg)
+    if name == "parquet" and arg:
+        from dgtscraper.sinks.parquet import ParquetSink
+        return ParquetSink(arg)
+    if name == "mongodb" and args.mongo_uri and args.mongo_db and args.mongo_collection:
+        from dgtscraper.sinks.mongodb import MongoSink
+        return MongoSink.from_uri(
+            args.mongo_uri, args.mongo_db, args.mongo_collection,
+            writers=args.sink_workers,
+            insert_only=args.mongo_insert_only,
+        )
+    raise ValueError(f"Invalid sink {spec}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("start", help="First month to load (year-month)")
+    parser.add_argument("end", help="Last month to load (year-month), included")
+    parser.add_argument("--sink", default="null",
+                        help='Where to write the matriculaciones: "null", "jsonl:{directory}", "parquet:{directory}" or "mongodb"')
+    parser.add_argument("--mongo-uri")
+    parser.add_argument("--mongo-db")
+    parser.add_argument("--mongo-collection")
+    parser.add_argument("--mongo-insert-only", action="store_true",
+                        help="Insert documents instead of upserting them (faster for new collections)")
+    parser.add_argument("--download-workers", type=int, default=2)
+    parser.add_argument("--parse-workers", type=int, default=2,
+                        help="Parse processes (0 to parse in the main process)")
+    parser.add_argument("--sink-workers", type=int, default=1)
+    parser.add_argument("--queue-size", type=int, default=8,
+                        help="Max batches waiting between stages")
+    parser.add_argument("--parse-batch-size", type=int, default=5000,
+                        help="Lines per batch sent through the pipeline")
+    parser.add_argument("--fast", action="store_true",
+                        help="Use the non-strict (fast) parse mode")
+    parser.add_argument("--cache", action="store_true",
+                        help="Keep downloaded monthly ZIPs in a local cache, and reuse them on later runs")
+    parser.add_argument("--dedup", required=False,
+                        help="Index file of already loaded bastidor|fechaTramite keys: matriculaciones already seen "
+                             "(in this or previous runs) are not written again. Created if it does not exist")
+    parser.add_argument("--dedup-keys", type=int, default=20_000_000,
+                        help="Expected number of keys, to size a new dedup index")
+    parser.add_argument("--report-interval", type=float, default=10,
+                        help="Seconds between progress reports")
+    parser.add_help = True
+    args = parser.parse_args()
+
+    try:
+        start = parse_month(args.start)
+        end = parse_month(args.end)
+        sink = build_sink(args.sink, args)
+    except (IndexError, ValueError) as ex:
+        print("Invalid arguments:", ex)
+        exit(1)
+
+    dedup_path = pathlib.Path(args.dedup) if args.dedup else None
+    if dedup_path:
+        index = DedupIndex.load(dedup_path) if dedup_path.exists() else DedupIndex(expected_keys=args.dedup_keys)
+        sink = DedupSink(sink, index)
+
+    def downloader_factory():
+        downloader = DGTDownloader()
+        if args.cache:
+            downloader.enable_cache()
+        return downloader
+
+    with sink:
+        pipeline = BackfillPipeline(
+            sink=sink,
+            download_workers=args.download_workers,
+            parse_workers=args.parse_workers,
+            sink_workers=args.sink_workers,
+            queue_size=args.queue_size,
+            parse_batch_size=args.parse_batch_size,
+            strict=not args.fast,
+            downloader_factory=downloader_factory,
+            on_parse_error=print,
+            on_report=lambda p: print(p.summary()),
+        )
+        try:
+            pipeline.run(iter_months(start, end), report_interval=args.report_interval)
+        finally:
+            print(pipeline.summary())
+
+    # saved only once everything was written: keys of a failed run could belong to lost writes
+    if dedup_path:
+        print(f"Dedup: {sink.written} written, {sink.duplicated} duplicated, {len(sink.index)} keys")
+        sink.index.save(dedup_path)
+
+
+if __name__ == '__main__':
+    main()
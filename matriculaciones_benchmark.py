@@ -0,0 +1,48 @@
+import json
+import argparse
+
+from dgtscraper.benchmark import run_benchmarks, compare_results
+from dgtscraper.synthetic import write_matriculaciones_file
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=100_000,
+                        help="How many synthetic matriculaciones to generate")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Runs per benchmark (the best one is kept)")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="Processes for the parallel parsing benchmark")
+    parser.add_argument("--only", nargs="*",
+                        help="Benchmarks to run (default: all)")
+    parser.add_argument("-o", "--output", required=False,
+                        help="JSON file where results are saved")
+    parser.add_argument("--compare", required=False,
+                        help="JSON results of a previous run, to print the speedup of each benchmark")
+    parser.add_argument("--generate", required=False,
+                        help="Only write a synthetic matriculaciones file to this path, without running benchmarks")
+    parser.add_help = True
+    args = parser.parse_args()
+
+    if args.generate:
+        write_matriculaciones_file(args.generate, args.lines, seed=args.seed)
+        return
+
+    results = run_benchmarks(lines=args.lines, seed=args.seed, repeat=args.repeat, workers=args.workers, only=args.only)
+    for name, result in results["results"].items():
+        print(f"{name:24} {result['lines_per_second']:12.0f} lines/s {result['mb_per_second']:8.2f} MB/s")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        for name, speedup in compare_results(previous, results).items():
+            print(f"{name:24} x{speedup:.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -7,6 +7,8 @@ def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("date")
     parser.add_argument("-o", "--output", required=False)
+    parser.add_argument("--cache", action="store_true",
+                        help="Keep downloaded monthly ZIPs in a local cache, and reuse them on later runs")
     parser.add_help = True
     args = parser.parse_args()
 
@@ -18,7 +20,11 @@ def main():
         print("Invalid date")
         exit(1)
 
-    DGTDownloader().download_matriculaciones_by_date(
+    downloader = DGTDownloader()
+    if args.cache:
+        downloader.enable_cache()
+
+    downloader.download_matriculaciones_by_date(
         year=int(date_chunks[0]),
         month=int(date_chunks[1]),
         path=output_file,
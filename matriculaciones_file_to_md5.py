@@ -1,37 +1,68 @@
 import argparse
-import hashlib
-import json
 
-from dgtscraper.parser import parse_matriculaciones_file
-from dgtscraper.models import Matriculacion, ParseError
+from dgtscraper.parser import parse_matriculaciones_file, parse_matriculaciones_file_parallel
+from dgtscraper.models import ParseError
+from dgtscraper.serializer import fingerprint
+from dgtscraper.digest import DigestManifest, DEFAULT_DIGEST_CHUNK_SIZE, digest_file, diff_manifests
 from dgtscraper.const import FILE_ENCODING
 
 
-def matriculacion_to_sorted_json(matriculacion: Matriculacion) -> str:
-    js = matriculacion.json()
-    dc = json.loads(js)
-    return json.dumps(dc, sort_keys=True)
+def print_parse_errors(results):
+    for result in results:
+        if isinstance(result, ParseError):
+            print("Parse Error:", result)
+        yield result
 
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("file")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="How many processes to parse the file with")
+    parser.add_argument("--chunked", action="store_true",
+                        help="Instead of the legacy MD5, hash fixed-size chunks of lines independently "
+                             "and combine them into a Merkle root")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_DIGEST_CHUNK_SIZE,
+                        help="Lines per chunk, with --chunked")
+    parser.add_argument("--manifest", required=False,
+                        help="With --chunked, file where the manifest of chunk hashes is written")
+    parser.add_argument("--compare", required=False,
+                        help="With --chunked, manifest of a previous version of the file, to print the changed lines")
     parser.add_help = True
     args = parser.parse_args()
 
-    md5 = hashlib.md5()
-    parsed_count = 0
+    if args.chunked:
+        chunked_digest(args)
+        return
+
     with open(args.file, "r", encoding=FILE_ENCODING) as f:
-        for result in parse_matriculaciones_file(f):
-            if isinstance(result, ParseError):
-                print("Parse Error:", result)
-            elif result:
-                js = matriculacion_to_sorted_json(result)
-                md5.update(js.encode())
-                parsed_count += 1
-
-    print("MD5:", md5.hexdigest())
-    print("Total parsed matriculaciones:", parsed_count)
+        if args.workers > 1:
+            results = parse_matriculaciones_file_parallel(args.file, workers=args.workers)
+        else:
+            results = parse_matriculaciones_file(f)
+
+        result = fingerprint(print_parse_errors(results))
+
+    print("MD5:", result.hexdigest)
+    print("Total parsed matriculaciones:", result.count)
+
+
+def chunked_digest(args):
+    manifest = digest_file(args.file, chunk_size=args.chunk_size, workers=args.workers)
+    print("Merkle root:", manifest.root)
+    print("Chunks:", len(manifest.chunks))
+    print("Total parsed matriculaciones:", manifest.count)
+
+    if args.manifest:
+        with open(args.manifest, "w") as f:
+            f.write(manifest.json())
+
+    if args.compare:
+        changed_ranges = diff_manifests(DigestManifest.parse_file(args.compare), manifest)
+        if not changed_ranges:
+            print("No changes")
+        for start, end in changed_ranges:
+            print(f"Changed lines: [{start}, {end})")
 
 
 if __name__ == '__main__':
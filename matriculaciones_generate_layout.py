@@ -0,0 +1,29 @@
+import argparse
+import pathlib
+
+from dgtscraper.models import Matriculacion
+from dgtscraper.models.common import render_layout_module
+
+LAYOUT_PATH = pathlib.Path(__file__).parent / "dgtscraper" / "models" / "matriculaciones_layout.py"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Regenerate the static field layout of Matriculacion from its field docstrings")
+    parser.add_argument("--check", action="store_true",
+                        help="Do not write anything; exit with an error if the static layout is outdated")
+    parser.add_help = True
+    args = parser.parse_args()
+
+    source = render_layout_module(Matriculacion.__name__, Matriculacion.extract_fields_metadata())
+    if args.check:
+        if LAYOUT_PATH.read_text(encoding="utf-8") != source:
+            parser.exit(1, f"{LAYOUT_PATH} is outdated, regenerate it with {pathlib.Path(__file__).name}\n")
+        return
+
+    LAYOUT_PATH.write_text(source, encoding="utf-8")
+    print("Written", LAYOUT_PATH)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,23 +1,35 @@
 import argparse
 
-from dgtscraper.parser import parse_matriculaciones_file
+from dgtscraper.parser import parse_matriculaciones_file, parse_matriculaciones_file_parallel
 from dgtscraper.const import FILE_ENCODING
 
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("file")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="How many processes to parse the file with")
+    parser.add_argument("--unordered", action="store_true",
+                        help="When parsing with multiple workers, print matriculaciones as soon as they are parsed")
     parser.add_help = True
     args = parser.parse_args()
 
-    with open(args.file, "r", encoding=FILE_ENCODING) as f:
-        print("Pulsa Enter tras cada matriculación para ver la siguiente:")
-        for result in parse_matriculaciones_file(f):
-            if result:
-                try:
-                    input(result)
-                except (KeyboardInterrupt, InterruptedError):
-                    break
+    print("Pulsa Enter tras cada matriculación para ver la siguiente:")
+    if args.workers > 1:
+        results = parse_matriculaciones_file_parallel(args.file, workers=args.workers, ordered=not args.unordered)
+        print_results(results)
+    else:
+        with open(args.file, "r", encoding=FILE_ENCODING) as f:
+            print_results(parse_matriculaciones_file(f))
+
+
+def print_results(results):
+    for result in results:
+        if result:
+            try:
+                input(result)
+            except (KeyboardInterrupt, InterruptedError):
+                break
 
 
 if __name__ == '__main__':
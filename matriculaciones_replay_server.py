@@ -0,0 +1,49 @@
+import argparse
+
+from dgtscraper.replay_server import ReplayServer, ReplayServerConfig
+
+
+def parse_date(date: str):
+    return tuple(int(chunk) for chunk in date.split("-"))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--lines-per-month", type=int, default=100_000,
+                        help="Synthetic matriculaciones served in each monthly file")
+    parser.add_argument("--lines-per-day", type=int, default=5000,
+                        help="Synthetic matriculaciones served in each daily file")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="Seconds to wait before answering each request")
+    parser.add_argument("--bandwidth", type=int, required=False,
+                        help="Bytes per second when serving ZIPs (unlimited by default)")
+    parser.add_argument("--disconnect-after", type=int, required=False,
+                        help="Drop the connection after sending this many bytes of each ZIP")
+    parser.add_argument("--viewstate-ttl", type=float, required=False,
+                        help="Seconds after which a viewstate expires")
+    parser.add_argument("--error-date", action="append", default=[],
+                        help="Date (YYYY-MM or YYYY-MM-DD) answered with a msgError page; can be repeated")
+    parser.add_help = True
+    args = parser.parse_args()
+
+    config = ReplayServerConfig(
+        lines_per_month=args.lines_per_month,
+        lines_per_day=args.lines_per_day,
+        latency=args.latency,
+        bandwidth=args.bandwidth,
+        disconnect_after=args.disconnect_after,
+        viewstate_ttl=args.viewstate_ttl,
+        error_dates={parse_date(date) for date in args.error_date},
+    )
+    server = ReplayServer(config, host=args.host, port=args.port)
+    print(f"Serving on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
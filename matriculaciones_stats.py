@@ -0,0 +1,73 @@
+import sys
+import pathlib
+import argparse
+from typing import Optional, Tuple
+
+from dgtscraper.aggregate import Aggregator
+from dgtscraper.downloader import DGTDownloader
+from dgtscraper.downloader.lines import iter_block_lines
+
+
+def parse_date(date: str) -> Tuple[int, int, Optional[int]]:
+    """Parse year-month or year-month-day."""
+    date_chunks = date.split("-")
+    if len(date_chunks) not in (2, 3):
+        raise ValueError(f"expected year-month or year-month-day, got {date!r}")
+    year = int(date_chunks[0])
+    month = int(date_chunks[1])
+    day = int(date_chunks[2]) if len(date_chunks) == 3 else None
+    return year, month, day
+
+
+def iter_date_lines(year: int, month: int, day: Optional[int], cache: bool):
+    downloader = DGTDownloader()
+    if cache:
+        downloader.enable_cache()
+    for block in downloader.stream_matriculaciones_batches_by_date(year=year, month=month, day=day, decode=False):
+        yield from iter_block_lines(block)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("source", help="Date to download (year-month or year-month-day) or path of a local file")
+    parser.add_argument("-g", "--group-by", nargs="*", default=[],
+                        help="Fields to group by; also 'year' and 'month' (of fechaMatriculacion)")
+    parser.add_argument("-m", "--metric", nargs="*", default=["count"],
+                        help="Metrics: 'count', or function:field with function count, sum, min, max or mean "
+                             "(e.g. mean:co2)")
+    parser.add_argument("-o", "--output", required=False,
+                        help="CSV file where results are written (default: stdout)")
+    parser.add_argument("--batch-size", type=int, default=65536,
+                        help="Matriculaciones decoded per columnar block")
+    parser.add_argument("--cache", action="store_true",
+                        help="Keep downloaded monthly ZIPs in a local cache, and reuse them on later runs")
+    parser.add_help = True
+    args = parser.parse_args()
+
+    try:
+        aggregator = Aggregator(group_by=args.group_by, metrics=args.metric)
+    except ValueError as ex:
+        print("Invalid arguments:", ex)
+        exit(1)
+
+    path = pathlib.Path(args.source)
+    if path.is_file():
+        with open(path, "rb") as f:
+            aggregator.update_file(f, batch_size=args.batch_size)
+    else:
+        try:
+            year, month, day = parse_date(args.source)
+        except ValueError as ex:
+            print("Invalid date or file:", ex)
+            exit(1)
+        aggregator.update_file(iter_date_lines(year, month, day, args.cache), batch_size=args.batch_size)
+
+    if args.output:
+        with open(args.output, "w", newline="") as f:
+            aggregator.write_csv(f)
+    else:
+        aggregator.write_csv(sys.stdout)
+
+
+if __name__ == '__main__':
+    main()
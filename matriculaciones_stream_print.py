@@ -7,6 +7,8 @@ from dgtscraper.parser import parse_matriculaciones_line
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("date")
+    parser.add_argument("--cache", action="store_true",
+                        help="Keep downloaded monthly ZIPs in a local cache, and reuse them on later runs")
     parser.add_help = True
     args = parser.parse_args()
 
@@ -22,7 +24,11 @@ def main():
         exit(1)
 
     print("Pulsa Enter tras cada matriculación para ver la siguiente:")
-    for matriculacion_str in DGTDownloader().stream_matriculaciones_by_date(year=year, month=month, day=day):
+    downloader = DGTDownloader()
+    if args.cache:
+        downloader.enable_cache()
+
+    for matriculacion_str in downloader.stream_matriculaciones_by_date(year=year, month=month, day=day):
         if matriculacion := parse_matriculaciones_line(matriculacion_str):
             try:
                 input(matriculacion)
@@ -1,28 +1,12 @@
-import json
+import pathlib
 import argparse
-
-import pymongo
+import collections
 
 from dgtscraper.downloader import DGTDownloader
 from dgtscraper.parser import parse_matriculaciones_line
-from dgtscraper.models import ParseError, Matriculacion
-
-
-def format_matriculacion_doc(matriculacion: Matriculacion) -> dict:
-    doc = json.loads(matriculacion.json())
-    doc_id = f"{matriculacion.bastidor}|{matriculacion.fechaTramite.isoformat()}"
-    doc["_id"] = doc_id
-    return doc
-
-
-def insert_matriculaciones(mongo_collection: pymongo.collection.Collection, matriculaciones: list[Matriculacion]):
-    docs = [format_matriculacion_doc(matri) for matri in matriculaciones]
-    result = mongo_collection.bulk_write([pymongo.UpdateOne(
-        filter={"_id": doc["_id"]},
-        update={"$set": doc},
-        upsert=True,
-    ) for doc in docs])
-    print(f"Inserted {result.upserted_count} docs: {result.upserted_ids}")
+from dgtscraper.models import ParseError, IngestCheckpoint
+from dgtscraper.delta import DeltaIndex, write_delta
+from dgtscraper.sinks.mongodb import MongoSink, DEFAULT_MONGO_BATCH_SIZE, DEFAULT_MONGO_WRITERS
 
 
 # noinspection DuplicatedCode
@@ -32,8 +16,28 @@ def main():
     parser.add_argument("--mongo-uri", required=True)
     parser.add_argument("--mongo-db", required=True)
     parser.add_argument("--mongo-collection", required=True)
-    parser.add_argument("--batch-size", type=int, default=10,
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_MONGO_BATCH_SIZE,
                         help="How many matriculaciones to insert per batch")
+    parser.add_argument("--writers", type=int, default=DEFAULT_MONGO_WRITERS,
+                        help="How many batches to write concurrently")
+    parser.add_argument("--insert-only", action="store_true",
+                        help="Insert documents instead of upserting them (faster for new collections; "
+                             "documents with an existing _id are left untouched)")
+    parser.add_argument("--cache", action="store_true",
+                        help="Keep downloaded monthly ZIPs in a local cache, and reuse them on later runs")
+    parser.add_argument("--checkpoint", required=False,
+                        help="File where ingestion progress is saved after each batch, to resume after a failure "
+                             "(default: a file per date, db and collection in the downloader temp dir). "
+                             "Resuming skips lines by number, so it assumes the data has not changed since then: "
+                             "provisional daily data can be revised, use --restart or --delta for it")
+    parser.add_argument("--restart", action="store_true",
+                        help="Ignore any saved checkpoint and ingest the date from the start")
+    parser.add_argument("--delta", action="store_true",
+                        help="Only write the matriculaciones that are new or changed since the previous run of the "
+                             "same date, and delete the removed ones (for provisional daily data)")
+    parser.add_argument("--delta-index", required=False,
+                        help="File with the content hashes of the previous run, used by --delta "
+                             "(default: a file per date, db and collection in the downloader temp dir)")
     parser.add_help = True
     args = parser.parse_args()
 
@@ -46,24 +50,111 @@ def main():
         print("Invalid date")
         exit(1)
 
-    mongo_collection = pymongo.MongoClient(args.mongo_uri)[args.mongo_db][args.mongo_collection]
+    if args.delta and args.insert_only:
+        print("--delta updates changed matriculaciones, so it cannot be used with --insert-only")
+        exit(1)
+
+    sink = MongoSink.from_uri(
+        args.mongo_uri, args.mongo_db, args.mongo_collection,
+        batch_size=args.batch_size,
+        writers=args.writers,
+        insert_only=args.insert_only,
+    )
+
+    downloader = DGTDownloader()
+    if args.cache:
+        downloader.enable_cache()
+
+    if args.delta:
+        index_path = pathlib.Path(args.delta_index) if args.delta_index else (
+            downloader.tmp_path / f"mongodb-{args.mongo_db}-{args.mongo_collection}-{args.date}.delta.idx"
+        )
+        ingest_delta(downloader, sink, args.date, year, month, day, index_path)
+        return
+
+    checkpoint_path = pathlib.Path(args.checkpoint) if args.checkpoint else (
+        downloader.tmp_path / f"mongodb-{args.mongo_db}-{args.mongo_collection}-{args.date}.checkpoint.json"
+    )
+    checkpoint = IngestCheckpoint(source=args.date)
+    if not args.restart:
+        checkpoint = IngestCheckpoint.load(checkpoint_path, source=args.date)
+    if checkpoint.last_line_number:
+        print(f"Resuming from line {checkpoint.last_line_number} ({checkpoint.count} matriculaciones already inserted)")
+
+    ingest(downloader, sink, year, month, day, checkpoint, checkpoint_path)
+    print(f"Written matriculaciones: {sink.stats}")
+
 
+def ingest(downloader, sink, year, month, day, checkpoint: IngestCheckpoint, checkpoint_path: pathlib.Path):
+    """Write the matriculaciones after the checkpoint line, saving the checkpoint after each acknowledged batch.
+    Lines are skipped by number, so the source data must not have changed since the checkpoint was saved.
+    """
     matriculaciones_buffer = list()
-    for matriculacion_str in DGTDownloader().stream_matriculaciones_by_date(year=year, month=month, day=day):
-        matriculacion = parse_matriculaciones_line(matriculacion_str)
-        if not matriculacion:
-            continue
-        if isinstance(matriculacion, ParseError):
-            print(matriculacion)
-            continue
-
-        matriculaciones_buffer.append(matriculacion)
-        if len(matriculaciones_buffer) >= args.batch_size:
-            insert_matriculaciones(mongo_collection, matriculaciones_buffer)
-            matriculaciones_buffer.clear()
-
-    if matriculaciones_buffer:
-        insert_matriculaciones(mongo_collection, matriculaciones_buffer)
+    pending_batches = collections.deque()  # (write future, last line number, count), in submission order
+    line_number = 0
+    with sink:
+        for matriculacion_str in downloader.stream_matriculaciones_by_date(year=year, month=month, day=day):
+            line_number += 1
+            if line_number <= checkpoint.last_line_number:
+                continue
+
+            matriculacion = parse_matriculaciones_line(matriculacion_str, line_number)
+            if not matriculacion:
+                continue
+            if isinstance(matriculacion, ParseError):
+                print(matriculacion)
+                continue
+
+            matriculaciones_buffer.append(matriculacion)
+            if len(matriculaciones_buffer) >= sink.batch_size:
+                future = sink.submit(matriculaciones_buffer)
+                pending_batches.append((future, line_number, len(matriculaciones_buffer)))
+                matriculaciones_buffer = list()
+                save_checkpoint(checkpoint, checkpoint_path, pending_batches)
+
+        if matriculaciones_buffer:
+            sink.submit(matriculaciones_buffer)
+
+    # the whole date was ingested: a rerun starts over (upserts keep it idempotent)
+    checkpoint_path.unlink(missing_ok=True)
+
+
+def ingest_delta(downloader, sink, date, year, month, day, index_path: pathlib.Path):
+    """Write only the delta against the previous run; its index is replaced once the delta is acknowledged."""
+    index = DeltaIndex.load(index_path)
+    snapshot = DeltaIndex()
+
+    def iter_matriculaciones():
+        for line_number, matriculacion_str in enumerate(
+                downloader.stream_matriculaciones_by_date(year=year, month=month, day=day), start=1):
+            matriculacion = parse_matriculaciones_line(matriculacion_str, line_number)
+            if isinstance(matriculacion, ParseError):
+                print(matriculacion)
+            yield matriculacion
+
+    with sink:
+        counts = write_delta(sink, date, index.diff(iter_matriculaciones(), snapshot), batch_size=sink.batch_size)
+    if snapshot.parse_errors:
+        print(f"{snapshot.parse_errors} lines could not be parsed: removed matriculaciones are not deleted in this run")
+
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    snapshot.save(index_path)
+    print("Delta: " + ", ".join(f"{count} {change.value}" for change, count in counts.items()))
+    print(f"Written matriculaciones: {sink.stats}")
+
+
+def save_checkpoint(checkpoint: IngestCheckpoint, path: pathlib.Path, pending_batches: collections.deque):
+    """Advance the checkpoint over the acknowledged batches, stopping at the first batch still being written."""
+    acknowledged = False
+    while pending_batches and pending_batches[0][0].done():
+        future, line_number, count = pending_batches.popleft()
+        future.result()
+        checkpoint.last_line_number = line_number
+        checkpoint.count += count
+        acknowledged = True
+
+    if acknowledged:
+        checkpoint.save(path)
 
 
 if __name__ == '__main__':
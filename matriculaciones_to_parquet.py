@@ -0,0 +1,63 @@
+import os
+import argparse
+
+from dgtscraper.downloader import DGTDownloader
+from dgtscraper.parser import parse_matriculaciones_file, parse_matriculaciones_line
+from dgtscraper.models import ParseError
+from dgtscraper.const import FILE_ENCODING
+from dgtscraper.sinks.parquet import ParquetSink, DEFAULT_ROW_GROUP_SIZE, DEFAULT_MAX_BUFFERED_ROWS
+
+
+# noinspection DuplicatedCode
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("source", help="Local matriculaciones file, or date to download (year-month or year-month-day)")
+    parser.add_argument("output", help="Output directory, partitioned as year=YYYY/month=MM")
+    parser.add_argument("--row-group-size", type=int, default=DEFAULT_ROW_GROUP_SIZE)
+    parser.add_argument("--max-buffered-rows", type=int, default=DEFAULT_MAX_BUFFERED_ROWS,
+                        help="Rows kept in memory (across all partitions) before writing the least recent partitions")
+    parser.add_argument("--batch-size", type=int, default=10000,
+                        help="How many matriculaciones to send to the writer at once")
+    parser.add_argument("--fast", action="store_true",
+                        help="Use the non-strict (fast) parse mode")
+    parser.add_help = True
+    args = parser.parse_args()
+
+    strict = not args.fast
+    if os.path.isfile(args.source):
+        file = open(args.source, "r", encoding=FILE_ENCODING)
+        results = parse_matriculaciones_file(file, strict=strict)
+    else:
+        date_chunks = args.source.split("-")
+        try:
+            year = int(date_chunks[0])
+            month = int(date_chunks[1])
+            day = int(date_chunks[2]) if len(date_chunks) == 3 else None
+        except (IndexError, ValueError):
+            print("Invalid date")
+            exit(1)
+
+        file = None
+        lines = DGTDownloader().stream_matriculaciones_by_date(year=year, month=month, day=day)
+        results = (parse_matriculaciones_line(line, i, strict=strict) for i, line in enumerate(lines, start=1))
+
+    with ParquetSink(args.output, row_group_size=args.row_group_size, max_buffered_rows=args.max_buffered_rows) as sink:
+        buffer = list()
+        for result in results:
+            if isinstance(result, ParseError):
+                print(result)
+            elif result:
+                buffer.append(result)
+                if len(buffer) >= args.batch_size:
+                    sink.write(args.source, buffer)
+                    buffer.clear()
+
+        if buffer:
+            sink.write(args.source, buffer)
+
+    if file:
+        file.close()
+
+
+if __name__ == '__main__':
+    main()